@@ -5,23 +5,83 @@ This module provides a framework for multiple AIs to control the game.
 """
 
 import time
-import requests
+import asyncio
+import copy
 import re
 import json
 import logging
 import random
 from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import anthropic
 import os
-from prompts import get_vlm_user_prompt
+from prompts import battle_system_prompt, get_vlm_battle_prompt, get_vlm_user_prompt, player_system_prompt
+from api_client import (get_client, get_game_status, get_game_state, get_game_screenshot,
+                        execute_action, execute_sequence, start_game)
 from dotenv import load_dotenv
 import base64
+import metrics
+from metrics import SIZE_BUCKETS, Counter, Histogram
+from llm_cache import ResponseCache
+from image_utils import dhash, encode_png, hamming_distance, preprocess_frame
+from thinking_budget import BudgetPolicy
+from rules import RulePolicy
+from stuck import MENU_ESCAPE, StuckDetector, frontier_walk
+from episodes import EpisodeStore
+from scheduler import CircuitOpenError, estimate_tokens, shared_scheduler
+import tracing
+from plans import (MAX_PLAN_LENGTH, MOVES, PLAN_CHECKPOINT_EVERY, expected_positions, moves_toward,
+                   parse_coordinates, plan_divergence, tile_distance)
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Configuration
-API_BASE_URL = "http://localhost:5000/api"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve /metrics from the controller when set
+VLM_MODEL = 'claude-3-5-sonnet-20241022'
+LLM_MODEL = 'claude-3-7-sonnet-20250219'
+CLAUDE_BASE_URL = os.getenv("CLAUDE_BASE_URL") or None  # e.g. http://localhost:8008 for mock_anthropic.py
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_responses.sqlite")  # empty to keep the cache in memory only
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))  # entries in the in-memory tier
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))  # seconds
+VLM_SKIP_DISTANCE = int(os.getenv("VLM_SKIP_DISTANCE", "4"))  # dhash bits a frame may differ by and still reuse the description
+VLM_MAX_REUSES = int(os.getenv("VLM_MAX_REUSES", "5"))  # force a fresh description after this many reuses
+VLM_GATE_REPORT_EVERY = 20  # decisions between skip-rate log lines
+LLM_EARLY_EXIT = os.getenv("LLM_EARLY_EXIT", "background")  # "off", "cancel" or "background" once ACTION: is streamed
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "1") != "0"  # mark the stable system prompt as cacheable
+EPISODE_DB_PATH = os.getenv("EPISODE_DB_PATH", "cache/episodes.sqlite")  # empty to remember episodes for this run only
+SPECULATE_BATTLES = os.getenv("SPECULATE_BATTLES", "1") != "0"  # prepare the battle AI's first decision early in dual mode
+TIER_REPORT_EVERY = 50  # steps between decision-tier reports
+BUDGET_REPORT_EVERY = 20  # LLM decisions between thinking-tier latency reports
+FRAME_PREFETCH_AT = 0.8  # fraction of the pipeline's idle window after which the next frame is fetched
+SERIAL_STEP_DELAY = 1.0  # seconds the serial loop sleeps after each action
+VLM_PREPROCESS = os.getenv("VLM_PREPROCESS", "1") != "0"  # send 2-bit quantized frames instead of raw PNGs
+VLM_IMAGE_SCALE = int(os.getenv("VLM_IMAGE_SCALE", "2"))  # nearest-neighbour upscale of preprocessed frames
+VLM_IMAGE_CROP = os.getenv("VLM_IMAGE_CROP", "1") != "0"  # crop to the text box in dialogue and the HUD in battle
+
+# AI decision latency per stage ("total", "vlm", "context", "llm", "parse")
+AI_DECISION_SECONDS = Histogram('pokemon_ai_decision_seconds', 'AI decision latency by stage', ['ai', 'stage'])
+VLM_PAYLOAD_BYTES = Histogram('pokemon_vlm_payload_bytes', 'Base64 image bytes sent to the VLM',
+                              ['ai', 'mode'], buckets=SIZE_BUCKETS)
+VLM_SECONDS = Histogram('pokemon_vlm_seconds', 'VLM request latency by image mode', ['ai', 'mode'])
+LLM_FIRST_TOKEN_SECONDS = Histogram('pokemon_llm_first_token_seconds', 'Time to the first streamed token',
+                                    ['ai', 'prompt_cache'])
+PROMPT_CACHE_TOKENS = Counter('pokemon_prompt_cache_tokens_total', 'LLM input tokens by prompt cache use',
+                              ['ai', 'kind'])
+EARLY_EXITS = Counter('pokemon_llm_early_exits_total', 'LLM streams whose action was committed early',
+                      ['ai', 'mode'])
+EARLY_EXIT_SAVED_SECONDS = Histogram('pokemon_llm_early_exit_saved_seconds',
+                                     'Time between committing an action and the end of its stream', ['ai'])
+TILES_MOVED = Counter('pokemon_tiles_moved_total', 'Tiles the player has walked (map changes count as one)')
+PLAN_MOVES = Counter('pokemon_plan_moves_total', 'Moves of multi-move plans, executed or dropped on divergence',
+                     ['result'])
+SPECULATIONS = Counter('pokemon_battle_speculations_total', 'Speculative first battle decisions', ['result'])
+BATTLE_START_SECONDS = Histogram('pokemon_battle_start_decision_seconds',
+                                 'Latency of the first decision of a battle', ['speculated'])
+DECISION_TIER = Counter('pokemon_ai_decision_tier_total', 'Steps decided by each rule or by the AI', ['tier'])
+VLM_GATE = Counter('pokemon_vlm_gate_total', 'Screen descriptions requested or reused', ['ai', 'result'])
 
 
 # Load environment variables from .env file
@@ -31,6 +91,46 @@ load_dotenv()
 claude_api_key = os.getenv("API_KEY")
 
 
+VALID_ACTIONS = ["up", "down", "left", "right", "a", "b", "start", "select"]
+
+
+class StreamingActionParser:
+    """Watches streamed LLM text for the first complete decision: an ACTION, PLAN or GOAL line."""
+    
+    # The action word must be followed by something, so "le" of a half-streamed "left" never matches
+    ACTION_PATTERN = re.compile(r"ACTION:\s*\[?([a-z]+)(?=[^a-z])", re.IGNORECASE)
+    # Plans and goals are only complete at the end of their line
+    PLAN_PATTERN = re.compile(r"(?:PLAN|GOAL):[^\n]*\n", re.IGNORECASE)
+    
+    def __init__(self):
+        self.text = ""
+        self.action = None
+        self.plan_line = None
+        self._scan_from = 0
+    
+    @property
+    def done(self):
+        return self.action is not None or self.plan_line is not None
+    
+    def feed(self, chunk):
+        """Add streamed text. Returns True once a decision has been seen."""
+        self.text += chunk
+        while not self.done:
+            matches = [match for match in (self.ACTION_PATTERN.search(self.text, self._scan_from),
+                                           self.PLAN_PATTERN.search(self.text, self._scan_from)) if match]
+            if not matches:
+                # An unfinished marker can only be on the last line
+                self._scan_from = max(self._scan_from, self.text.rfind("\n") + 1)
+                break
+            match = min(matches, key=lambda match: match.start())
+            self._scan_from = match.end()
+            if match.re is self.PLAN_PATTERN:
+                self.plan_line = match.group(0).strip()
+            elif match.group(1).lower() in VALID_ACTIONS:
+                self.action = match.group(1).lower()
+        return self.done
+
+
 class PokemonAI(ABC):
     """
     Abstract base class for AI controllers.
@@ -43,8 +143,11 @@ class PokemonAI(ABC):
         self.game_state = {}
         self.screen_state = None
         self.screen_description = None
-        self.previous_actions = []
+        self.previous_actions = deque(maxlen=20)  # the most recent actions only; older ones are in episodes
         self.current_role = "player"  # "player" or "pokemon"
+        self.episodes = None  # EpisodeStore shared through the AIManager
+        self.skip_cache = False  # set by the AIManager while the last steps made no progress
+        self.on_reasoning = None  # called with (ai, reasoning) when reasoning arrives after its action
     
     @abstractmethod
     def decide_action(self, game_state, screen_state=None, role="player"):
@@ -62,6 +165,13 @@ class PokemonAI(ABC):
         """
         pass
     
+    @contextmanager
+    def stage(self, name):
+        """Time a decision stage for the metrics and the decision trace."""
+        with tracing.span(name, ai=self.name) as span:
+            with AI_DECISION_SECONDS.labels(self.name, name).time():
+                yield span
+    
     def update_state(self, game_state, screen_state=None):
         """Update the AI's knowledge of the game state."""
         self.game_state = game_state
@@ -70,9 +180,12 @@ class PokemonAI(ABC):
     def record_action(self, action):
         """Record an action taken by the AI."""
         self.previous_actions.append(action)
-        # Keep only the last 20 actions
-        if len(self.previous_actions) > 20:
-            self.previous_actions.pop(0)
+    
+    def shadow(self):
+        """Get a copy for a side decision (e.g. a speculative one) that leaves this AI untouched."""
+        shadow = copy.copy(self)
+        shadow.previous_actions = deque(self.previous_actions, maxlen=self.previous_actions.maxlen)
+        return shadow
     
     def set_role(self, role):
         """Set the current role of the AI."""
@@ -158,8 +271,50 @@ class ClaudeAI(PokemonAI):
         self.strategy = "balanced"  # balanced, aggressive, defensive
     
         self.client = anthropic.Anthropic(
-            api_key=claude_api_key,
+            api_key=claude_api_key or ("mock" if CLAUDE_BASE_URL else None),
+            base_url=CLAUDE_BASE_URL,
+            max_retries=0,  # the scheduler retries, with the shared rate-limit budget in mind
         )
+        
+        # Rate limits, priority lanes, retries and the circuit breaker, shared by every session
+        self.scheduler = shared_scheduler()
+        self.lane = "overworld"
+        
+        # Responses keyed by frame and prompt, so repeated situations are free
+        self.cache = ResponseCache(LLM_CACHE_SIZE, LLM_CACHE_PATH or None, LLM_CACHE_TTL)
+        
+        # Runs the VLM call while the rest of the prompt is being built
+        self._vlm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="claude-vlm")
+        
+        # Finishes LLM streams whose action was committed early
+        self._stream_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="claude-stream")
+        self._pending_description = None
+        
+        # Stable, cacheable system prompt and the state it was last built for
+        self.memory_summary = None
+        self._system = None
+        self._system_summary = None
+        self._battle_system = None
+        self._context_key = None
+        self._context = None
+        self._prompt_state = None
+        
+        # Picks the thinking budget per decision from how novel the situation is
+        self.budget_policy = BudgetPolicy()
+        self.llm_decisions = 0
+        self.last_response_cached = False  # whether the last _llm_call was answered from the cache
+        self.last_first_token = None  # seconds to the first streamed token of the last _llm_call
+        self.reasoning_pending = False  # whether the last _llm_call committed before its reasoning streamed in
+        self.early_exit = LLM_EARLY_EXIT
+        
+        # Frame-difference gate: the frame and map the current description is of
+        self._described_hash = None
+        self._described_map = None
+        self._described_text = None
+        self._description_reuses = 0
+        self.vlm_calls = 0
+        self.vlm_skips = 0
+        self.vlm_seconds = 0.0  # time spent in VLM calls, to estimate what skips saved
 
     def is_base64(self, data):
         """Check if the given bytes are valid base64 encoded."""
@@ -170,77 +325,257 @@ class ClaudeAI(PokemonAI):
         except (ValueError, TypeError):
             return False
 
-    def process_image(self, image): 
+    def process_image(self, image, region=None): 
+        """Base64-encode a frame given as PNG bytes or an RGB numpy array, cropped to region if preprocessing."""
         img_media = "image/png"
+        if VLM_PREPROCESS:
+            image = preprocess_frame(image, VLM_IMAGE_SCALE, region)
+        else:
+            # Frames from the in-process transport are raw arrays
+            image = encode_png(image)
         img_data = base64.b64encode(image).decode("utf-8")
+        VLM_PAYLOAD_BYTES.labels(self.name, "preprocessed" if VLM_PREPROCESS else "raw").observe(len(img_data))
         return img_media, img_data
 
-    def _vlm_call(self, user_prompt, image): 
-        if type(image) != bytes:
+    def _vlm_region(self, game_state):
+        """Pick the part of the screen worth describing for a game state (None for all of it)."""
+        if not (VLM_IMAGE_CROP and VLM_PREPROCESS):
+            return None
+        if game_state.get("battle_type") in (1, 2):
+            return "battle_hud"
+        if game_state.get("dialogue_open"):
+            return "text_box"
+        return None
+
+    def _vlm_call(self, user_prompt, image, region=None): 
+        """Describe a frame (or one region of it) with the VLM, returning the description text."""
+        if not isinstance(image, bytes) and not hasattr(image, "shape"):
             return None
         
-        img_media, img_data = self.process_image(image) 
+        model_id = VLM_MODEL
+        cache_key = self.cache.make_key("vlm", user_prompt, frame=image, model=model_id,
+                                        preprocess=VLM_PREPROCESS, scale=VLM_IMAGE_SCALE, region=region)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        img_media, img_data = self.process_image(image, region) 
         # if not self.is_base64(img_data):
         #     return None
 
-        model_id = 'claude-3-5-sonnet-20241022' 
-        return self.client.messages.create(
-            model=model_id,
-            max_tokens=1024,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": img_media,
-                                "data": img_data,
-                            },
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": img_media,
+                            "data": img_data,
                         },
-                        {
-                            "type": "text",
-                            "text": user_prompt
-                        }
-                    ],
-                }
-            ],
-        )
+                    },
+                    {
+                        "type": "text",
+                        "text": user_prompt
+                    }
+                ],
+            }
+        ]
+        estimate = estimate_tokens(messages)
+        # Cache hits returned above, so this is the request itself
+        with VLM_SECONDS.labels(self.name, "preprocessed" if VLM_PREPROCESS else "raw").time():
+            message = self.scheduler.call(
+                lambda: self.client.messages.create(model=model_id, max_tokens=1024, messages=messages),
+                lane=self.lane, tokens=estimate)
+        self.scheduler.settle(estimate, message.usage.input_tokens)
+        description = "".join(block.text for block in message.content if block.type == "text")
+        self.cache.put(cache_key, description)
+        return description
 
-    def _llm_call(self,user_prompt, system_prompt=None ): 
+    def _llm_call(self,user_prompt, system_prompt=None, max_tokens=64000, budget_tokens=32000, system=None): 
         system_prompt = 'user' if not system_prompt else system_prompt
-        res = ''
-        with self.client.messages.stream(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=64000,
-            thinking={
+        cache_key = self.cache.make_key("llm", user_prompt, frame=self.screen_state,
+                                        model=LLM_MODEL, role=system_prompt, budget=budget_tokens, system=system)
+        span = tracing.current_span()
+        # A cached answer would replay the move that led back here and lock the loop in
+        cached = None if self.skip_cache else self.cache.get(cache_key)
+        self.last_response_cached = cached is not None
+        self.reasoning_pending = False
+        if cached is not None:
+            if span is not None:
+                span.set("cached", True)
+            return cached
+        
+        # Trivial decisions skip extended thinking altogether
+        options = {}
+        if budget_tokens:
+            options["thinking"] = {
                 "type": "enabled",
-                "budget_tokens": 32000
-            },
-            messages=[
-                {"role": system_prompt, "content": user_prompt}
-            ]
-        ) as stream: 
-            for text in stream.text_stream:
-                print(text, end="", flush=True)
-                res += text 
-
-        return res
+                "budget_tokens": budget_tokens
+            }
+        if system:
+            options["system"] = system
+        
+        messages = [
+            {"role": system_prompt, "content": user_prompt}
+        ]
+        
+        def open_stream():
+            manager = self.client.messages.stream(model=LLM_MODEL, max_tokens=max_tokens, messages=messages, **options)
+            return manager, manager.__enter__()
+        
+        parser = StreamingActionParser()
+        first_token = None
+        estimate = estimate_tokens(messages, system)
+        start = time.perf_counter()
+        manager, stream = self.scheduler.call(open_stream, lane=self.lane, tokens=estimate)
+        try:
+            events = iter(stream)
+            for event in events:
+                if event.type != "content_block_delta":
+                    continue
+                if first_token is None:
+                    # Thinking or text, whichever the model streams first
+                    first_token = time.perf_counter() - start
+                    if span is not None:
+                        span.mark("first_token")
+                if event.delta.type == "text_delta" and parser.feed(event.delta.text) and self.early_exit != "off":
+                    break
+        except BaseException:
+            manager.__exit__(None, None, None)
+            raise
+        
+        usage = stream.current_message_snapshot.usage
+        self._record_prompt_cache(usage, first_token)
+        self.scheduler.settle(estimate, usage.input_tokens + (getattr(usage, "cache_creation_input_tokens", None) or 0))
+        if not parser.done or self.early_exit == "off":
+            # The stream ran to the end
+            manager.__exit__(None, None, None)
+            self.cache.put(cache_key, parser.text)
+            return parser.text
         
+        committed = time.perf_counter()
+        if span is not None:
+            span.mark("action")
+        EARLY_EXITS.labels(self.name, self.early_exit).inc()
+        if self.early_exit == "background":
+            # Let the reasoning finish off the decision path; it is published as commentary when done
+            self.reasoning_pending = True
+            self._stream_executor.submit(self._finish_stream, manager, events, parser, cache_key, committed)
+        else:
+            # Closing the response stops generation; the action is all we need
+            manager.__exit__(None, None, None)
+            self.cache.put(cache_key, parser.text)
+        return parser.text
+    
+    def _finish_stream(self, manager, events, parser, cache_key, committed):
+        """Drain a stream whose action was already committed."""
+        try:
+            for event in events:
+                if event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    parser.feed(event.delta.text)
+        except Exception as e:
+            logger.error(f"Error finishing LLM stream: {e}")
+            return
+        finally:
+            manager.__exit__(None, None, None)
+        
+        saved = time.perf_counter() - committed
+        EARLY_EXIT_SAVED_SECONDS.labels(self.name).observe(saved)
+        self.cache.put(cache_key, parser.text)
+        logger.info(f"Full reasoning arrived {saved:.2f}s after the action was committed: {parser.text.strip()}")
+        reasoning = self._extract_reasoning(parser.text)
+        if reasoning and self.on_reasoning is not None:
+            try:
+                self.on_reasoning(self, reasoning)
+            except Exception as e:
+                logger.error(f"Error publishing reasoning: {e}")
+    
+    def _record_prompt_cache(self, usage, first_token):
+        """Count prompt cache use and time to first token by cache outcome."""
+        read = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        PROMPT_CACHE_TOKENS.labels(self.name, "read").inc(read)
+        PROMPT_CACHE_TOKENS.labels(self.name, "write").inc(written)
+        PROMPT_CACHE_TOKENS.labels(self.name, "uncached").inc(usage.input_tokens)
+        
+        outcome = "off" if not PROMPT_CACHE else ("hit" if read else "miss")
+        self.last_first_token = first_token
+        if first_token is not None:
+            LLM_FIRST_TOKEN_SECONDS.labels(self.name, outcome).observe(first_token)
+            logger.info(f"Prompt cache {outcome} (read {read}, wrote {written} tokens), "
+                        f"first token after {first_token:.2f}s")
+    
+    def _system_blocks(self):
+        """
+        Get the system prompt: the stable instructions, then the memory summary.
+        
+        Both blocks are marked cacheable so the instructions stay cached even
+        when the summary changes. The blocks are rebuilt only when it does.
+        """
+        if self._system is None or self._system_summary != self.memory_summary:
+            blocks = [{"type": "text", "text": player_system_prompt()}]
+            if self.memory_summary:
+                blocks.append({"type": "text", "text": f"NOTES FROM EARLIER IN THIS RUN:\n{self.memory_summary}"})
+            if PROMPT_CACHE:
+                for block in blocks:
+                    block["cache_control"] = {"type": "ephemeral"}
+            self._system = blocks
+            self._system_summary = self.memory_summary
+        return self._system
+    
+    def shadow(self):
+        """
+        Get a copy for a side decision. It has its own budget policy, so the
+        decision doesn't settle or count as one of this AI's, and no screen
+        description, since the frame it would describe hasn't been drawn yet.
+        It streams to the end, so its reasoning is complete if it is used.
+        """
+        shadow = super().shadow()
+        shadow.budget_policy = copy.deepcopy(self.budget_policy)
+        shadow.screen_description = None
+        shadow._pending_description = None
+        shadow.on_reasoning = None
+        shadow.early_exit = "off"
+        return shadow
+    
+    def _battle_system_blocks(self):
+        """Get the battle system prompt, marked cacheable; it never changes."""
+        if self._battle_system is None:
+            block = {"type": "text", "text": battle_system_prompt()}
+            if PROMPT_CACHE:
+                block["cache_control"] = {"type": "ephemeral"}
+            self._battle_system = [block]
+        return self._battle_system
+    
     def decide_action(self, game_state, screen_state=None, role="player"):
         """Claude's decision-making logic."""
         # This is a simplified placeholder for Claude's actual decision-making
         # In a real implementation, this would connect to Claude's API
         
         self.update_state(game_state, screen_state)
-        if screen_state:
-            loc = self.game_state.get('location', '')
-            coord = self.game_state.get('coordinates', '')
-            vlm_user_prompt = get_vlm_user_prompt(loc, coord)
-            vlm_out = self._vlm_call(vlm_user_prompt, screen_state)
-            self.screen_description = vlm_out
-            # logger.info('leecatherine: vlm output:', vlm_out)
+        self.lane = "battle" if role == "pokemon" or game_state.get("battle_type") else "overworld"
+        if screen_state is not None:
+            frame_hash = dhash(screen_state)
+            if self._screen_changed(frame_hash):
+                # Describe the screen in the background; _decide_player_action
+                # collects the result once the rest of its context is built
+                self._pending_description = self._vlm_executor.submit(
+                    tracing.run_in_context(self._describe_screen, screen_state))
+                self._described_hash = frame_hash
+                self._described_map = self.game_state.get("map_id")
+                self._described_text = self._text_screen()
+                self._description_reuses = 0
+                self.vlm_calls += 1
+                VLM_GATE.labels(self.name, "described").inc()
+            else:
+                self._description_reuses += 1
+                self.vlm_skips += 1
+                VLM_GATE.labels(self.name, "reused").inc()
+            
+            if (self.vlm_calls + self.vlm_skips) % VLM_GATE_REPORT_EVERY == 0:
+                self._log_vlm_gate()
 
 
         # VLM here to process screen_state
@@ -254,6 +589,65 @@ class ClaudeAI(PokemonAI):
   
     
     
+    def _text_screen(self):
+        """Get whether a dialogue box and a menu are open."""
+        return bool(self.game_state.get("dialogue_open")), bool(self.game_state.get("menu_open"))
+    
+    def _screen_changed(self, frame_hash):
+        """Decide whether a frame needs a fresh VLM description."""
+        if self.screen_description is None or self._described_hash is None:
+            return True
+        if self.game_state.get("map_id") != self._described_map:
+            return True
+        text_screen = self._text_screen()
+        if any(text_screen) or text_screen != self._described_text:
+            # Dialogue pages and menus differ only in their text, which the dhash can't see
+            return True
+        if self._description_reuses >= VLM_MAX_REUSES:
+            return True
+        return hamming_distance(frame_hash, self._described_hash) > VLM_SKIP_DISTANCE
+    
+    def _log_vlm_gate(self):
+        """Log how often the previous screen description was reused."""
+        total = self.vlm_calls + self.vlm_skips
+        average = self.vlm_seconds / self.vlm_calls if self.vlm_calls else 0.0
+        logger.info(
+            f"{self.name} VLM gate: reused {self.vlm_skips}/{total} descriptions "
+            f"({self.vlm_skips / total:.0%}), saved ~{self.vlm_skips * average:.1f}s"
+        )
+    
+    def _describe_screen(self, screen_state):
+        """Run the VLM over the current frame."""
+        loc = self.game_state.get('location', '')
+        coord = self.game_state.get('coordinates', '')
+        if self.game_state.get("battle_type") in (1, 2):
+            vlm_user_prompt = get_vlm_battle_prompt()
+        else:
+            vlm_user_prompt = get_vlm_user_prompt(loc, coord)
+        region = self._vlm_region(self.game_state)
+        start = time.perf_counter()
+        try:
+            with self.stage('vlm') as span:
+                span.set("region", region or "full")
+                return self._vlm_call(vlm_user_prompt, screen_state, region)
+        finally:
+            self.vlm_seconds += time.perf_counter() - start
+    
+    def _collect_screen_description(self):
+        """Wait for a pending VLM call and store its result."""
+        pending, self._pending_description = self._pending_description, None
+        if pending is None:
+            return
+        try:
+            self.screen_description = pending.result()
+        except CircuitOpenError:
+            # Keep the last description until the API is back
+            pass
+        except Exception as e:
+            logger.error(f"Error calling VLM: {e}")
+            # Describe the next frame rather than reusing a stale description
+            self._described_hash = None
+    
     def _decide_player_action(self):
         """
         Advanced movement and exploration strategy using Claude 3.7 Sonnet reasoning.
@@ -271,38 +665,59 @@ class ClaudeAI(PokemonAI):
         logger.info(f'Game State: {json.dumps(self.game_state, indent=2)}')
         
         # Create context for the LLM
-        context = self._build_game_context(location, coordinates, pokemon_team, badges, money, items)
+        with self.stage('context'):
+            memory = self._recall_episodes()
+            system = self._system_blocks()
+            context = self._build_game_context(location, coordinates, pokemon_team, badges, money, items)
+            changes = self._describe_state_changes()
+            
+            # Prepare action history for context
+            action_history = self._format_action_history()
         
-        # Prepare action history for context
-        action_history = self._format_action_history()
+        # The VLM has been running while we built the context
+        self._collect_screen_description()
         
-        # Generate prompt for the LLM
+        # Only this part changes between turns; the instructions and the
+        # objectives for every stage of the game are in the cached system prompt
         prompt = f"""
-        You are playing Pokémon Red. Based on the following game state, decide the next optimal action.
-        
         CURRENT GAME STATE:
         {context}
         
+        CHANGED SINCE LAST TURN:
+        {changes}
+        
         RECENT ACTIONS:
         {action_history}
         
+        LAST TIME AT THIS SPOT:
+        {memory}
+        
         SCREEN DESCRIPTION:
-        {self.screen_description if hasattr(self, 'screen_description') else 'No screen description available'}
+        {self.screen_description or 'No screen description available'}
         
-        What should be the next action? Choose one: up, down, left, right, a, b, start, select.
-        Provide your reasoning and then your final decision in the format:
-        REASONING: [your strategic thinking]
-        ACTION: [chosen action]
+        What should be the next action?
         """
         
+        tier, budget = self.budget_policy.choose(self.game_state)
+        logger.info(f"Thinking tier: {tier} (budget {budget['budget_tokens']})")
+        
         try:
             # Call the LLM with the prompt
-            response = self._llm_call(user_prompt=prompt)
+            with self.stage('llm') as span:
+                span.set("tier", tier)
+                start = time.perf_counter()
+                response = self._llm_call(user_prompt=prompt, system=system, **budget)
+                self.budget_policy.finish(time.perf_counter() - start, cached=self.last_response_cached)
             
-            logger.info(f'Reasoning raw output:', {response}) 
+            self.llm_decisions += 1
+            if self.llm_decisions % BUDGET_REPORT_EVERY == 0:
+                self.budget_policy.log_report()
+            
+            logger.info(f'Reasoning raw output: {response}')
 
             # Parse the LLM response
-            action, reasoning = self._parse_llm_response(response)
+            with self.stage('parse'):
+                action, reasoning = self._parse_llm_response(response)
             
             # If we couldn't get a valid action from the LLM, fall back to basic exploration
             if not action:
@@ -310,12 +725,36 @@ class ClaudeAI(PokemonAI):
             
             return action, reasoning
         
+        except CircuitOpenError as e:
+            logger.info(f"{e}; exploring without the LLM")
+            return self._fallback_exploration()
         except Exception as e:
             logger.error(f"Error calling LLM: {e}")
             return self._fallback_exploration()
 
+    def _recall_episodes(self):
+        """
+        Look up what happened at this spot on earlier visits.
+        
+        The known walls on this map go into the memory summary, which only
+        changes when a new wall is found or the map changes, so the system
+        prompt stays cacheable.
+        """
+        if self.episodes is None:
+            return "No memory of earlier visits."
+        map_id = self.game_state.get("map_id")
+        self.memory_summary = self.episodes.describe_map(map_id)
+        position = parse_coordinates(self.game_state.get("coordinates"))
+        if position is None:
+            return "Position unknown."
+        return self.episodes.describe_tile(map_id, position)
+    
     def _build_game_context(self, location, coordinates, pokemon_team, badges, money, items):
-        """Build a detailed context description for the LLM."""
+        """Build a detailed context description for the LLM, reusing the last one if nothing changed."""
+        key = repr((location, coordinates, pokemon_team, badges, money, items))
+        if key == self._context_key:
+            return self._context
+        
         # Format Pokémon team information
         team_info = "None" if not pokemon_team else "\n".join([
             f"- {pokemon.get('name', 'UNKNOWN')} (Lv.{pokemon.get('level', '?')}) "
@@ -332,10 +771,8 @@ class ClaudeAI(PokemonAI):
         # Game progress indicators
         progress = f"Badges: {badges}/8"
         
-        # Determine current game objectives based on location and progress
-        objectives = self._determine_current_objectives(location, badges, pokemon_team)
-        
-        return f"""
+        self._context_key = key
+        self._context = f"""
         Location: {location}
         Coordinates: {coordinates}
         Money: ${money}
@@ -346,40 +783,25 @@ class ClaudeAI(PokemonAI):
         
         Items:
         {items_info}
-        
-        Current Objectives:
-        {objectives}
         """
-
-    def _determine_current_objectives(self, location, badges, pokemon_team):
-        """Determine what the player should be trying to accomplish based on game state."""
-        # Early game objectives
-        if badges == 0:
-            if "Pallet Town" in location and not pokemon_team:
-                return "- Get your first Pokémon from Professor Oak's Lab\n- Begin your journey to become a Pokémon Master"
-            elif "Pallet Town" in location and pokemon_team:
-                return "- Head north to Route 1\n- Travel to Viridian City"
-            elif "Route 1" in location:
-                return "- Travel north to Viridian City\n- Train your starter Pokémon"
-            elif "Viridian City" in location:
-                return "- Visit the Pokémon Center to heal\n- Stock up on supplies\n- Head north to Viridian Forest"
-            elif "Viridian Forest" in location:
-                return "- Navigate through the forest\n- Catch Bug-type Pokémon\n- Reach Pewter City"
-            elif "Pewter City" in location:
-                return "- Challenge Brock at the Pewter Gym\n- Aim to earn your first badge"
-    
-        # Mid-game objectives based on badge count
-        elif badges == 1:
-            return "- Head east to Mt. Moon\n- Make your way to Cerulean City\n- Prepare to challenge Misty"
-        elif badges == 2:
-            return "- Explore east of Cerulean\n- Head south to Vermilion City\n- Prepare to battle Lt. Surge"
-        
-        # Late game progression
-        elif badges >= 6:
-            return "- Prepare for the Elite Four\n- Train your team to higher levels\n- Ensure balanced type coverage"
-        
-        # Default objectives
-        return "- Explore the current area\n- Train your Pokémon\n- Find and challenge the next Gym Leader"
+        return self._context
+    
+    def _describe_state_changes(self):
+        """Describe which game state fields changed since the last prompt."""
+        previous, self._prompt_state = self._prompt_state, {
+            key: value for key, value in self.game_state.items() if key != "steps"
+        }
+        if previous is None:
+            return "First turn."
+        
+        changes = []
+        for key, value in self._prompt_state.items():
+            if previous.get(key) != value:
+                if isinstance(value, (list, dict)):
+                    changes.append(f"- {key} changed")
+                else:
+                    changes.append(f"- {key}: {previous.get(key)} -> {value}")
+        return "\n".join(changes) if changes else "Nothing changed."
 
     def _format_action_history(self):
         """Format recent actions for context."""
@@ -387,7 +809,7 @@ class ClaudeAI(PokemonAI):
             return "No previous actions recorded."
         
         # Take the last 10 actions
-        recent_actions = self.previous_actions[-10:]
+        recent_actions = list(self.previous_actions)[-10:]
         formatted_actions = []
         
         for action in recent_actions:
@@ -400,23 +822,48 @@ class ClaudeAI(PokemonAI):
         return "\n".join(formatted_actions)
 
     def _parse_llm_response(self, response):
-        """Extract the action and reasoning from the LLM response."""
+        """
+        Extract the decision and reasoning from the LLM response.
+        
+        The decision is a single button (ACTION: up), a list of moves
+        (PLAN: up, up, left) or a list of moves toward a tile (GOAL: 12,4).
+        """
         try:
-            # Extract action from the response
-            action_match = re.search(r"ACTION:\s*(\w+)", response, re.IGNORECASE)
-            reasoning_match = re.search(r"REASONING:\s*(.*?)(?=ACTION:|$)", response, re.IGNORECASE | re.DOTALL)
+            # Extract the first decision line from the response
+            decision_match = re.search(r"(ACTION|PLAN|GOAL):\s*([^\n]*)", response, re.IGNORECASE)
             
-            if action_match:
-                action = action_match.group(1).lower()
+            if not decision_match:
+                logger.warning("No action found in LLM response")
+                return None, None
+            
+            kind = decision_match.group(1).upper()
+            value = decision_match.group(2).strip().strip("[]").lower()
+            if kind == "ACTION":
+                action = value.split()[0] if value else ""
                 # Validate action is one of the allowed buttons
-                if action not in ["up", "down", "left", "right", "a", "b", "start", "select"]:
+                if action not in VALID_ACTIONS:
                     logger.warning(f"Invalid action received from LLM: {action}")
                     return None, None
+            elif kind == "PLAN":
+                action = [move for move in re.split(r"[\s,]+", value) if move][:MAX_PLAN_LENGTH]
+                if not action or any(move not in MOVES for move in action):
+                    logger.warning(f"Invalid plan received from LLM: {value}")
+                    return None, None
             else:
-                logger.warning("No action found in LLM response")
-                return None, None
+                goal = parse_coordinates(value)
+                start = parse_coordinates(self.game_state.get("coordinates"))
+                if goal is None or start is None:
+                    logger.warning(f"Invalid goal received from LLM: {value}")
+                    return None, None
+                action = moves_toward(start, goal)
+                if not action:
+                    logger.warning(f"Goal {goal} is where the player already is")
+                    return None, None
             
-            reasoning = reasoning_match.group(1).strip() if reasoning_match else "Strategic movement based on analysis."
+            reasoning = self._extract_reasoning(response)
+            if not reasoning:
+                # With an early exit the reasoning is still streaming; it follows as its own commentary
+                reasoning = "Reasoning to follow..." if self.reasoning_pending else "Strategic movement based on analysis."
             
             return action, reasoning
         
@@ -424,6 +871,11 @@ class ClaudeAI(PokemonAI):
             logger.error(f"Error parsing LLM response: {e}")
         return None, None
 
+    def _extract_reasoning(self, response):
+        """Get the REASONING section of a response, or None if it has none (yet)."""
+        match = re.search(r"REASONING:\s*(.*?)(?=ACTION:|PLAN:|GOAL:|$)", response, re.IGNORECASE | re.DOTALL)
+        return match.group(1).strip() if match and match.group(1).strip() else None
+
     def _simulated_claude_response(self, prompt):
         """Generate a simulated Claude response for testing without API access."""
         # Extract key information from prompt to inform the simulated response
@@ -465,7 +917,7 @@ class ClaudeAI(PokemonAI):
     def _fallback_exploration(self):
         """Fallback strategy when LLM fails or is unavailable."""
         # Avoid repeating the last direction
-        recent_moves = self.previous_actions[-3:] if self.previous_actions else []
+        recent_moves = list(self.previous_actions)[-3:]
         
         # Extract just the direction part if we have tuples
         recent_directions = []
@@ -497,7 +949,77 @@ class ClaudeAI(PokemonAI):
 
 
     def _decide_pokemon_action(self):
-        """Claude's battle strategy."""
+        """
+        Battle strategy using Claude 3.7 Sonnet reasoning.
+        Goes through the same thinking budget policy as exploration, so a
+        trainer or gym battle gets the full budget and a wild battle less.
+        """
+        location = self.game_state.get("location", "Unknown")
+        coordinates = self.game_state.get("coordinates", "")
+        pokemon_team = self.game_state.get("pokemon_team", [])
+        badges = self.game_state.get("badges", 0)
+        money = self.game_state.get("money", 0)
+        items = self.game_state.get("items", [])
+        battle = "Trainer battle" if self.game_state.get("battle_type") == 2 else "Wild battle"
+        
+        with self.stage('context'):
+            system = self._battle_system_blocks()
+            context = self._build_game_context(location, coordinates, pokemon_team, badges, money, items)
+            changes = self._describe_state_changes()
+            action_history = self._format_action_history()
+        
+        self._collect_screen_description()
+        
+        prompt = f"""
+        BATTLE: {battle}
+        
+        CURRENT GAME STATE:
+        {context}
+        
+        CHANGED SINCE LAST TURN:
+        {changes}
+        
+        RECENT ACTIONS:
+        {action_history}
+        
+        SCREEN DESCRIPTION:
+        {self.screen_description or 'No screen description available'}
+        
+        What should be the next button press?
+        """
+        
+        tier, budget = self.budget_policy.choose(self.game_state)
+        logger.info(f"Battle thinking tier: {tier} (budget {budget['budget_tokens']})")
+        
+        try:
+            with self.stage('llm') as span:
+                span.set("tier", tier)
+                start = time.perf_counter()
+                response = self._llm_call(user_prompt=prompt, system=system, **budget)
+                self.budget_policy.finish(time.perf_counter() - start, cached=self.last_response_cached)
+            
+            self.llm_decisions += 1
+            if self.llm_decisions % BUDGET_REPORT_EVERY == 0:
+                self.budget_policy.log_report()
+            
+            with self.stage('parse'):
+                action, reasoning = self._parse_llm_response(response)
+            
+            # Walking plans mean nothing in a battle menu
+            if not action or isinstance(action, list):
+                return self._fallback_battle()
+            
+            return action, reasoning
+        
+        except CircuitOpenError as e:
+            logger.info(f"{e}; battling without the LLM")
+            return self._fallback_battle()
+        except Exception as e:
+            logger.error(f"Error calling LLM: {e}")
+            return self._fallback_battle()
+    
+    def _fallback_battle(self):
+        """Fallback battle strategy when the LLM fails or is unavailable."""
         # Get current Pokémon info
         pokemon_team = self.game_state.get("pokemon_team", [])
         
@@ -525,13 +1047,47 @@ class AIManager:
     Manager class for handling multiple AIs and coordinating their actions.
     """
     
-    def __init__(self):
-        """Initialize the AI Manager."""
+    def __init__(self, transport=None):
+        """
+        Initialize the AI Manager.
+        
+        Args:
+            transport: How to observe and drive the game (see transport.py);
+                defaults to the game server's HTTP API
+        """
+        if transport is None:
+            from transport import HttpTransport
+            transport = HttpTransport()
+        self.transport = transport
         self.grok = GrokAI()
         self.claude = ClaudeAI()
         self.active_player_ai = self.claude  # Default player AI
         self.active_pokemon_ai = self.claude  # Default Pokémon AI
         self.dual_mode = False  # Whether dual AI mode is enabled
+        
+        # What every step did, by map and position, shared by both AIs
+        self.episodes = EpisodeStore(EPISODE_DB_PATH or None)
+        self.grok.episodes = self.claude.episodes = self.episodes
+        self._last_step = None
+        
+        # Loops and zero-progress streaks, and the recoveries started for them
+        self.stuck = StuckDetector()
+        
+        # Reasoning that streams in after an early-committed action goes out as its own commentary
+        self.claude.on_reasoning = self._publish_reasoning
+        
+        # Deterministic rules tried before the AI
+        self.rules = RulePolicy()
+        self.tier_counts = {}
+        
+        # Progress, for model calls per tile walked
+        self.tiles_moved = 0
+        self._last_position = None
+        
+        # Dual mode: the battle AI's first decision, prepared while a battle looks likely
+        self._speculation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="battle-speculation")
+        self._speculation = None
+        self._was_in_battle = False
     
     def set_active_player_ai(self, ai_name):
         """Set the active player AI."""
@@ -562,17 +1118,169 @@ class AIManager:
         self.dual_mode = enabled
         logger.info(f"Dual AI mode {'enabled' if enabled else 'disabled'}")
     
+    def set_route_plan(self, moves, reason=None):
+        """Walk the given directions without consulting the AI (see rules.py)."""
+        self.rules.set_route_plan(moves, reason)
+    
+    def tier_report(self):
+        """Get the fraction of steps decided by each rule and by the AI."""
+        total = sum(self.tier_counts.values())
+        return {tier: count / total for tier, count in self.tier_counts.items()} if total else {}
+    
+    def calls_per_tile(self):
+        """Get AI decisions per tile of progress, or None before the player has moved."""
+        return self.tier_counts.get("ai", 0) / self.tiles_moved if self.tiles_moved else None
+    
+    def _track_progress(self, game_state):
+        position = parse_coordinates(game_state.get("coordinates"))
+        if position is None:
+            return
+        current = (game_state.get("map_id"), position)
+        last, self._last_position = self._last_position, current
+        if last is None or last == current:
+            return
+        # A map change is a door or warp: count it as one tile
+        tiles = 1 if last[0] != current[0] else tile_distance(last[1], position)
+        self.tiles_moved += tiles
+        TILES_MOVED.inc(tiles)
+    
+    def _record_episode(self, game_state):
+        """Store what the previous step did, now that game_state shows its outcome."""
+        last, self._last_step = self._last_step, None
+        if last is not None:
+            before, action, frame_hash = last
+            self.episodes.record(before, action, game_state, frame_hash)
+    
+    def _frame_hash(self, screen_state):
+        if screen_state is None:
+            return None
+        try:
+            return dhash(screen_state)
+        except Exception as e:
+            logger.debug(f"Could not hash the frame: {e}")
+            return None
+    
+    def _recover(self, game_state, frame_hash, in_battle):
+        """
+        Check the step for loops and start a recovery if there is one.
+        
+        Returns:
+            Actions to take right away, or None to carry on deciding (a
+            frontier walk is queued as a route plan for the rules to follow).
+        """
+        kind = self.stuck.observe(game_state, frame_hash, in_battle)
+        if kind is None:
+            return None
+        
+        if game_state.get("text_box_open"):
+            self.stuck.recovering(kind, "menu_escape")
+            self.rules.clear_route_plan()
+            return list(MENU_ESCAPE)
+        
+        walk = frontier_walk(self.episodes, game_state)
+        if walk:
+            self.stuck.recovering(kind, "frontier")
+            self.rules.set_route_plan(walk, "Going in circles here; trying somewhere new.")
+            return None
+        
+        # Walled in on every side we know of: let the model think it through
+        self.stuck.recovering(kind, "think_harder")
+        policy = getattr(self.active_player_ai, "budget_policy", None)
+        if policy is not None:
+            policy.escalate(game_state)
+        return None
+    
+    def _battle_likely(self, game_state):
+        """Guess the type of battle that may start in the next few steps, or None."""
+        if game_state.get("scripted_movement"):
+            return 2  # most likely a trainer walking over after spotting the player
+        if game_state.get("in_grass"):
+            return 1
+        return None
+    
+    def _speculate(self, game_state):
+        """Start a speculative first battle decision if a battle looks likely, or drop a stale one."""
+        predicted = self._battle_likely(game_state)
+        if predicted is None:
+            self._discard_speculation()
+            return
+        
+        team = repr(game_state.get("pokemon_team"))
+        if self._speculation and (self._speculation["battle_type"], self._speculation["team"]) == (predicted, team):
+            return
+        self._discard_speculation()
+        
+        # The shadow gets its own game_state and history, so the player AI's view is
+        # untouched even when the same AI plays both roles
+        shadow = self.active_pokemon_ai.shadow()
+        predicted_state = dict(game_state, battle_type=predicted, in_grass=False, scripted_movement=False)
+        future = self._speculation_executor.submit(
+            tracing.run_in_context(shadow.decide_action, predicted_state, None, "pokemon"))
+        self._speculation = {"future": future, "battle_type": predicted, "team": team}
+        SPECULATIONS.labels("started").inc()
+    
+    def _discard_speculation(self):
+        if self._speculation is not None:
+            self._speculation["future"].cancel()
+            self._speculation = None
+            SPECULATIONS.labels("discarded").inc()
+    
+    def _take_speculation(self, game_state):
+        """Get the speculative decision if it was prepared for the battle that started."""
+        speculation = self._speculation
+        if speculation is None:
+            return None
+        if (speculation["battle_type"], speculation["team"]) != (game_state.get("battle_type"),
+                                                                  repr(game_state.get("pokemon_team"))):
+            self._discard_speculation()
+            return None
+        
+        self._speculation = None
+        try:
+            decision = speculation["future"].result()
+        except Exception as e:
+            logger.error(f"Error in speculative battle decision: {e}")
+            SPECULATIONS.labels("discarded").inc()
+            return None
+        SPECULATIONS.labels("used").inc()
+        return decision
+    
+    def _count_tier(self, tier):
+        self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+        DECISION_TIER.labels(tier).inc()
+        span = tracing.current_span()
+        if span is not None:
+            span.set("tier", tier)
+        if sum(self.tier_counts.values()) % TIER_REPORT_EVERY == 0:
+            shares = ", ".join(f"{tier} {share:.0%}" for tier, share in sorted(self.tier_report().items()))
+            calls_per_tile = self.calls_per_tile()
+            if calls_per_tile is not None:
+                shares += f"; {calls_per_tile:.2f} AI decisions per tile walked"
+            logger.info(f"Decision tiers: {shares}")
+    
     def get_action(self, game_state, screen_state=None):
         """
         Get the next action from the appropriate AI based on game state.
         
+        Cheap deterministic rules (advancing dialogue, following a route plan)
+        are tried first; the AI is only asked when none of them applies.
+        
         In dual mode, this selects between player AI and Pokémon AI based on
         whether the game is in a battle or not.
         
         In single mode, it always uses the player AI regardless of game state.
         """
+        frame_hash = self._frame_hash(screen_state)
+        self._track_progress(game_state)
+        self._record_episode(game_state)
+        
         # Determine if we're in a battle
         in_battle = self._is_in_battle(game_state)
+        battle_start = in_battle and not self._was_in_battle
+        self._was_in_battle = in_battle
+        if self.dual_mode and SPECULATE_BATTLES and not in_battle:
+            # Runs alongside the player AI's decision below
+            self._speculate(game_state)
         
         if self.dual_mode and in_battle:
             # We're in a battle, use the Pokémon AI
@@ -590,85 +1298,307 @@ class AIManager:
                 # In single mode, make it clear if we're in battle or not
                 prefix = f"[{ai.name}] " if not in_battle else f"[{ai.name} in Battle] "
         
+        escape = self._recover(game_state, frame_hash, in_battle)
+        if escape is not None:
+            self._count_tier("menu_escape")
+            for move in escape:
+                ai.record_action(move)
+            self._last_step = (game_state, escape, frame_hash)
+            return escape, "[Autopilot] Stuck on this screen; backing out."
+        
+        decision = self.rules.decide(game_state, in_battle)
+        if decision is not None:
+            tier, action, commentary = decision
+            self._count_tier(tier)
+            ai.record_action(action)
+            self._last_step = (game_state, action, frame_hash)
+            return action, f"[Autopilot] {commentary}"
+        
         # Get the AI's decision
-        action, commentary = ai.decide_action(game_state, screen_state, role)
+        start = time.perf_counter()
+        decision = self._take_speculation(game_state) if battle_start and self.dual_mode else None
+        if decision is not None:
+            action, commentary = decision
+        else:
+            ai.skip_cache = self.stuck.looping
+            with AI_DECISION_SECONDS.labels(ai.name, 'total').time():
+                action, commentary = ai.decide_action(game_state, screen_state, role)
+        if battle_start:
+            BATTLE_START_SECONDS.labels("yes" if decision is not None else "no").observe(time.perf_counter() - start)
+        self._count_tier("ai")
         
-        # Record the action
-        ai.record_action(action)
+        # Record the action (each move of a plan)
+        for move in (action if isinstance(action, list) else [action]):
+            ai.record_action(move)
+        self._last_step = (game_state, action, frame_hash)
         
         # Add AI name prefix to commentary
         commentary = prefix + commentary
         
         return action, commentary
     
+    def step(self, use_screen=True):
+        """
+        Run one observe-decide-act step through the transport.
+        
+        Returns:
+            action, commentary and the transport's execute result
+        """
+        with tracing.span("step"):
+            if use_screen:
+                state, screen = self.transport.observe()
+            else:
+                state, screen = self.transport.get_state(), None
+            
+            with tracing.span("decide"):
+                action, commentary = self.get_action(state, screen_state=screen)
+            with tracing.span("execute", action=action):
+                result = self.execute(action, commentary, state)
+        return action, commentary, result
+    
+    def execute(self, action, commentary=None, state=None):
+        """Execute a single action, or a plan (a list of moves) through execute_plan."""
+        if isinstance(action, list):
+            return self.execute_plan(action, commentary, state)
+        return self.transport.execute_action(action, commentary)
+    
+    def execute_plan(self, plan, commentary=None, state=None):
+        """
+        Execute a multi-move plan with checkpoints.
+        
+        The moves are sent PLAN_CHECKPOINT_EVERY at a time with
+        execute_sequence. After each batch the actual state is compared with
+        where the plan should have taken the player; on any divergence (wall,
+        NPC, door, text box, battle) the rest of the plan is dropped so the AI
+        replans from the new state.
+        
+        Args:
+            plan: Moves ("up", "down", "left", "right")
+            commentary: Commentary for the plan
+            state: Game state the plan was made from
+        """
+        start = parse_coordinates(state.get("coordinates")) if state else None
+        expected = expected_positions(start, plan) if start is not None else None
+        results = []
+        for offset in range(0, len(plan), PLAN_CHECKPOINT_EVERY):
+            batch = plan[offset:offset + PLAN_CHECKPOINT_EVERY]
+            result = self.transport.execute_sequence(batch, commentary if offset == 0 else None)
+            results.extend(result.get("results", []))
+            if not result.get("success", False):
+                return dict(result, results=results, actions=plan[:offset + len(batch)], aborted="execution failed")
+            
+            done = offset + len(batch)
+            if expected is None or done == len(plan):
+                # Nothing to compare against, or nothing left to abort
+                continue
+            with tracing.span("plan_checkpoint"):
+                problem = plan_divergence(state, self.transport.get_state(), expected[done - 1])
+            if problem:
+                logger.info(f"Plan aborted after {done} of {len(plan)} moves: {problem}")
+                PLAN_MOVES.labels("aborted").inc(len(plan) - done)
+                PLAN_MOVES.labels("executed").inc(done)
+                return {"success": True, "results": results, "actions": plan[:done], "aborted": problem}
+        
+        PLAN_MOVES.labels("executed").inc(len(plan))
+        return {"success": True, "results": results, "actions": plan}
+    
+    def _publish_reasoning(self, ai, reasoning):
+        """Send reasoning that finished streaming after its action as commentary."""
+        self.transport.add_commentary(f"[{ai.name}] {reasoning}")
+    
     def _is_in_battle(self, game_state):
         """Determine if the game is currently in a battle."""
-        # This is a simplified placeholder - would need game-specific logic
-        # Could check for battle indicator in game_state or screen_state
-        # For now, we'll use a simple heuristic
+        if "battle_type" in game_state:
+            # Read from memory by the emulator: 1 is a wild battle, 2 a trainer battle
+            return game_state["battle_type"] in (1, 2)
+        
+        # Older servers don't report it, so fall back to a simple heuristic
         if "battle" in str(game_state).lower() or game_state.get("screen", "") == "battle":
             return True
         return False
 
 
-def get_game_screenshot():
-    """Get screenshot from the API."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/screenshot")
-        return response.content
-    except Exception as e:
-        logger.error(f"Error getting game status during get_game_screenshot: {e}")
-        return {"status": "error"}
-    
-def get_game_status():
-    """Get the current game status from the API."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/status")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error getting game status: {e}")
-        return {"status": "error"}
-
-def get_game_state():
-    """Get the current game state from the API."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/state")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error getting game state: {e}")
-        return {}
-
-def execute_action(action, commentary=None):
-    """Execute a single game action with optional commentary."""
-    data = {"action": action}
-    if commentary:
-        data["commentary"] = commentary
+class GameObserver:
+    """
+    Keeps a fresh (state, screenshot) observation prefetched in the background.
     
+    Long-polls /api/state so state changes are seen as soon as they happen,
+    and tracks when the game last changed so callers can wait for it to go
+    idle instead of sleeping for a fixed time. While a caller waits, the
+    screenshot is fetched alongside each long poll, late in the idle window,
+    and kept if the state didn't change before the poll returned. The frame
+    is then already in hand when the game is found idle.
+    """
+    
+    def __init__(self, client, idle_window=0.3):
+        """Initialize the observer over an AsyncPokemonClient."""
+        self.client = client
+        self.idle_window = idle_window
+        self.state = None
+        self.last_change = 0.0
+        self.last_poll = 0.0
+        self.frame = None  # task fetching a frame taken while the state was still
+        self._changed = asyncio.Event()
+        self._task = None
+        self._waiting = False
+    
+    def start(self):
+        """Start polling in the background."""
+        self._task = asyncio.create_task(self._poll())
+    
+    async def stop(self):
+        """Stop polling."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def _fetch_frame(self, delay):
+        await asyncio.sleep(delay)
+        return await self.client.get_screenshot()
+    
+    def _drop_frame(self):
+        if self.frame is not None:
+            self.frame.cancel()
+            self.frame = None
+    
+    async def _poll(self):
+        while True:
+            prefetch = None
+            if self._waiting and self.state is not None:
+                prefetch = asyncio.create_task(self._fetch_frame(self.idle_window * FRAME_PREFETCH_AT))
+            try:
+                state = await self.client.get_state(wait_for_change=self.state is not None, timeout=self.idle_window)
+            except BaseException:
+                if prefetch is not None:
+                    prefetch.cancel()
+                raise
+            now = time.monotonic()
+            if state != self.state:
+                self.state = state
+                self.last_change = now
+                # Frames from before a change are stale
+                self._drop_frame()
+                if prefetch is not None:
+                    prefetch.cancel()
+            elif prefetch is not None:
+                self._drop_frame()
+                self.frame = prefetch
+            self.last_poll = now
+            self._changed.set()
+            if not state:
+                await asyncio.sleep(self.idle_window)  # server unavailable; don't spin
+    
+    async def wait_until_idle(self, since, max_wait=5.0):
+        """Wait until the game has not changed for idle_window seconds after `since`."""
+        deadline = time.monotonic() + max_wait
+        # Any prefetched frame shows the game before the action
+        self._drop_frame()
+        self._waiting = True
+        try:
+            while time.monotonic() < deadline:
+                now = time.monotonic()
+                if self.last_poll > since and now - max(self.last_change, since) >= self.idle_window:
+                    return True
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=max(0.0, deadline - now))
+                except asyncio.TimeoutError:
+                    break
+            return False
+        finally:
+            self._waiting = False
+    
+    async def observe(self):
+        """Get the prefetched state together with the prefetched screenshot, or a fresh one."""
+        if self.state is None:
+            return await self.client.observe()
+        frame, self.frame = self.frame, None
+        if frame is not None:
+            return self.state, await frame
+        return self.state, await self.client.get_screenshot()
+
+
+async def run_pipeline(manager, client, steps=None, idle_window=0.3, report_every=10):
+    """
+    Pipelined decision loop.
+    
+    The state is prefetched by a GameObserver while the model thinks, the
+    model call runs in a worker thread so the event loop keeps serving I/O,
+    and instead of a fixed sleep the next step starts as soon as the game
+    is idle after the last action.
+    """
+    observer = GameObserver(client, idle_window)
+    observer.start()
+    step = 0
+    window_start = time.monotonic()
     try:
-        response = requests.post(f"{API_BASE_URL}/execute_action", json=data)
-        result = response.json()
-        if result.get("success"):
-            logger.info(f"Action executed: {action}")
-        else:
-            logger.warning(f"Failed to execute action: {action} - {result.get('error')}")
-        return result
-    except Exception as e:
-        logger.error(f"Error executing action: {e}")
-        return {"success": False, "error": str(e)}
-
-def start_game():
-    """Start the game."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/start_game")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error starting game: {e}")
-        return {"success": False, "error": str(e)}
+        state, screen = await observer.observe()
+        while steps is None or step < steps:
+            with tracing.span("step"):
+                with tracing.span("decide"):
+                    action, commentary = await asyncio.to_thread(manager.get_action, state, screen)
+                
+                acted_at = time.monotonic()
+                with tracing.span("execute", action=action):
+                    if isinstance(action, list):
+                        await asyncio.to_thread(manager.execute_plan, action, commentary, state)
+                    else:
+                        await client.execute_action(action, commentary)
+                
+                # Ready for the next step once the action has played out
+                with tracing.span("idle_wait"):
+                    await observer.wait_until_idle(acted_at)
+                state, screen = await observer.observe()
+            
+            step += 1
+            if step % report_every == 0:
+                elapsed = time.monotonic() - window_start
+                logger.info(f"{report_every / elapsed * 60:.1f} decisions/min over the last {report_every} steps")
+                window_start = time.monotonic()
+    finally:
+        await observer.stop()
 
-def demo():
+
+def run_serial(manager, steps=None, delay=SERIAL_STEP_DELAY, report_every=10):
+    """
+    The original serial decision loop, kept for comparison with run_pipeline.
+    
+    Observes, decides and acts one after the other, then sleeps a fixed time.
+    """
+    step = 0
+    window_start = time.monotonic()
+    while steps is None or step < steps:
+        with tracing.span("step"):
+            # Get current game state and screenshot concurrently
+            state, screen = manager.transport.observe()
+            
+            # Get AI's decision
+            with tracing.span("decide"):
+                action, commentary = manager.get_action(state, screen_state=screen)
+            
+            # Execute the action
+            with tracing.span("execute", action=action):
+                manager.execute(action, commentary, state)
+        
+        # Wait a bit before next action
+        time.sleep(delay)
+        
+        step += 1
+        if step % report_every == 0:
+            elapsed = time.monotonic() - window_start
+            logger.info(f"{report_every / elapsed * 60:.1f} decisions/min over the last {report_every} steps")
+            window_start = time.monotonic()
+
+def demo(serial=False):
     """Demo of the AI controller framework."""
     logger.info("Starting AI controller demo")
     
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+    
     # Create AI manager
     manager = AIManager()
     
@@ -684,23 +1614,19 @@ def demo():
         start_game()
         time.sleep(2)  # Wait for game to initialize
     
-    # Run the AIs for a few steps
-    while True:
-        # Get current game state
-        state = get_game_state()
-
-        screen = get_game_screenshot() # should be a PIL image
-        
-        # Get AI's decision
-        action, commentary = manager.get_action(state, screen_state=screen)
-        
-        # Execute the action
-        execute_action(action, commentary)
-        
-        # Wait a bit before next action
-        time.sleep(1)
+    if not serial:
+        # Run the pipelined loop on the shared client's event loop
+        client = get_client()
+        client.run(run_pipeline(manager, client.client))
+        return
+    
+    run_serial(manager)
     
     logger.info("AI controller demo completed")
 
 if __name__ == "__main__":
-    demo() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="AI controller demo")
+    parser.add_argument("--serial", action="store_true",
+                        help="Use the original serial loop with a fixed 1s sleep instead of the pipeline")
+    demo(serial=parser.parse_args().serial) 
\ No newline at end of file
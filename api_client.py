@@ -0,0 +1,319 @@
+"""
+API Client for Grok Plays Pokémon
+Shared client for the game server used by all AI controllers.
+
+AsyncPokemonClient keeps a pool of keep-alive HTTP connections, applies
+timeouts, revalidates the game state with ETags and can subscribe to
+state_update over Socket.IO. PokemonClient wraps it for synchronous callers by
+running the async client on a private event loop thread, and the module-level
+helpers (get_game_state, execute_action, ...) use a shared PokemonClient.
+"""
+
+import asyncio
+import logging
+import threading
+
+import aiohttp
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+API_BASE_URL = "http://localhost:5000/api"
+DEFAULT_TIMEOUT = 10.0  # seconds per request
+MAX_CONNECTIONS = 8  # pooled keep-alive connections per client
+
+
+class AsyncPokemonClient:
+    """Asynchronous client for the game server API."""
+
+    def __init__(self, base_url=API_BASE_URL, timeout=DEFAULT_TIMEOUT, max_connections=MAX_CONNECTIONS):
+        """Initialize the client. The HTTP session is created on first use."""
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session = None
+        self._state = None
+        self._state_etag = None
+        self._socket = None
+        self.latest_state = None  # last state pushed over Socket.IO, if subscribed
+
+    def _get_session(self):
+        # Must be called from the event loop the client runs on
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _request(self, method, path, timeout=None, **kwargs):
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        return self._get_session().request(method, f"{self.base_url}{path}", **kwargs)
+
+    async def get_status(self):
+        """Get the current game status."""
+        try:
+            async with self._request("GET", "/status") as response:
+                return await response.json()
+        except Exception as e:
+            logger.error(f"Error getting game status: {e}")
+            return {"status": "error"}
+
+    async def get_state(self, wait_for_change=False, timeout=15.0):
+        """
+        Get the current game state.
+
+        The last state is revalidated with its ETag, so an unchanged state
+        costs an empty 304. With wait_for_change the server holds the request
+        until the state changes or timeout seconds pass. If the client is
+        subscribed to state_update, the pushed state is returned directly.
+        """
+        if self.latest_state is not None and not wait_for_change:
+            return self.latest_state
+
+        headers = {}
+        if self._state_etag and self._state is not None:
+            headers["If-None-Match"] = self._state_etag
+        params = {"wait_for_change": "1", "timeout": str(timeout)} if wait_for_change else None
+
+        try:
+            request_timeout = self.timeout + (timeout if wait_for_change else 0)
+            with tracing.span("state_wait" if wait_for_change else "state_fetch") as span:
+                async with self._request("GET", "/state", headers=headers, params=params,
+                                         timeout=request_timeout) as response:
+                    span.set("status", response.status)
+                    if response.status == 304:
+                        return self._state
+                    state = await response.json()
+                    self._state = state
+                    self._state_etag = response.headers.get("ETag")
+                    return state
+        except Exception as e:
+            logger.error(f"Error getting game state: {e}")
+            return {}
+
+    async def get_screenshot(self):
+        """Get the current screenshot as PNG bytes, or None on error."""
+        try:
+            with tracing.span("screenshot_fetch"):
+                async with self._request("GET", "/screenshot") as response:
+                    return await response.read()
+        except Exception as e:
+            logger.error(f"Error getting screenshot: {e}")
+            return None
+
+    async def observe(self):
+        """Fetch the game state and screenshot concurrently."""
+        return await asyncio.gather(self.get_state(), self.get_screenshot())
+
+    async def execute_action(self, action, commentary=None):
+        """Execute a single game action with optional commentary."""
+        data = {"action": action}
+        if commentary:
+            data["commentary"] = commentary
+
+        # The pushed state is stale until the server reports the action's effect
+        self.latest_state = None
+        try:
+            async with self._request("POST", "/execute_action", json=data) as response:
+                result = await response.json()
+            if result.get("success"):
+                logger.info(f"Action executed: {action}")
+            else:
+                logger.warning(f"Failed to execute action: {action} - {result.get('error')}")
+            return result
+        except Exception as e:
+            logger.error(f"Error executing action: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def add_commentary(self, commentary):
+        """Add commentary that isn't tied to an action."""
+        try:
+            async with self._request("POST", "/commentary", json={"commentary": commentary}) as response:
+                return await response.json()
+        except Exception as e:
+            logger.error(f"Error adding commentary: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def execute_sequence(self, actions, commentary=None):
+        """Execute a sequence of game actions with optional commentary."""
+        data = {"actions": actions}
+        if commentary:
+            data["commentary"] = commentary
+
+        self.latest_state = None
+        try:
+            async with self._request("POST", "/execute_sequence", json=data) as response:
+                return await response.json()
+        except Exception as e:
+            logger.error(f"Error executing sequence: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def start_game(self):
+        """Start the game."""
+        try:
+            async with self._request("GET", "/start_game") as response:
+                return await response.json()
+        except Exception as e:
+            logger.error(f"Error starting game: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def stop_game(self):
+        """Stop the game."""
+        try:
+            async with self._request("GET", "/stop_game") as response:
+                return await response.json()
+        except Exception as e:
+            logger.error(f"Error stopping game: {e}")
+            return {"success": False, "error": str(e)}
+
+    async def subscribe(self):
+        """
+        Receive state_update pushes over Socket.IO.
+
+        Needs the python-socketio async client. Returns False if it is not
+        available, in which case get_state keeps using HTTP.
+        """
+        try:
+            import socketio
+        except ImportError:
+            logger.warning("python-socketio is not installed; state updates will be polled over HTTP")
+            return False
+
+        server_url = self.base_url.rsplit("/api", 1)[0]
+        self._socket = socketio.AsyncClient(reconnection=True)
+
+        @self._socket.on("state_update")
+        async def on_state_update(data):
+            self.latest_state = data
+
+        @self._socket.on("disconnect")
+        async def on_disconnect():
+            # Fall back to HTTP until we are connected again
+            self.latest_state = None
+
+        try:
+            await self._socket.connect(server_url, wait_timeout=self.timeout)
+        except Exception as e:
+            logger.error(f"Error subscribing to state updates: {e}")
+            self._socket = None
+            return False
+        return True
+
+    async def close(self):
+        """Close the socket subscription and the HTTP connection pool."""
+        if self._socket is not None:
+            await self._socket.disconnect()
+            self._socket = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class PokemonClient:
+    """Synchronous facade over AsyncPokemonClient for blocking callers."""
+
+    def __init__(self, base_url=API_BASE_URL, timeout=DEFAULT_TIMEOUT, max_connections=MAX_CONNECTIONS):
+        """Start a private event loop thread and create the async client on it."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="api-client", daemon=True)
+        self._thread.start()
+        self.client = AsyncPokemonClient(base_url, timeout, max_connections)
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get_status(self):
+        return self.run(self.client.get_status())
+
+    def get_state(self, wait_for_change=False, timeout=15.0):
+        return self.run(self.client.get_state(wait_for_change, timeout))
+
+    def get_screenshot(self):
+        return self.run(self.client.get_screenshot())
+
+    def observe(self):
+        return self.run(self.client.observe())
+
+    def execute_action(self, action, commentary=None):
+        return self.run(self.client.execute_action(action, commentary))
+
+    def execute_sequence(self, actions, commentary=None):
+        return self.run(self.client.execute_sequence(actions, commentary))
+
+    def add_commentary(self, commentary):
+        return self.run(self.client.add_commentary(commentary))
+
+    def start_game(self):
+        return self.run(self.client.start_game())
+
+    def stop_game(self):
+        return self.run(self.client.stop_game())
+
+    def subscribe(self):
+        return self.run(self.client.subscribe())
+
+    def close(self):
+        """Close the client and stop its event loop thread."""
+        self.run(self.client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """Get the shared synchronous client, creating it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = PokemonClient()
+        return _default_client
+
+
+def get_game_status():
+    """Get the current game status from the API."""
+    return get_client().get_status()
+
+
+def get_game_state():
+    """Get the current game state from the API."""
+    return get_client().get_state()
+
+
+def get_game_screenshot():
+    """Get the current screenshot (PNG bytes) from the API."""
+    return get_client().get_screenshot()
+
+
+def execute_action(action, commentary=None):
+    """Execute a single game action with optional commentary."""
+    return get_client().execute_action(action, commentary)
+
+
+def execute_sequence(actions, commentary=None):
+    """Execute a sequence of game actions with optional commentary."""
+    return get_client().execute_sequence(actions, commentary)
+
+
+def start_game():
+    """Start the game."""
+    return get_client().start_game()
+
+
+def stop_game():
+    """Stop the game."""
+    return get_client().stop_game()
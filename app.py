@@ -5,10 +5,17 @@ import logging
 import threading
 import base64
 from io import BytesIO
-from flask import Flask, render_template, jsonify, request, Response
-from flask_socketio import SocketIO, emit
+from flask import Flask, render_template, jsonify, request, Response, g, send_file
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import eventlet
+from eventlet.event import Event
 from emulator import PokemonEmulator
+from input_log import prune_input_logs
+from commentary_store import CommentaryStore
+import metrics
+from metrics import Counter, Gauge, Histogram, TimedLock
+from profiler import Profiler, ProfilerError
+from sessions import SessionManager, SessionError, select_current_ai
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -23,6 +30,18 @@ socketio = SocketIO(app, async_mode='eventlet')
 ROM_DIRECTORY = 'roms'
 ROM_FILE = 'pokemon_red.gb'  # User must provide this
 SCREENSHOT_INTERVAL = 1.0  # seconds between screenshots
+LONG_POLL_DEFAULT_TIMEOUT = 15.0  # seconds a ?wait_for_change=1 request is held
+LONG_POLL_MAX_TIMEOUT = 60.0
+COMMENTARY_CAPACITY = 1000  # entries kept in memory for /api/commentary
+COMMENTARY_PAGE_LIMIT = 50  # default and maximum page size
+COMMENTARY_ARCHIVE = None  # e.g. 'logs/commentary.jsonl' to archive every entry
+PROFILE_DIRECTORY = 'profiles'
+PROFILE_MAX_DURATION = 300.0  # seconds; longer profiling requests are clamped
+INPUT_LOG_DIRECTORY = os.getenv('INPUT_LOG_DIRECTORY')  # e.g. 'input_logs' to record the server's inputs
+INPUT_LOG_KEEP = 20  # newest input logs kept; older ones are deleted when a new recording starts
+SESSION_WORKERS = None  # worker processes for /api/sessions (default: one per CPU)
+MAX_SESSIONS = 64
+SESSION_COMMENTARY_CAPACITY = 200
 
 # AI settings
 AI_SETTINGS = {
@@ -32,17 +51,61 @@ AI_SETTINGS = {
     "currentAI": "Grok"  # Currently active AI (changes in dual mode)
 }
 
+# Metrics exposed on /metrics
+EMULATED_FPS = Gauge('pokemon_emulated_fps', 'Frames emulated per second by the game loop')
+PNG_ENCODE_SECONDS = Histogram('pokemon_png_encode_seconds', 'Time spent encoding a screenshot as PNG')
+LOCK_WAIT_SECONDS = Histogram('pokemon_emulator_lock_wait_seconds', 'Time spent waiting for the emulator lock')
+SOCKET_EMITS = Counter('pokemon_socket_emits_total', 'Socket.IO events emitted', ['event'])
+SOCKET_EMIT_BYTES = Counter('pokemon_socket_emit_bytes_total', 'Approximate JSON payload bytes emitted over Socket.IO', ['event'])
+ACTIVE_SESSIONS = Gauge('pokemon_sessions', 'Emulator sessions hosted by worker processes')
+HTTP_REQUEST_SECONDS = Histogram('pokemon_http_request_seconds', 'HTTP request latency', ['method', 'route'])
+
 # Create directories if they don't exist
 os.makedirs(ROM_DIRECTORY, exist_ok=True)
 os.makedirs('static/screenshots', exist_ok=True)
+if INPUT_LOG_DIRECTORY:
+    os.makedirs(INPUT_LOG_DIRECTORY, exist_ok=True)
 
 # Global variables
 emulator = None
-emulator_lock = threading.Lock()
+emulator_lock = TimedLock(LOCK_WAIT_SECONDS)
 game_thread = None
 screenshot_thread = None
-commentary_history = []
+commentary_history = CommentaryStore(COMMENTARY_CAPACITY, COMMENTARY_ARCHIVE)
 game_running = False
+screenshot_cache = {"etag": None, "png": None}
+profiler = Profiler(PROFILE_DIRECTORY, PROFILE_MAX_DURATION)
+session_commentary = {}
+
+
+def forward_session_event(session_id, name, data):
+    """Forward an event from a session worker to that session's room."""
+    broadcast(name, dict(data, session_id=session_id), to=session_id)
+
+
+session_manager = SessionManager(ROM_DIRECTORY, SESSION_WORKERS, MAX_SESSIONS,
+                                 SCREENSHOT_INTERVAL, on_event=forward_session_event)
+
+
+class ChangeNotifier:
+    """Wakes every green thread waiting for the next change."""
+
+    def __init__(self):
+        self._event = Event()
+
+    def notify(self):
+        """Release all current waiters."""
+        event, self._event = self._event, Event()
+        event.send()
+
+    def wait(self, timeout):
+        """Block until the next notify() or until timeout seconds pass."""
+        with eventlet.Timeout(timeout, False):
+            self._event.wait()
+
+
+state_changed = ChangeNotifier()
+frame_changed = ChangeNotifier()
 
 def initialize_emulator():
     """Initialize the Pokémon emulator."""
@@ -53,9 +116,14 @@ def initialize_emulator():
         logger.error(f"ROM file not found: {rom_path}")
         return False
     
+    input_log_path = None
+    if INPUT_LOG_DIRECTORY:
+        prune_input_logs(INPUT_LOG_DIRECTORY, INPUT_LOG_KEEP - 1)
+        input_log_path = os.path.join(INPUT_LOG_DIRECTORY, time.strftime('session-%Y%m%d-%H%M%S.pkil'))
+    
     try:
         with emulator_lock:
-            emulator = PokemonEmulator(rom_path)
+            emulator = PokemonEmulator(rom_path, input_log_path=input_log_path)
             emulator.start()
         logger.info("Emulator initialized successfully")
         return True
@@ -63,12 +131,47 @@ def initialize_emulator():
         logger.error(f"Failed to initialize emulator: {e}")
         return False
 
+def broadcast(event, data, **kwargs):
+    """Emit a Socket.IO event to clients and count it."""
+    SOCKET_EMITS.labels(event).inc()
+    SOCKET_EMIT_BYTES.labels(event).inc(len(json.dumps(data)))
+    socketio.emit(event, data, **kwargs)
+
+def refresh_state():
+    """Decode the current game state and wake long-pollers if it changed.
+
+    Must be called with emulator_lock held.
+    """
+    version = emulator.state_version
+    state = emulator.get_state()
+    if emulator.state_version != version:
+        state_changed.notify()
+    return state, emulator.get_state_etag()
+
+def encode_screenshot():
+    """Get the current screen as PNG bytes, encoding each frame at most once.
+
+    Must be called with emulator_lock held.
+    """
+    etag = emulator.get_screenshot_etag()
+    if screenshot_cache["etag"] != etag:
+        buffered = BytesIO()
+        screenshot = emulator.get_screenshot()
+        with PNG_ENCODE_SECONDS.time():
+            screenshot.save(buffered, format="PNG")
+        screenshot_cache["png"] = buffered.getvalue()
+        screenshot_cache["etag"] = etag
+    return screenshot_cache["png"], etag
+
 def game_loop():
     """Main game loop that runs in a separate thread."""
     global game_running
     
     logger.info("Starting game loop")
     game_running = True
+    last_pushed = None
+    fps_window_start = time.perf_counter()
+    fps_window_frames = emulator.frame_count if emulator else 0
     
     try:
         while game_running:
@@ -76,28 +179,26 @@ def game_loop():
                 if emulator and emulator.is_running:
                     # Advance the game by a few frames
                     emulator.tick(2)
+                    frame_changed.notify()
                     
                     # Check if we need to update game state
                     if emulator.frame_count % 30 == 0:  # Every 30 frames (roughly 0.5 seconds)
-                        emulator.update_game_state()
+                        state, etag = refresh_state()
                         
                         # Update current AI based on mode and game state
-                        if AI_SETTINGS["mode"] == "dual":
-                            # This is a simplified check - in a real implementation,
-                            # you would check the game state to determine if in battle
-                            in_battle = emulator.detect_game_screen() == "battle"
-                            if in_battle:
-                                AI_SETTINGS["currentAI"] = "Claude" if AI_SETTINGS["pokemonAI"] == "claude" else "Grok"
-                            else:
-                                AI_SETTINGS["currentAI"] = "Grok" if AI_SETTINGS["playerAI"] == "grok" else "Claude"
-                        else:  # single mode
-                            # Use only the player AI for everything
-                            AI_SETTINGS["currentAI"] = "Grok" if AI_SETTINGS["playerAI"] == "grok" else "Claude"
+                        AI_SETTINGS["currentAI"] = select_current_ai(AI_SETTINGS, emulator.is_in_battle())
                         
-                        # Push updated state to clients
-                        state = emulator.get_state()
-                        state["currentAI"] = AI_SETTINGS["currentAI"]  # Add current AI to state
-                        socketio.emit('state_update', state)
+                        # Push updated state to clients, but only when something changed
+                        if (etag, AI_SETTINGS["currentAI"]) != last_pushed:
+                            last_pushed = (etag, AI_SETTINGS["currentAI"])
+                            broadcast('state_update', dict(state, currentAI=AI_SETTINGS["currentAI"]))
+                    
+                    # Refresh the emulated FPS roughly once a second
+                    elapsed = time.perf_counter() - fps_window_start
+                    if elapsed >= 1.0:
+                        EMULATED_FPS.set((emulator.frame_count - fps_window_frames) / elapsed)
+                        fps_window_start = time.perf_counter()
+                        fps_window_frames = emulator.frame_count
             
             # Sleep to control game loop frequency
             eventlet.sleep(1/30)  # 30 FPS target
@@ -115,16 +216,12 @@ def screenshot_loop():
         while game_running:
             with emulator_lock:
                 if emulator and emulator.is_running:
-                    # Capture screenshot
-                    screenshot = emulator.get_screenshot()
-                    
-                    # Convert to base64 for web display
-                    buffered = BytesIO()
-                    screenshot.save(buffered, format="PNG")
-                    img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
+                    # Capture screenshot and convert to base64 for web display
+                    png, _ = encode_screenshot()
+                    img_str = base64.b64encode(png).decode('utf-8')
                     
                     # Emit to clients
-                    socketio.emit('screenshot_update', {'image': img_str})
+                    broadcast('screenshot_update', {'image': img_str})
             
             # Sleep to control screenshot frequency
             eventlet.sleep(SCREENSHOT_INTERVAL)
@@ -168,7 +265,7 @@ def update_ai_settings(settings):
         AI_SETTINGS["currentAI"] = "Grok" if AI_SETTINGS["playerAI"] == "grok" else "Claude"
     
     # Broadcast the updated settings to all clients
-    socketio.emit('ai_settings_update', {
+    broadcast('ai_settings_update', {
         "success": True,
         "playerAI": AI_SETTINGS["playerAI"],
         "pokemonAI": AI_SETTINGS["pokemonAI"],
@@ -179,6 +276,98 @@ def update_ai_settings(settings):
     logger.info(f"AI settings updated: {AI_SETTINGS}")
     return AI_SETTINGS
 
+def add_commentary(text):
+    """Store a commentary entry and broadcast it to clients."""
+    entry = commentary_history.add(text)
+    broadcast('commentary_update', entry)
+    return entry
+
+def add_session_commentary(session_id, text):
+    """Store a session's commentary entry and broadcast it to the session's room."""
+    store = session_commentary.get(session_id)
+    if not text or store is None:
+        return None
+    entry = store.add(text)
+    broadcast('commentary_update', dict(entry, session_id=session_id), to=session_id)
+    return entry
+
+def wants_long_poll():
+    """Check whether the request asked to be held until the resource changes."""
+    return request.args.get('wait_for_change', '0').lower() in ('1', 'true', 'yes')
+
+def long_poll_timeout():
+    """Get the requested long-poll timeout, clamped to LONG_POLL_MAX_TIMEOUT."""
+    try:
+        timeout = float(request.args.get('timeout', LONG_POLL_DEFAULT_TIMEOUT))
+    except ValueError:
+        timeout = LONG_POLL_DEFAULT_TIMEOUT
+    return max(0.0, min(timeout, LONG_POLL_MAX_TIMEOUT))
+
+def not_modified(etag):
+    """Build an empty 304 response carrying the current ETag."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started for the latency histogram."""
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Record the request latency per route."""
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(request.method, route).observe(time.perf_counter() - start)
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    """Expose metrics in the Prometheus text format."""
+    if not game_running:
+        EMULATED_FPS.set(0)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/profile/start', methods=['GET', 'POST'])
+def start_profile():
+    """API endpoint to start profiling the server for a bounded window.
+
+    ?mode=sample (collapsed stacks) or ?mode=cprofile (pstats),
+    ?duration=<seconds> and, for sampling, ?interval=<seconds>.
+    """
+    mode = request.args.get('mode', 'sample')
+    duration = request.args.get('duration', 30.0, type=float)
+    interval = request.args.get('interval', 0.005, type=float)
+    
+    try:
+        session = profiler.start(mode=mode, duration=duration, interval=interval)
+    except ProfilerError as e:
+        return jsonify({"success": False, "error": str(e)})
+    
+    # cProfile must be stopped from this OS thread, so schedule it on the hub
+    eventlet.spawn_after(session["duration"], profiler.stop_if_expired)
+    return jsonify({"success": True, **session})
+
+@app.route('/api/profile/stop', methods=['GET', 'POST'])
+def stop_profile():
+    """API endpoint to stop profiling and download the result file.
+
+    If the window already elapsed, the most recent result is returned.
+    """
+    if profiler.running:
+        try:
+            profiler.stop()
+        except ProfilerError as e:
+            return jsonify({"success": False, "error": str(e)})
+    
+    if profiler.last_result is None:
+        return jsonify({"success": False, "error": "No profile has been recorded"})
+    
+    return send_file(os.path.abspath(profiler.last_result), as_attachment=True,
+                     mimetype='application/octet-stream')
+
 @app.route('/')
 def index():
     """Render the main page."""
@@ -200,33 +389,60 @@ def status():
 
 @app.route('/api/state')
 def get_state():
-    """API endpoint to get the current game state."""
+    """API endpoint to get the current game state.
+
+    Supports If-None-Match (304 when the state version is unchanged) and
+    ?wait_for_change=1&timeout=N to hold the request until the state changes.
+    """
     global emulator
     
     if emulator is None:
         return jsonify({"error": "Emulator not initialized"})
     
     with emulator_lock:
-        state = emulator.get_state()
-        return jsonify(state)
+        state, etag = refresh_state()
+    
+    if request.if_none_match.contains(etag) and wants_long_poll():
+        state_changed.wait(long_poll_timeout())
+        with emulator_lock:
+            state, etag = refresh_state()
+    
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    
+    response = jsonify(state)
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/screenshot')
 def get_screenshot():
-    """API endpoint to get the current screenshot."""
+    """API endpoint to get the current screenshot.
+
+    Supports If-None-Match (304 when the frame is unchanged) and
+    ?wait_for_change=1&timeout=N to hold the request until the next frame.
+    """
     global emulator
     
     if emulator is None:
         return jsonify({"error": "Emulator not initialized"})
     
     with emulator_lock:
-        screenshot = emulator.get_screenshot()
-        
-        # Convert to bytes for HTTP response
-        img_io = BytesIO()
-        screenshot.save(img_io, 'PNG')
-        img_io.seek(0)
-        
-        return Response(img_io.getvalue(), mimetype='image/png')
+        etag = emulator.get_screenshot_etag()
+    
+    if request.if_none_match.contains(etag) and wants_long_poll():
+        frame_changed.wait(long_poll_timeout())
+        with emulator_lock:
+            etag = emulator.get_screenshot_etag()
+    
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    
+    with emulator_lock:
+        png, etag = encode_screenshot()
+    
+    response = Response(png, mimetype='image/png')
+    response.set_etag(etag)
+    return response
 
 @app.route('/api/ai_settings', methods=['GET', 'POST'])
 def ai_settings():
@@ -260,7 +476,7 @@ def ai_settings():
 @app.route('/api/execute_action', methods=['POST'])
 def execute_action():
     """API endpoint to execute a game action."""
-    global emulator, commentary_history
+    global emulator
     
     if emulator is None:
         return jsonify({"error": "Emulator not initialized"})
@@ -274,11 +490,7 @@ def execute_action():
     
     # Add commentary to history
     if commentary:
-        commentary_history.append({
-            "text": commentary,
-            "timestamp": time.time()
-        })
-        socketio.emit('commentary_update', {"text": commentary})
+        add_commentary(commentary)
     
     # Execute the action in the emulator
     with emulator_lock:
@@ -308,11 +520,7 @@ def execute_sequence():
     
     # Add commentary to history
     if commentary:
-        commentary_history.append({
-            "text": commentary,
-            "timestamp": time.time()
-        })
-        socketio.emit('commentary_update', {"text": commentary})
+        add_commentary(commentary)
     
     # Execute the action sequence in the emulator
     with emulator_lock:
@@ -326,10 +534,25 @@ def execute_sequence():
 
 @app.route('/api/commentary')
 def get_commentary():
-    """API endpoint to get the commentary history."""
-    global commentary_history
+    """API endpoint to get a page of the commentary history.
+
+    ?since=<id> returns entries newer than that ID (oldest first);
+    without it the most recent entries are returned. ?limit=N caps the page.
+    """
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', COMMENTARY_PAGE_LIMIT, type=int)
+    limit = max(1, min(limit, COMMENTARY_PAGE_LIMIT))
+    
+    return jsonify(commentary_history.page(since=since, limit=limit))
+
+@app.route('/api/commentary', methods=['POST'])
+def post_commentary():
+    """API endpoint to add commentary on its own, e.g. reasoning that arrives after its action."""
+    data = request.json
+    if not data or not data.get('commentary'):
+        return jsonify({"error": "Invalid request, 'commentary' field required"})
     
-    return jsonify(commentary_history)
+    return jsonify({"success": True, "entry": add_commentary(data['commentary'])})
 
 @app.route('/api/start_game')
 def start_game():
@@ -359,6 +582,126 @@ def stop_game():
     
     return jsonify({"success": True, "status": "stopped"})
 
+def session_call(session_id, method, **kwargs):
+    """Run a session command, turning errors into a JSON error response."""
+    try:
+        return session_manager.call(session_id, method, **kwargs), None
+    except SessionError as e:
+        return None, jsonify({"success": False, "error": str(e)})
+
+@app.route('/api/sessions', methods=['GET', 'POST'])
+def sessions():
+    """API endpoint to list sessions or create a new one.
+
+    POST body: {"rom_file": "pokemon_red.gb", "playerAI": "grok", "pokemonAI": "claude", "mode": "dual"}
+    """
+    if request.method == 'GET':
+        return jsonify({"success": True, "sessions": session_manager.list()})
+    
+    data = request.json or {}
+    rom_file = data.get('rom_file', ROM_FILE)
+    if os.path.basename(rom_file) != rom_file or not os.path.exists(os.path.join(ROM_DIRECTORY, rom_file)):
+        return jsonify({"success": False, "error": f"ROM file not found: {rom_file}"})
+    
+    ai_settings = {key: data[key] for key in ("playerAI", "pokemonAI", "mode") if key in data}
+    try:
+        session = session_manager.create(rom_file, ai_settings)
+    except SessionError as e:
+        return jsonify({"success": False, "error": str(e)})
+    
+    session_commentary[session["session_id"]] = CommentaryStore(SESSION_COMMENTARY_CAPACITY)
+    ACTIVE_SESSIONS.inc()
+    return jsonify({"success": True, "session": session})
+
+@app.route('/api/sessions/stats')
+def sessions_stats():
+    """API endpoint to get per-session overhead and an estimate of sessions per core."""
+    return jsonify({"success": True, **session_manager.stats()})
+
+@app.route('/api/sessions/<session_id>', methods=['GET', 'DELETE'])
+def session_detail(session_id):
+    """API endpoint to describe or destroy a session."""
+    if request.method == 'GET':
+        session, error = session_call(session_id, "describe")
+        return error or jsonify({"success": True, "session": session})
+    
+    try:
+        session_manager.destroy(session_id)
+    except SessionError as e:
+        return jsonify({"success": False, "error": str(e)})
+    
+    session_commentary.pop(session_id, None)
+    ACTIVE_SESSIONS.dec()
+    broadcast('session_closed', {"session_id": session_id}, to=session_id)
+    return jsonify({"success": True, "session_id": session_id})
+
+@app.route('/api/sessions/<session_id>/state')
+def session_state(session_id):
+    """API endpoint to get a session's game state."""
+    state, error = session_call(session_id, "get_state")
+    return error or jsonify(state)
+
+@app.route('/api/sessions/<session_id>/screenshot')
+def session_screenshot(session_id):
+    """API endpoint to get a session's current screenshot."""
+    png, error = session_call(session_id, "get_screenshot")
+    return error or Response(png, mimetype='image/png')
+
+@app.route('/api/sessions/<session_id>/ai_settings', methods=['GET', 'POST'])
+def session_ai_settings(session_id):
+    """API endpoint to get or update a session's AI settings."""
+    if request.method == 'GET':
+        session, error = session_call(session_id, "describe")
+        return error or jsonify({"success": True, **session["ai_settings"]})
+    
+    data = request.json
+    if not data:
+        return jsonify({"success": False, "error": "Invalid request, no data provided"})
+    
+    settings, error = session_call(session_id, "update_ai_settings", settings=data)
+    return error or jsonify({"success": True, **settings})
+
+@app.route('/api/sessions/<session_id>/execute_action', methods=['POST'])
+def session_execute_action(session_id):
+    """API endpoint to execute a game action in a session."""
+    data = request.json
+    if not data or 'action' not in data:
+        return jsonify({"error": "Invalid request, 'action' field required"})
+    
+    add_session_commentary(session_id, data.get('commentary', ''))
+    success, error = session_call(session_id, "execute_action", action=data['action'])
+    if error:
+        return error
+    if success:
+        return jsonify({"success": True, "action": data['action']})
+    return jsonify({"success": False, "error": f"Invalid action: {data['action']}"})
+
+@app.route('/api/sessions/<session_id>/execute_sequence', methods=['POST'])
+def session_execute_sequence(session_id):
+    """API endpoint to execute a sequence of game actions in a session."""
+    data = request.json
+    if not data or 'actions' not in data:
+        return jsonify({"error": "Invalid request, 'actions' field required"})
+    
+    add_session_commentary(session_id, data.get('commentary', ''))
+    results, error = session_call(session_id, "execute_sequence", actions=data['actions'])
+    return error or jsonify({
+        "success": all(results),
+        "results": results,
+        "actions": data['actions']
+    })
+
+@app.route('/api/sessions/<session_id>/commentary')
+def session_commentary_page(session_id):
+    """API endpoint to get a page of a session's commentary (same paging as /api/commentary)."""
+    store = session_commentary.get(session_id)
+    if store is None:
+        return jsonify({"success": False, "error": f"Unknown session: {session_id}"})
+    
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', COMMENTARY_PAGE_LIMIT, type=int)
+    return jsonify(store.page(since=since, limit=max(1, min(limit, COMMENTARY_PAGE_LIMIT))))
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connect event."""
@@ -379,6 +722,23 @@ def handle_disconnect():
     """Handle client disconnect event."""
     logger.info("Client disconnected")
 
+@socketio.on('join_session')
+def handle_join_session(data):
+    """Subscribe the client to a session's updates."""
+    session_id = (data or {}).get('session_id')
+    if session_id not in session_manager:
+        emit('session_error', {"error": f"Unknown session: {session_id}"})
+        return
+    join_room(session_id)
+    logger.info(f"Client joined session {session_id}")
+
+@socketio.on('leave_session')
+def handle_leave_session(data):
+    """Unsubscribe the client from a session's updates."""
+    session_id = (data or {}).get('session_id')
+    if session_id:
+        leave_room(session_id)
+
 if __name__ == '__main__':
     # Check if ROM file exists
     rom_path = os.path.join(ROM_DIRECTORY, ROM_FILE)
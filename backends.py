@@ -0,0 +1,299 @@
+"""
+Emulator Backends for Grok Plays Pokémon
+What PokemonEmulator runs the game on.
+
+PyBoyBackend runs the real game from a ROM. FakeBackend needs no ROM: it
+keeps the game's RAM in a NumPy array seeded from a scripted scenario (party,
+bag, map, battle), applies scripted memory changes as frames pass, reacts to
+a few inputs the way the game would, and draws synthetic frames from what is
+in memory. It runs at full speed and the same inputs always give the same
+states and frames, so every subsystem can be tested and benchmarked in CI:
+
+    emulator = PokemonEmulator(backend=FakeBackend("battle"))
+
+Scenarios are named sets of (address, value) writes; see SCENARIOS.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+from image_utils import GB_SHADES
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("pyboy", "fake")
+BUTTONS = ("a", "b", "start", "select", "up", "down", "left", "right")
+
+SCREEN_SHAPE = (144, 160, 3)  # rows, columns, RGB
+
+# RAM addresses the fake reacts to (the emulator decodes more; see game_state.md)
+PLAYER_Y = 0xD361
+PLAYER_X = 0xD362
+MAP_ID = 0xD35E
+BATTLE_TYPE = 0xD057
+TEXT_BOX = 0xCFC4
+TILE_UNDER_PLAYER = 0xC45C
+DIALOGUE_CORNERS = ((0xC3A0 + 12 * 20, 0x79), (0xC3A0 + 18 * 20 - 1, 0x7E))  # dialogue box frame in the tile map
+GRASS_TILE = 0xD535
+
+_NEW_GAME = [
+    (0xD347, 0x00), (0xD348, 0x30), (0xD349, 0x00),  # 3000 money, BCD
+    (0xD356, 0x00),  # no badges
+    (MAP_ID, 0x00),  # Pallet Town
+    (PLAYER_Y, 6), (PLAYER_X, 5),
+    (0xD31C, 0), (0xD163, 0),  # empty bag and party
+    (GRASS_TILE, 0xFF),  # no grass in this tileset
+]
+_STARTER = [
+    (0xD163, 1),
+    # Squirtle: species, HP 20/20, level 5
+    (0xD16B, 0xB1), (0xD16C, 0), (0xD16D, 20), (0xD16E, 0), (0xD16F, 20), (0xD173, 5),
+    # Bag: 5 Poké Balls and a Potion
+    (0xD31C, 2), (0xD31D, 0x04), (0xD31E, 5), (0xD31F, 0x14), (0xD320, 1),
+]
+_ROUTE_1 = [(MAP_ID, 0x0C), (PLAYER_Y, 20), (PLAYER_X, 10), (GRASS_TILE, 0x52), (TILE_UNDER_PLAYER, 0x52)]
+
+SCENARIOS = {
+    "new_game": _NEW_GAME,
+    "overworld": _NEW_GAME + _STARTER,
+    "route_grass": _NEW_GAME + _STARTER + _ROUTE_1,
+    "dialogue": _NEW_GAME + _STARTER + [(TEXT_BOX, 0x01)] + list(DIALOGUE_CORNERS),
+    "battle": _NEW_GAME + _STARTER + _ROUTE_1 + [(BATTLE_TYPE, 1)],
+    "trainer_battle": _NEW_GAME + _STARTER + _ROUTE_1 + [(BATTLE_TYPE, 2)],
+}
+
+MOVES = {"up": (PLAYER_Y, -1), "down": (PLAYER_Y, 1), "left": (PLAYER_X, -1), "right": (PLAYER_X, 1)}
+MAP_SIZE = 32  # tiles the fake player can walk in each direction before hitting the edge
+BATTLE_TURNS = 3  # A presses that win a fake battle
+
+
+class Backend(ABC):
+    """The emulator core PokemonEmulator drives."""
+
+    @abstractmethod
+    def tick(self):
+        """Advance one frame."""
+
+    @abstractmethod
+    def send_input(self, button, pressed):
+        """Press or release a button (one of BUTTONS)."""
+
+    @abstractmethod
+    def get_memory_value(self, address):
+        """Read one byte of memory."""
+
+    @abstractmethod
+    def set_memory_value(self, address, value):
+        """Write one byte of memory."""
+
+    def read_memory(self, start, length):
+        """Read length bytes of memory starting at start."""
+        return bytes(self.get_memory_value(address) for address in range(start, start + length))
+
+    @abstractmethod
+    def screen_ndarray(self):
+        """Get the screen as a (144, 160, 3) RGB array, possibly a view that changes as the game runs."""
+
+    def screen_image(self):
+        """Get the screen as a PIL image."""
+        return Image.fromarray(self.screen_ndarray())
+
+    @abstractmethod
+    def save_state(self, file):
+        """Write the full emulator state to a file-like object."""
+
+    @abstractmethod
+    def load_state(self, file):
+        """Restore a state written by save_state from a file-like object."""
+
+    def set_emulation_speed(self, speed):
+        """Set the speed multiplier (0 for uncapped)."""
+
+    def stop(self, save=True):
+        """Shut the backend down, writing the battery save unless save is False."""
+
+
+class PyBoyBackend(Backend):
+    """The real game, emulated by PyBoy from a ROM."""
+
+    def __init__(self, rom_path, headless=False):
+        from pyboy import PyBoy
+        from pyboy.utils import WindowEvent
+
+        self.pyboy = PyBoy(rom_path, game_wrapper=True, window_type="headless" if headless else "SDL2")
+        self._press = {
+            "a": WindowEvent.PRESS_BUTTON_A,
+            "b": WindowEvent.PRESS_BUTTON_B,
+            "start": WindowEvent.PRESS_BUTTON_START,
+            "select": WindowEvent.PRESS_BUTTON_SELECT,
+            "up": WindowEvent.PRESS_ARROW_UP,
+            "down": WindowEvent.PRESS_ARROW_DOWN,
+            "left": WindowEvent.PRESS_ARROW_LEFT,
+            "right": WindowEvent.PRESS_ARROW_RIGHT,
+        }
+        self._release = {
+            "a": WindowEvent.RELEASE_BUTTON_A,
+            "b": WindowEvent.RELEASE_BUTTON_B,
+            "start": WindowEvent.RELEASE_BUTTON_START,
+            "select": WindowEvent.RELEASE_BUTTON_SELECT,
+            "up": WindowEvent.RELEASE_ARROW_UP,
+            "down": WindowEvent.RELEASE_ARROW_DOWN,
+            "left": WindowEvent.RELEASE_ARROW_LEFT,
+            "right": WindowEvent.RELEASE_ARROW_RIGHT,
+        }
+
+    def tick(self):
+        self.pyboy.tick()
+
+    def send_input(self, button, pressed):
+        self.pyboy.send_input(self._press[button] if pressed else self._release[button])
+
+    def get_memory_value(self, address):
+        return self.pyboy.get_memory_value(address)
+
+    def set_memory_value(self, address, value):
+        self.pyboy.set_memory_value(address, value)
+
+    def screen_ndarray(self):
+        return self.pyboy.botsupport_manager().screen().screen_ndarray()
+
+    def screen_image(self):
+        return self.pyboy.screen_image()
+
+    def save_state(self, file):
+        self.pyboy.save_state(file)
+
+    def load_state(self, file):
+        self.pyboy.load_state(file)
+
+    def set_emulation_speed(self, speed):
+        self.pyboy.set_emulation_speed(speed)
+
+    def stop(self, save=True):
+        self.pyboy.stop(save=save)
+
+
+class FakeBackend(Backend):
+    """A ROM-free stand-in with scripted memory and synthetic frames."""
+
+    def __init__(self, scenario="overworld", script=None):
+        """
+        Initialize the fake.
+
+        Args:
+            scenario: Name of the starting memory state in SCENARIOS
+            script: Optional list of (frame, {address: value}) writes applied
+                when the frame is reached, e.g. [(600, {0xD057: 1})] starts a
+                wild battle ten seconds in
+        """
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {scenario}. Must be one of {', '.join(SCENARIOS)}.")
+        self.scenario = scenario
+        self.memory = np.zeros(0x10000, dtype=np.uint8)
+        for address, value in SCENARIOS[scenario]:
+            self.memory[address] = value
+        self.script = sorted(script or [], key=lambda entry: entry[0])
+        self._script_position = 0
+        self.frame_count = 0
+        self.pressed = set()
+        self._battle_presses = 0
+        self._frame = np.zeros(SCREEN_SHAPE, dtype=np.uint8)
+        self._drawn = None
+
+    def tick(self):
+        self.frame_count += 1
+        while self._script_position < len(self.script) and self.script[self._script_position][0] <= self.frame_count:
+            for address, value in self.script[self._script_position][1].items():
+                self.memory[address] = value
+            self._script_position += 1
+
+    def send_input(self, button, pressed):
+        if not pressed:
+            self.pressed.discard(button)
+            return
+        self.pressed.add(button)
+
+        memory = self.memory
+        if memory[BATTLE_TYPE] in (1, 2):
+            if button == "a":
+                self._battle_presses += 1
+                if self._battle_presses >= BATTLE_TURNS:
+                    memory[BATTLE_TYPE] = 0
+                    self._battle_presses = 0
+        elif memory[TEXT_BOX] & 0x01:
+            if button in ("a", "b"):
+                memory[TEXT_BOX] &= 0xFE
+                for address, _ in DIALOGUE_CORNERS:
+                    memory[address] = 0
+        elif button in MOVES:
+            address, delta = MOVES[button]
+            position = int(memory[address]) + delta
+            if 0 <= position < MAP_SIZE:
+                memory[address] = position
+
+    def get_memory_value(self, address):
+        return int(self.memory[address])
+
+    def set_memory_value(self, address, value):
+        self.memory[address] = value
+
+    def read_memory(self, start, length):
+        return self.memory[start:start + length].tobytes()
+
+    def screen_ndarray(self):
+        # Redraw only when something the frame shows has changed
+        key = (self.memory[MAP_ID], self.memory[PLAYER_X], self.memory[PLAYER_Y],
+               self.memory[TEXT_BOX] & 0x01, self.memory[BATTLE_TYPE], self.frame_count // 32 % 2)
+        if key != self._drawn:
+            self._draw(*key)
+            self._drawn = key
+        return self._frame
+
+    def _draw(self, map_id, x, y, text_box, battle_type, phase):
+        frame = self._frame
+        light, pale, dark, black = GB_SHADES
+        if battle_type in (1, 2):
+            frame[:] = light
+            frame[8:40, 96:144] = dark  # opponent
+            frame[64:96, 16:64] = pale  # our Pokémon
+            frame[96:104, 80:152] = black  # HP bar
+            frame[104:144] = pale  # menu
+            return
+
+        # Checkerboard of 16x16 tiles that scrolls as the player walks; the shade depends on the map
+        rows = (np.arange(SCREEN_SHAPE[0]) // 16 + int(y))[:, None]
+        columns = (np.arange(SCREEN_SHAPE[1]) // 16 + int(x))[None, :]
+        pattern = (rows + columns + int(map_id)) % 2
+        frame[:] = np.where(pattern[..., None], pale, light)
+        frame[64:80, 64 + 4 * phase:68 + 4 * phase] = dark  # an animated flower
+        frame[64:80, 72:88] = black  # the player
+        if text_box:
+            frame[96:144] = light
+            frame[96:98] = frame[142:144] = black
+            frame[96:144, :2] = frame[96:144, -2:] = black
+
+    def save_state(self, file):
+        file.write(self.memory.tobytes())
+        file.write(self.frame_count.to_bytes(8, "little"))
+        file.write(self._script_position.to_bytes(4, "little"))
+        file.write(self._battle_presses.to_bytes(1, "little"))
+
+    def load_state(self, file):
+        self.memory = np.frombuffer(file.read(self.memory.nbytes), dtype=np.uint8).copy()
+        self.frame_count = int.from_bytes(file.read(8), "little")
+        # States saved before these fields existed end here and load as zero
+        self._script_position = int.from_bytes(file.read(4), "little")
+        self._battle_presses = int.from_bytes(file.read(1), "little")
+        self._drawn = None
+
+
+def create_backend(kind="pyboy", rom_path=None, headless=False, scenario="overworld"):
+    """Create a backend by name ("pyboy" or "fake")."""
+    if kind == "pyboy":
+        return PyBoyBackend(rom_path, headless=headless)
+    if kind == "fake":
+        return FakeBackend(scenario)
+    raise ValueError(f"Unknown backend: {kind}. Must be one of {BACKENDS}.")
@@ -0,0 +1,4 @@
+"""
+Benchmarks for Grok Plays Pokémon
+Run with `python -m benchmarks.run` from the repository root.
+"""
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for Grok Plays Pokémon
+Measures the emulator, server and controller hot paths and writes the results as JSON.
+
+Benchmarks:
+    tick               emulator frames per second
+    update_game_state  microseconds to decode the game state from memory
+    screenshot         milliseconds to grab a frame and encode it as PNG
+    http               /api/state and /api/screenshot round trips through the Flask app
+    socketio_fanout    Socket.IO broadcasts delivered per second to N clients
+    ai_step            controller step overhead against a zero-latency mock model
+    prompt_cache       time to first token with prompt caching on and off, against the mock
+    decisions_per_minute  the pipelined loop against the serial one, with mock model latency
+
+No ROM is needed: the emulator runs on backends.FakeBackend unless --rom is
+given. Each result file also records the machine, Python
+version and git commit, so runs can be compared over time:
+
+    python -m benchmarks.run --output benchmarks/results/$(date +%Y%m%d).json
+    python -m benchmarks.run --only tick,http --clients 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from io import BytesIO
+
+from backends import SCENARIOS, FakeBackend
+from metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BENCHMARKS = ("tick", "update_game_state", "screenshot", "http", "socketio_fanout", "ai_step", "prompt_cache",
+              "decisions_per_minute")
+
+
+def machine_info():
+    """Describe the machine and code a run was made on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "git_commit": commit,
+    }
+
+
+def summarize(samples, scale=1.0):
+    """Get mean and percentiles of timings in seconds, multiplied by scale."""
+    values = [sample * scale for sample in samples]
+    return {
+        "n": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+    }
+
+
+def time_calls(function, iterations):
+    """Time each of iterations calls of function."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_emulator(args):
+    """Create the emulator to benchmark: PyBoy with --rom, otherwise the fake backend."""
+    from emulator import PokemonEmulator
+
+    if args.rom:
+        emulator = PokemonEmulator(args.rom, headless=True, speed=0)
+    else:
+        emulator = PokemonEmulator(backend=FakeBackend(args.scenario))
+    emulator.start()
+    return emulator
+
+
+def bench_tick(args):
+    emulator = make_emulator(args)
+    frames = 600 * args.scale
+    start = time.perf_counter()
+    emulator.tick(frames)
+    elapsed = time.perf_counter() - start
+    return {"frames": frames, "fps": frames / elapsed}
+
+
+def bench_update_game_state(args):
+    emulator = make_emulator(args)
+    samples = time_calls(emulator.update_game_state, 2000 * args.scale)
+    return {"us": summarize(samples, 1e6)}
+
+
+def bench_screenshot(args):
+    emulator = make_emulator(args)
+
+    def grab_and_encode():
+        buffered = BytesIO()
+        emulator.get_screenshot().save(buffered, format="PNG")
+
+    def grab():
+        emulator.get_screenshot()
+
+    return {
+        "grab_ms": summarize(time_calls(grab, 200 * args.scale), 1e3),
+        "grab_encode_ms": summarize(time_calls(grab_and_encode, 200 * args.scale), 1e3),
+    }
+
+
+def bench_http(args):
+    import app as server
+
+    server.emulator = make_emulator(args)
+    client = server.app.test_client()
+    results = {}
+    for route in ("/api/state", "/api/screenshot"):
+        def request():
+            # Advance a frame so the response is never a cached 304
+            server.emulator.tick(1)
+            response = client.get(route)
+            assert response.status_code == 200, response.status_code
+
+        results[route] = summarize(time_calls(request, 300 * args.scale), 1e3)
+    server.emulator = None
+    return {"round_trip_ms": results, "note": "in-process WSGI round trips; no network"}
+
+
+def bench_socketio_fanout(args):
+    import app as server
+
+    clients = [server.socketio.test_client(server.app) for _ in range(args.clients)]
+    for client in clients:
+        client.get_received()
+
+    payload = {"image": "x" * 4096}
+    broadcasts = 50 * args.scale
+    start = time.perf_counter()
+    for _ in range(broadcasts):
+        server.broadcast('screenshot_update', payload)
+    elapsed = time.perf_counter() - start
+
+    delivered = sum(len(client.get_received()) for client in clients)
+    for client in clients:
+        client.disconnect()
+    return {
+        "clients": args.clients,
+        "broadcasts": broadcasts,
+        "delivered": delivered,
+        "broadcasts_per_second": broadcasts / elapsed,
+        "deliveries_per_second": delivered / elapsed,
+    }
+
+
+def start_mock_model(**model_args):
+    """Serve mock_anthropic.py in a thread, answering with a MockModel(**model_args), and point ClaudeAI at it."""
+    from werkzeug.serving import make_server
+    import mock_anthropic
+
+    mock_anthropic.model = mock_anthropic.MockModel(seed=0, **model_args)
+    server = make_server("127.0.0.1", 0, mock_anthropic.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Read by ai_controller at import: talk to the mock, and don't answer from a cache
+    os.environ["CLAUDE_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["LLM_CACHE_SIZE"] = "0"
+    os.environ["EPISODE_DB_PATH"] = ""
+    os.environ["CLAUDE_RPM"] = os.environ["CLAUDE_ITPM"] = "1000000000"  # measure the model, not the rate limiter
+    import ai_controller
+
+    # Each benchmark starts its own mock, but the environment is only read at the first import
+    ai_controller.CLAUDE_BASE_URL = os.environ["CLAUDE_BASE_URL"]
+    return server
+
+
+def bench_ai_step(args):
+    import mock_anthropic
+
+    server = start_mock_model()
+    from ai_controller import AIManager
+    from transport import InProcessTransport
+
+    manager = AIManager(transport=InProcessTransport(None, emulator=make_emulator(args)))
+    manager.set_active_player_ai("claude")
+    try:
+        samples = time_calls(lambda: manager.step(use_screen=True), 20 * args.scale)
+    finally:
+        server.shutdown()
+    return {
+        "step_ms": summarize(samples, 1e3),
+        "model_requests": mock_anthropic.model.stats["requests"],
+        "note": "mock answers immediately, so this is the controller's own overhead plus local HTTP",
+    }
+
+
+def bench_prompt_cache(args):
+    import mock_anthropic
+
+    server = start_mock_model(latency=args.model_latency, cached_latency_factor=args.cached_latency_factor)
+    import ai_controller
+    from transport import InProcessTransport
+
+    results = {}
+    try:
+        for enabled in (False, True):
+            # The system blocks are built per AI, so each run gets a fresh manager
+            ai_controller.PROMPT_CACHE = enabled
+            manager = ai_controller.AIManager(transport=InProcessTransport(None, emulator=make_emulator(args)))
+            manager.set_active_player_ai("claude")
+            claude = manager.claude
+            cache_reads = ai_controller.PROMPT_CACHE_TOKENS.labels(claude.name, "read")
+            read_before = cache_reads.value
+            first_tokens = []
+            for _ in range(20 * args.scale):
+                claude.last_first_token = None
+                manager.step(use_screen=False)
+                if claude.last_first_token is not None:
+                    first_tokens.append(claude.last_first_token)
+            results["on" if enabled else "off"] = {
+                "first_token_ms": summarize(first_tokens, 1e3) if first_tokens else None,
+                "cache_read_tokens": cache_reads.value - read_before,
+            }
+    finally:
+        ai_controller.PROMPT_CACHE = True
+        server.shutdown()
+    return dict(results, prefix_tokens=len(ai_controller.player_system_prompt()) // 4,
+                min_cacheable_tokens=mock_anthropic.MIN_CACHEABLE_TOKENS,
+                note=f"mock latency {args.model_latency}, cache hits x{args.cached_latency_factor}")
+
+
+class InProcessAsyncClient:
+    """
+    The AsyncPokemonClient calls run_pipeline makes, answered by an
+    InProcessTransport. Each request waits `latency` seconds first, standing
+    in for the round trip to the server.
+    """
+
+    def __init__(self, transport, latency):
+        self.transport = transport
+        self.latency = latency
+        self._lock = threading.Lock()  # the emulator isn't safe to use from several threads
+        self._state = None
+
+    def _call(self, function, *args):
+        with self._lock:
+            return function(*args)
+
+    async def get_state(self, wait_for_change=False, timeout=15.0):
+        await asyncio.sleep(self.latency)
+        deadline = time.monotonic() + (timeout if wait_for_change else 0)
+        state = self._call(self.transport.get_state)
+        while wait_for_change and state == self._state and time.monotonic() < deadline:
+            await asyncio.sleep(1 / 60)
+            state = self._call(self.transport.get_state)
+        self._state = state
+        return state
+
+    async def get_screenshot(self):
+        await asyncio.sleep(self.latency)
+        # A copy, like the PNG the server would send; the view changes as the game runs
+        return self._call(self.transport.get_screenshot).copy()
+
+    async def observe(self):
+        return await asyncio.gather(self.get_state(), self.get_screenshot())
+
+    async def execute_action(self, action, commentary=None):
+        await asyncio.sleep(self.latency)
+        return self._call(self.transport.execute_action, action, commentary)
+
+
+def bench_decisions_per_minute(args):
+    server = start_mock_model(latency=args.model_latency)
+    import ai_controller
+    from transport import InProcessTransport
+
+    steps = 10 * args.scale
+    results = {}
+    try:
+        for loop in ("serial", "pipeline"):
+            transport = InProcessTransport(None, emulator=make_emulator(args))
+            manager = ai_controller.AIManager(transport=transport)
+            manager.set_active_player_ai("claude")
+            start = time.perf_counter()
+            if loop == "serial":
+                ai_controller.run_serial(manager, steps)
+            else:
+                client = InProcessAsyncClient(transport, args.server_latency)
+                asyncio.run(ai_controller.run_pipeline(manager, client, steps))
+            elapsed = time.perf_counter() - start
+            results[loop] = {"steps": steps, "seconds": elapsed, "decisions_per_minute": steps / elapsed * 60}
+    finally:
+        server.shutdown()
+    return dict(results, speedup=results["pipeline"]["decisions_per_minute"] / results["serial"]["decisions_per_minute"],
+                note=f"mock latency {args.model_latency}; the pipeline pays {args.server_latency}s per server "
+                     "request, the serial loop none, so the comparison favours the serial loop")
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the emulator, server and controller hot paths")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks to run (default all: {', '.join(BENCHMARKS)})")
+    parser.add_argument("--rom", help="Benchmark PyBoy with this ROM instead of the fake backend")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="overworld",
+                        help="Starting state of the fake backend (default: overworld)")
+    parser.add_argument("--clients", type=int, default=10, help="Socket.IO clients for socketio_fanout")
+    parser.add_argument("--model-latency", default="lognormal:-0.5,0.3",
+                        help="Mock model time to first token for prompt_cache (see mock_anthropic.parse_latency)")
+    parser.add_argument("--cached-latency-factor", type=float, default=0.5,
+                        help="Mock latency multiplier on prompt cache hits for prompt_cache")
+    parser.add_argument("--server-latency", type=float, default=0.01,
+                        help="Seconds per simulated server request for decisions_per_minute")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the iteration counts")
+    parser.add_argument("--output", help="Write the results to this JSON file as well as stdout")
+    return parser.parse_args()
+
+
+def main():
+    """Run the selected benchmarks and print the results as JSON."""
+    args = parse_args()
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    # The hot paths log at INFO on every call; configure logging before the
+    # modules' own basicConfig calls so the terminal stays quiet
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    results = {"machine": machine_info(), "started": time.time(), "backend": "pyboy" if args.rom else f"fake:{args.scenario}",
+               "benchmarks": {}}
+    for name in selected:
+        print(f"Running {name}...", file=sys.stderr)
+        try:
+            results["benchmarks"][name] = globals()[f"bench_{name}"](args)
+        except Exception as e:
+            logger.error(f"{name} failed: {e}")
+            results["benchmarks"][name] = {"error": str(e)}
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
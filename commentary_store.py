@@ -0,0 +1,96 @@
+"""
+Commentary Store for Grok Plays Pokémon
+Keeps a bounded, cursor-paginated history of AI commentary.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CommentaryStore:
+    """
+    Fixed-capacity ring buffer of commentary entries.
+
+    Every entry gets a monotonically increasing ID so clients can page through
+    the history with a cursor (?since=<id>) instead of refetching all of it.
+    Every entry can optionally also be appended to a JSON Lines archive file
+    as it is added, so the full history survives after entries fall out of
+    the buffer.
+    """
+
+    def __init__(self, capacity=1000, archive_path=None):
+        """Initialize the store."""
+        self.capacity = capacity
+        self.archive_path = archive_path
+        self._entries = deque(maxlen=capacity)
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._archive = open(archive_path, "a", encoding="utf-8") if archive_path else None
+
+    def add(self, text, timestamp=None):
+        """Append a commentary entry and return it."""
+        with self._lock:
+            entry = {
+                "id": self._next_id,
+                "text": text,
+                "timestamp": timestamp if timestamp is not None else time.time()
+            }
+            self._next_id += 1
+            self._entries.append(entry)
+
+            if self._archive:
+                try:
+                    self._archive.write(json.dumps(entry) + "\n")
+                    self._archive.flush()
+                except OSError as e:
+                    logger.error(f"Error writing commentary archive: {e}")
+
+        return entry
+
+    def page(self, since=None, limit=50):
+        """
+        Get a page of commentary.
+
+        Args:
+            since: Only return entries with an ID greater than this. If None,
+                the most recent entries are returned.
+            limit: Maximum number of entries to return.
+
+        Returns:
+            A dict with the entries (oldest first), the ID of the newest
+            entry in the store and whether more entries follow this page.
+        """
+        with self._lock:
+            latest_id = self._next_id - 1
+            if not self._entries or limit <= 0:
+                return {"commentary": [], "latest_id": latest_id, "has_more": False}
+
+            oldest_id = self._entries[0]["id"]
+            if since is None:
+                start = max(0, len(self._entries) - limit)
+            else:
+                # IDs are contiguous inside the buffer, so the cursor maps to an index
+                start = min(max(0, since + 1 - oldest_id), len(self._entries))
+
+            end = min(start + limit, len(self._entries))
+            entries = [self._entries[i] for i in range(start, end)]
+
+        return {
+            "commentary": entries,
+            "latest_id": latest_id,
+            "has_more": end < len(self._entries)
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        """Close the archive file if one is open."""
+        if self._archive:
+            self._archive.close()
+            self._archive = None
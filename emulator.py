@@ -1,59 +1,106 @@
 import os
 import time
 import logging
-from pyboy import PyBoy
-from pyboy.utils import WindowEvent
 import numpy as np
 from PIL import Image
 import json
+import hashlib
+from io import BytesIO
+from backends import BUTTONS, create_backend
+from input_log import InputLogWriter, DEFAULT_CHECKPOINT_INTERVAL
+from metrics import Counter, Histogram
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Define button mapping
-BUTTON_MAP = {
-    "a": WindowEvent.PRESS_BUTTON_A,
-    "b": WindowEvent.PRESS_BUTTON_B,
-    "start": WindowEvent.PRESS_BUTTON_START,
-    "select": WindowEvent.PRESS_BUTTON_SELECT,
-    "up": WindowEvent.PRESS_ARROW_UP,
-    "down": WindowEvent.PRESS_ARROW_DOWN,
-    "left": WindowEvent.PRESS_ARROW_LEFT,
-    "right": WindowEvent.PRESS_ARROW_RIGHT
+# Names for the items and species decoded from memory, by their internal IDs
+ITEM_NAMES = {
+    0x01: "Master Ball", 0x02: "Ultra Ball", 0x03: "Great Ball", 0x04: "Poké Ball", 0x05: "Town Map",
+    0x06: "Bicycle", 0x0A: "Moon Stone", 0x0B: "Antidote", 0x0C: "Burn Heal", 0x0D: "Ice Heal",
+    0x0E: "Awakening", 0x0F: "Parlyz Heal", 0x10: "Full Restore", 0x11: "Max Potion", 0x12: "Hyper Potion",
+    0x13: "Super Potion", 0x14: "Potion", 0x1D: "Escape Rope", 0x1E: "Repel", 0x28: "Rare Candy",
+    0x34: "Full Heal", 0x35: "Revive", 0x46: "Oak's Parcel",
 }
-
-BUTTON_RELEASE_MAP = {
-    "a": WindowEvent.RELEASE_BUTTON_A,
-    "b": WindowEvent.RELEASE_BUTTON_B,
-    "start": WindowEvent.RELEASE_BUTTON_START,
-    "select": WindowEvent.RELEASE_BUTTON_SELECT,
-    "up": WindowEvent.RELEASE_ARROW_UP,
-    "down": WindowEvent.RELEASE_ARROW_DOWN,
-    "left": WindowEvent.RELEASE_ARROW_LEFT,
-    "right": WindowEvent.RELEASE_ARROW_RIGHT
+SPECIES_NAMES = {
+    0x99: "BULBASAUR", 0x09: "IVYSAUR", 0xB0: "CHARMANDER", 0xB2: "CHARMELEON", 0xB1: "SQUIRTLE",
+    0xB3: "WARTORTLE", 0x54: "PIKACHU", 0x24: "PIDGEY", 0xA5: "RATTATA", 0x7B: "CATERPIE", 0x70: "WEEDLE",
+    0x05: "SPEAROW", 0x03: "NIDORAN♂", 0x0F: "NIDORAN♀",
 }
+PARTY_ENTRY_SIZE = 44
+
+# The 20x18 background tile map and the tiles menus and text boxes are drawn with
+TILE_MAP = 0xC3A0
+TILE_MAP_WIDTH = 20
+TILE_MAP_SIZE = 20 * 18
+TEXT_BOX_TOP_LEFT = 0x79  # corner tiles of a box frame
+TEXT_BOX_BOTTOM_RIGHT = 0x7E
+MENU_CURSOR = 0xED  # ▶
+
+# Hot-path metrics
+TICK_SECONDS = Histogram('pokemon_emulator_tick_seconds', 'Time spent in one tick() call')
+FRAMES_EMULATED = Counter('pokemon_emulator_frames_total', 'Frames emulated')
+STATE_DECODE_SECONDS = Histogram('pokemon_emulator_state_decode_seconds', 'Time spent decoding the game state from memory')
 
 class PokemonEmulator:
-    def __init__(self, rom_path):
-        """Initialize the Pokemon emulator with the specified ROM."""
-        if not os.path.exists(rom_path):
-            raise FileNotFoundError(f"ROM file not found: {rom_path}")
+    def __init__(self, rom_path=None, headless=False, speed=None, input_log_path=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, backend=None):
+        """
+        Initialize the Pokemon emulator with the specified ROM.
+        
+        Args:
+            rom_path: Path to the ROM file (not needed when a backend is given)
+            headless: Run without a window
+            speed: Emulation speed multiplier (0 for uncapped); PyBoy's default if None
+            input_log_path: Record every button event to this input log (needs rom_path)
+            checkpoint_interval: Frames between state-hash checkpoints in the input log
+            backend: What to run the game on (see backends.py); PyBoy with rom_path if None
+        """
+        if backend is None:
+            if not rom_path or not os.path.exists(rom_path):
+                raise FileNotFoundError(f"ROM file not found: {rom_path}")
+            logger.info(f"Initializing emulator with ROM: {rom_path}")
+            backend = create_backend("pyboy", rom_path, headless=headless)
+        else:
+            logger.info(f"Initializing emulator on {type(backend).__name__}")
+        if input_log_path and not rom_path:
+            raise ValueError("Input logs record the ROM they were made with, so they need rom_path")
         
-        logger.info(f"Initializing emulator with ROM: {rom_path}")
         self.rom_path = rom_path
-        self.pyboy = PyBoy(rom_path, game_wrapper=True)
-        self.game = self.pyboy.game_wrapper()
+        self.backend = backend
+        if speed is not None:
+            self.backend.set_emulation_speed(speed)
         self.screen_buffer = []
         self.last_screenshot = None
         self.frame_count = 0
         self.is_running = False
         
+        # Bumped whenever the decoded game state changes; used for HTTP ETags
+        self.instance_id = f"{int(time.time() * 1000):x}"
+        self.state_version = 0
+        self.state_frame = None
+        
+        # Input recording for deterministic replay (see input_log.py)
+        self.input_log = None
+        self.checkpoint_interval = checkpoint_interval
+        self.next_checkpoint = 0
+        if input_log_path:
+            initial_state = BytesIO()
+            self.backend.save_state(initial_state)
+            self.input_log = InputLogWriter(input_log_path, rom_path, initial_state.getvalue())
+            self._checkpoint()
+            logger.info(f"Recording inputs to {input_log_path}")
+        
         # Game state tracking
         self.current_state = {
             "pokemon_team": [],
             "items": [],
             "location": "Unknown",
+            "map_id": None,
+            "battle_type": 0,
+            "text_box_open": False,
+            "in_grass": False,
+            "scripted_movement": False,
             "badges": 0,
             "money": 0,
             "coordinates": None,
@@ -68,16 +115,20 @@ class PokemonEmulator:
             logger.info("Starting emulator")
             self.is_running = True
     
-    def stop(self):
-        """Stop the emulator."""
+    def stop(self, save=True):
+        """Stop the emulator, writing the battery save unless save is False."""
         if self.is_running:
             logger.info("Stopping emulator")
             self.is_running = False
-            self.pyboy.stop()
+            if self.input_log:
+                self._checkpoint()
+                self.input_log.close()
+                self.input_log = None
+            self.backend.stop(save=save)
     
     def get_screenshot(self):
         """Get the current screenshot of the game."""
-        screen_image = self.pyboy.screen_image()
+        screen_image = self.backend.screen_image()
         self.last_screenshot = screen_image
         return screen_image
     
@@ -85,6 +136,15 @@ class PokemonEmulator:
         """Get the current screen as a numpy array."""
         return np.array(self.get_screenshot())
     
+    def get_screen_view(self):
+        """
+        Get the current screen as an RGB numpy array without encoding it.
+        
+        The backend backs this with its screen buffer, so the array is a view
+        that changes as the emulator runs; copy it to keep a frame.
+        """
+        return self.backend.screen_ndarray()
+    
     def save_screenshot(self, path):
         """Save the current screenshot to a file."""
         self.get_screenshot().save(path)
@@ -92,17 +152,34 @@ class PokemonEmulator:
     
     def execute_action(self, action):
         """Execute a game action (button press)."""
-        if action not in BUTTON_MAP:
+        if action not in BUTTONS:
             logger.warning(f"Unknown action: {action}")
             return False
         
         logger.info(f"Executing action: {action}")
-        self.pyboy.send_input(BUTTON_MAP[action])
+        self.send_button(action, True)
         self.tick(5)  # Small delay after button press
-        self.pyboy.send_input(BUTTON_RELEASE_MAP[action])
+        self.send_button(action, False)
         self.tick(5)  # Small delay after button release
         return True
     
+    def send_button(self, button, pressed):
+        """Press or release a button, recording it to the input log."""
+        self.backend.send_input(button, pressed)
+        if self.input_log:
+            self.input_log.record(self.frame_count, button, pressed)
+    
+    def get_state_hash(self):
+        """Get a short hash of the full emulator state."""
+        state = BytesIO()
+        self.backend.save_state(state)
+        return hashlib.blake2b(state.getvalue(), digest_size=8).digest()
+    
+    def _checkpoint(self):
+        """Write a state-hash checkpoint to the input log."""
+        self.input_log.checkpoint(self.frame_count, self.get_state_hash())
+        self.next_checkpoint = self.frame_count + self.checkpoint_interval
+    
     def execute_sequence(self, actions, delay=10):
         """Execute a sequence of actions with delays between them."""
         logger.info(f"Executing sequence: {actions}")
@@ -115,9 +192,14 @@ class PokemonEmulator:
     
     def tick(self, frames=1):
         """Advance the emulator by a number of frames."""
+        start = time.perf_counter()
         for _ in range(frames):
-            self.pyboy.tick()
+            self.backend.tick()
             self.frame_count += 1
+        TICK_SECONDS.observe(time.perf_counter() - start)
+        FRAMES_EMULATED.inc(frames)
+        if self.input_log and self.frame_count >= self.next_checkpoint:
+            self._checkpoint()
 
     def run_for_seconds(self, seconds):
         """Run the emulator for a specified number of seconds."""
@@ -128,9 +210,9 @@ class PokemonEmulator:
 
     def get_money(self):
         # Money is stored as BCD, need to convert
-        byte1 = self.pyboy.get_memory_value(0xD347)
-        byte2 = self.pyboy.get_memory_value(0xD348)
-        byte3 = self.pyboy.get_memory_value(0xD349)
+        byte1 = self.backend.get_memory_value(0xD347)
+        byte2 = self.backend.get_memory_value(0xD348)
+        byte3 = self.backend.get_memory_value(0xD349)
         
         # Convert from BCD
         digit1 = (byte1 >> 4) & 0xF
@@ -143,7 +225,7 @@ class PokemonEmulator:
         money = digit1 * 100000 + digit2 * 10000 + digit3 * 1000 + digit4 * 100 + digit5 * 10 + digit6
         return money
     def get_badges(self):
-        badge_bits = self.pyboy.get_memory_value(0xD356)
+        badge_bits = self.backend.get_memory_value(0xD356)
         badge_count = bin(badge_bits).count('1')
         return badge_count
     
@@ -210,18 +292,24 @@ class PokemonEmulator:
                 
 
     def get_location(self):
-        map_id = self.pyboy.get_memory_value(0xD35E)
+        map_id = self.backend.get_memory_value(0xD35E)
         return self.get_map_lookup(map_id)  # Would need to implement a map name lookup
     
+    def get_item_name(self, item_id):
+        return ITEM_NAMES.get(item_id, f"Item 0x{item_id:02X}")
+    
+    def get_pokemon_name(self, species_id):
+        return SPECIES_NAMES.get(species_id, f"POKEMON 0x{species_id:02X}")
+    
     def get_items(self):
         items = []
-        item_count = self.pyboy.get_memory_value(0xD31C)
+        item_count = self.backend.get_memory_value(0xD31C)
+        # Each item entry is 2 bytes: item ID and quantity
+        bag = self.backend.read_memory(0xD31D, item_count * 2)
         
         for i in range(item_count):
-            # Each item entry is 2 bytes: item ID and quantity
-            item_address = 0xD31D + (i * 2)
-            item_id = self.pyboy.get_memory_value(item_address)
-            item_quantity = self.pyboy.get_memory_value(item_address + 1)
+            item_id = bag[i * 2]
+            item_quantity = bag[i * 2 + 1]
             
             # Get item name from item ID (would need to implement a lookup table)
             item_name = self.get_item_name(item_id)
@@ -235,17 +323,18 @@ class PokemonEmulator:
     
     def get_pokemon_team(self):
         pokemon_team = []
-        team_size = self.pyboy.get_memory_value(0xD163)
+        team_size = self.backend.get_memory_value(0xD163)
+        party = self.backend.read_memory(0xD16B, team_size * PARTY_ENTRY_SIZE)
         
         for i in range(team_size):
-            # Calculate the starting address for this Pokémon
-            pokemon_address = 0xD16B + (i * 44)
+            # Each Pokémon's entry starts PARTY_ENTRY_SIZE bytes after the previous one
+            entry = party[i * PARTY_ENTRY_SIZE:(i + 1) * PARTY_ENTRY_SIZE]
             
             # Read species, level, HP, etc.
-            species_id = self.pyboy.get_memory_value(pokemon_address)
-            level = self.pyboy.get_memory_value(pokemon_address + 8)
-            current_hp = self.pyboy.get_memory_value(pokemon_address + 1) * 256 + self.pyboy.get_memory_value(pokemon_address + 2)
-            max_hp = self.pyboy.get_memory_value(pokemon_address + 3) * 256 + self.pyboy.get_memory_value(pokemon_address + 4)
+            species_id = entry[0]
+            level = entry[8]
+            current_hp = entry[1] * 256 + entry[2]
+            max_hp = entry[3] * 256 + entry[4]
             
             # Get Pokémon name (stored in a different location, indexed by species_id)
             name = self.get_pokemon_name(species_id)
@@ -260,8 +349,8 @@ class PokemonEmulator:
         return pokemon_team
     
     def get_pokemon_coordinates(self):
-        x =  self.pyboy.get_memory_value(0xD362)
-        y =  self.pyboy.get_memory_value(0xD361)
+        x =  self.backend.get_memory_value(0xD362)
+        y =  self.backend.get_memory_value(0xD361)
         return '(' + str(x) +',' + str(y) + ')'
 
     def update_game_state(self):
@@ -282,19 +371,35 @@ class PokemonEmulator:
         # TODO: update this
 
         # For now, just return placeholder data
+        start = time.perf_counter()
         money = self.get_money()
         badges = self.get_badges()
         location = self.get_location()
+        map_id = self.backend.get_memory_value(0xD35E)
+        battle_type = self.get_battle_type()
+        text_box_open = self.is_text_box_open()
+        tiles = self.get_screen_tiles()
+        dialogue_open = self.is_dialogue_open(tiles)
+        menu_open = self.is_menu_open(tiles)
+        in_grass = self.is_in_grass()
+        scripted_movement = self.is_scripted_movement()
         items = self.get_items()
         team = self.get_pokemon_team()
         coordinates = self.get_pokemon_coordinates()
-
+        STATE_DECODE_SECONDS.observe(time.perf_counter() - start)
         
 
-        self.current_state = {
+        new_state = {
             "pokemon_team": team,
             "items": items,
             "location": location,
+            "map_id": map_id,
+            "battle_type": battle_type,
+            "text_box_open": text_box_open,
+            "dialogue_open": dialogue_open,
+            "menu_open": menu_open,
+            "in_grass": in_grass,
+            "scripted_movement": scripted_movement,
             "badges": badges,
             "money":  money,
             'coordinates': coordinates,
@@ -302,16 +407,33 @@ class PokemonEmulator:
             'steps': self.current_state['steps'] +1 , 
         }
 
+        # Only a change in the decoded game data counts as a new version;
+        # 'steps' just counts how often we decoded
+        if any(new_state[key] != self.current_state.get(key) for key in new_state if key != 'steps'):
+            self.state_version += 1
+
+        self.current_state = new_state
+        self.state_frame = self.frame_count
+
         logger.info(f'leecatherine current state: {self.current_state}')
 
         
         return self.current_state
     
     def get_state(self):
-        """Get the current game state."""
-        self.update_game_state()
+        """Get the current game state, decoding memory only if the emulator has advanced."""
+        if self.state_frame != self.frame_count:
+            self.update_game_state()
         return self.current_state
     
+    def get_state_etag(self):
+        """Get an ETag that changes only when the decoded game state changes."""
+        return f"state-{self.instance_id}-{self.state_version}"
+    
+    def get_screenshot_etag(self):
+        """Get an ETag for the screen at the current frame."""
+        return f"frame-{self.instance_id}-{self.frame_count}"
+    
     def detect_game_screen(self):
         """Detect what screen we're currently on (battle, overworld, menu, etc.)."""
         # This would use image recognition or memory reading to determine the current screen
@@ -320,11 +442,44 @@ class PokemonEmulator:
         import random
         return random.choice(screens)
 
+    def get_battle_type(self):
+        """Get the battle type: 0 for none, 1 for wild, 2 for trainer, 255 after a loss."""
+        return self.backend.get_memory_value(0xD057)
+
+    def is_text_box_open(self):
+        """Check if a text box is on screen (the text font is loaded)."""
+        return bool(self.backend.get_memory_value(0xCFC4) & 0x01)
+
+    def get_screen_tiles(self):
+        """Get the 20x18 background tile map, row by row."""
+        return self.backend.read_memory(TILE_MAP, TILE_MAP_SIZE)
+
+    def is_menu_open(self, tiles=None):
+        """Check if a menu cursor is on screen: the start menu, the bag, a yes/no choice..."""
+        tiles = self.get_screen_tiles() if tiles is None else tiles
+        return MENU_CURSOR in tiles
+
+    def is_dialogue_open(self, tiles=None):
+        """Check if the dialogue box is drawn along the bottom of the screen with no menu open."""
+        tiles = self.get_screen_tiles() if tiles is None else tiles
+        # The dialogue box fills rows 12-17; menus are drawn elsewhere and carry a cursor
+        return (tiles[12 * TILE_MAP_WIDTH] == TEXT_BOX_TOP_LEFT
+                and tiles[TILE_MAP_SIZE - 1] == TEXT_BOX_BOTTOM_RIGHT
+                and not self.is_menu_open(tiles))
+
+    def is_in_grass(self):
+        """Check if the player is standing on the current tileset's grass tile."""
+        grass_tile = self.backend.get_memory_value(0xD535)
+        # The tile under the player is at (8, 9) of the 20x18 tile map at 0xC3A0
+        return grass_tile != 0xFF and self.backend.get_memory_value(0xC45C) == grass_tile
+
+    def is_scripted_movement(self):
+        """Check if an NPC is being moved by a script, e.g. a trainer who spotted the player."""
+        return bool(self.backend.get_memory_value(0xD730) & 0x01)
+
     def is_in_battle(self):
         """Check if the game is currently in a battle."""
-        # This would use memory reading to determine if in battle
-        # For now, return a placeholder
-        return self.detect_game_screen() == "battle"
+        return self.get_battle_type() in (1, 2)
 
     def get_game_loop_frequency(self):
         """Return the target frequency for the game loop."""
@@ -0,0 +1,182 @@
+"""
+Episodic Memory for Grok Plays Pokémon
+A persistent record of what each action did, indexed by map and position.
+
+Every step is stored as (map, x, y, screen hash, action, outcome), where the
+outcome is what the next game state showed:
+
+    moved       the player ended up on another tile
+    blocked     a direction was pressed and the player stayed put (a wall)
+    map_change  a door, warp or staircase
+    text        a text box opened (a sign, an NPC, an item)
+    battle      a battle started
+    no_change   nothing visible happened
+
+Episodes are written to SQLite so they survive restarts, and mirrored in
+in-memory indexes so "what happened last time here" and "dead ends on this
+map" are dictionary lookups on the decision path. For a plan, the first
+move is the one judged and indexed: it is the move taken from the tile.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+
+from plans import MOVES, parse_coordinates
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RECENT_PER_TILE = 5  # episodes kept in memory for each tile
+MAX_DEAD_ENDS = 50  # walls listed per map in the prompt
+COMMIT_EVERY = 20  # episodes between SQLite commits
+LOAD_LIMIT = 100000  # most recent episodes loaded from disk at startup
+
+
+def classify_outcome(before, action, after):
+    """Describe what an action (or the first move of a plan) did, given the states around it."""
+    if after.get("battle_type") in (1, 2) and before.get("battle_type") not in (1, 2):
+        return "battle"
+    if after.get("map_id") != before.get("map_id"):
+        return "map_change"
+    if after.get("text_box_open") and not before.get("text_box_open"):
+        return "text"
+    if after.get("coordinates") != before.get("coordinates"):
+        return "moved"
+    first = action[0] if isinstance(action, list) and action else action
+    if first in MOVES and not before.get("text_box_open") and before.get("battle_type") not in (1, 2):
+        return "blocked"
+    return "no_change"
+
+
+class EpisodeStore:
+    """SQLite-backed episodes with in-memory indexes by tile and by map."""
+
+    def __init__(self, path=None):
+        """
+        Open the store.
+
+        Args:
+            path: SQLite file, or None to keep episodes in memory for this run only
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_tile = defaultdict(lambda: deque(maxlen=RECENT_PER_TILE))
+        self._dead_ends = defaultdict(set)
+        self._sorted_dead_ends = defaultdict(list)  # the same walls, kept in order for the prompt
+        self._map_summaries = {}  # describe_map() text, dropped when a map's walls change
+        self._visits = defaultdict(int)
+        self._unsaved = 0
+        self.count = 0
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS episodes (id INTEGER PRIMARY KEY, map_id INTEGER, x INTEGER, y INTEGER, "
+            "frame_hash TEXT, action TEXT NOT NULL, outcome TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS episodes_by_tile ON episodes (map_id, x, y)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS episodes_by_outcome ON episodes (map_id, outcome)")
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT map_id, x, y, frame_hash, action, outcome, created_at FROM "
+            "(SELECT * FROM episodes ORDER BY id DESC LIMIT ?) ORDER BY id", (LOAD_LIMIT,)
+        ).fetchall()
+        for row in rows:
+            self._index(*row)
+        if rows:
+            logger.info(f"Loaded {len(rows)} episodes from {self.path}")
+
+    def _index(self, map_id, x, y, frame_hash, action, outcome, created_at):
+        self._visits[(map_id, x, y)] += 1
+        self._by_tile[(map_id, x, y)].append(
+            {"action": action, "outcome": outcome, "frame_hash": frame_hash, "time": created_at})
+        first = action.split(",", 1)[0]
+        if first in MOVES:
+            wall = (x, y, first)
+            walls = self._dead_ends[map_id]
+            if outcome == "blocked" and wall not in walls:
+                walls.add(wall)
+                insort(self._sorted_dead_ends[map_id], wall)
+                self._map_summaries.pop(map_id, None)
+            elif outcome != "blocked" and wall in walls:
+                # An NPC that was in the way may have moved on
+                walls.discard(wall)
+                ordered = self._sorted_dead_ends[map_id]
+                del ordered[bisect_left(ordered, wall)]
+                self._map_summaries.pop(map_id, None)
+        self.count += 1
+
+    def record(self, before, action, after, frame_hash=None):
+        """
+        Store what an action taken in the before state did.
+
+        Returns:
+            The outcome, or None if the step isn't tied to a tile.
+        """
+        position = parse_coordinates(before.get("coordinates"))
+        if position is None or before.get("battle_type") in (1, 2):
+            # Battle turns aren't about the tile the player stands on
+            return None
+        outcome = classify_outcome(before, action, after)
+        action = ",".join(action) if isinstance(action, list) else action
+        frame_hash = f"{frame_hash:016x}" if frame_hash is not None else None
+        row = (before.get("map_id"), position[0], position[1], frame_hash, action, outcome, time.time())
+
+        with self._lock:
+            self._index(*row)
+            self._db.execute(
+                "INSERT INTO episodes (map_id, x, y, frame_hash, action, outcome, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self._unsaved += 1
+            if self._unsaved >= COMMIT_EVERY:
+                self._db.commit()
+                self._unsaved = 0
+        return outcome
+
+    def last_here(self, map_id, position, limit=3):
+        """Get the most recent episodes at a tile, newest first."""
+        episodes = self._by_tile.get((map_id, position[0], position[1]))
+        return list(reversed(episodes))[:limit] if episodes else []
+
+    def visits(self, map_id, position):
+        """Get the number of steps taken from a tile."""
+        return self._visits.get((map_id, position[0], position[1]), 0)
+
+    def dead_ends(self, map_id, limit=None):
+        """Get the (x, y, direction) moves known to run into a wall on a map, in order."""
+        return list(self._sorted_dead_ends.get(map_id, ())[:limit])
+
+    def is_dead_end(self, map_id, position, direction):
+        """Check whether a move from a tile is known to run into a wall."""
+        return (position[0], position[1], direction) in self._dead_ends.get(map_id, ())
+
+    def describe_tile(self, map_id, position):
+        """Describe what happened at a tile before, for a prompt."""
+        episodes = self.last_here(map_id, position)
+        if not episodes:
+            return "Nothing recorded at this spot yet."
+        return "\n".join(f"- pressed {episode['action']}: {episode['outcome'].replace('_', ' ')}"
+                         for episode in episodes)
+
+    def describe_map(self, map_id):
+        """Describe the known walls on a map, for a prompt (None if there are none)."""
+        if map_id not in self._map_summaries:
+            dead_ends = self.dead_ends(map_id, MAX_DEAD_ENDS)
+            self._map_summaries[map_id] = "Moves that ran into a wall on this map: " + ", ".join(
+                f"{direction} at ({x},{y})" for x, y, direction in dead_ends) if dead_ends else None
+        return self._map_summaries[map_id]
+
+    def close(self):
+        """Commit pending episodes and close the database."""
+        with self._lock:
+            self._db.commit()
+            self._db.close()
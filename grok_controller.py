@@ -5,84 +5,15 @@ This script demonstrates how Grok would control the game via API requests.
 """
 
 import time
-import requests
 import json
 import logging
+from api_client import (get_game_status, get_game_state, execute_action,
+                        execute_sequence, start_game, stop_game)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Configuration
-API_BASE_URL = "http://localhost:5000/api"
-
-def get_game_status():
-    """Get the current game status from the API."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/status")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error getting game status: {e}")
-        return {"status": "error"}
-
-def get_game_state():
-    """Get the current game state from the API."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/state")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error getting game state: {e}")
-        return {}
-
-def execute_action(action, commentary=None):
-    """Execute a single game action with optional commentary."""
-    data = {"action": action}
-    if commentary:
-        data["commentary"] = commentary
-    
-    try:
-        response = requests.post(f"{API_BASE_URL}/execute_action", json=data)
-        result = response.json()
-        if result.get("success"):
-            logger.info(f"Action executed: {action}")
-        else:
-            logger.warning(f"Failed to execute action: {action} - {result.get('error')}")
-        return result
-    except Exception as e:
-        logger.error(f"Error executing action: {e}")
-        return {"success": False, "error": str(e)}
-
-def execute_sequence(actions, commentary=None):
-    """Execute a sequence of game actions with optional commentary."""
-    data = {"actions": actions}
-    if commentary:
-        data["commentary"] = commentary
-    
-    try:
-        response = requests.post(f"{API_BASE_URL}/execute_sequence", json=data)
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error executing sequence: {e}")
-        return {"success": False, "error": str(e)}
-
-def start_game():
-    """Start the game."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/start_game")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error starting game: {e}")
-        return {"success": False, "error": str(e)}
-
-def stop_game():
-    """Stop the game."""
-    try:
-        response = requests.get(f"{API_BASE_URL}/stop_game")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Error stopping game: {e}")
-        return {"success": False, "error": str(e)}
-
 def main():
     """Main function to demonstrate Grok's control of Pokemon Red."""
     logger.info("Grok controller starting")
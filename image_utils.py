@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Image Utilities for Grok Plays Pokémon
+Helpers for working with game frames given as PNG bytes, NumPy arrays or PIL images.
+
+preprocess_frame turns a frame into a compact PNG for the VLM: the Game Boy
+only draws four shades, so the frame is quantized to a 2-bit palette, optionally
+cropped to a region of interest and upscaled with nearest-neighbour, and saved
+without metadata. Results are cached by the frame's exact content.
+"""
+
+import argparse
+import base64
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+from PIL import Image
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# The four DMG shades as gray levels, lightest first
+GB_SHADES = (255, 170, 85, 0)
+
+# Regions of interest as (left, top, right, bottom) on the 160x144 screen
+REGIONS = {
+    "text_box": (0, 96, 160, 144),
+    "battle_hud": (0, 0, 160, 96),
+}
+
+PREPROCESS_CACHE_SIZE = 64  # frames kept by preprocess_frame
+
+# Index of the nearest shade for every gray level
+_SHADE_LUT = [min(range(len(GB_SHADES)), key=lambda i: abs(GB_SHADES[i] - level)) for level in range(256)]
+_SHADE_PALETTE = [channel for shade in GB_SHADES for channel in (shade, shade, shade)]
+
+_preprocess_cache = OrderedDict()
+_preprocess_lock = threading.Lock()
+
+
+def to_image(frame):
+    """Convert a frame (PNG bytes, RGB array or PIL image) to a PIL image."""
+    if isinstance(frame, Image.Image):
+        return frame
+    if isinstance(frame, (bytes, bytearray)):
+        return Image.open(BytesIO(frame))
+    return Image.fromarray(frame)
+
+
+def dhash(frame, size=8):
+    """
+    Compute a difference hash of a frame.
+
+    The frame is shrunk to (size + 1) x size grayscale pixels and each bit
+    records whether a pixel is brighter than its right-hand neighbour, so
+    frames that look alike get hashes a small Hamming distance apart.
+    """
+    image = to_image(frame).convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    """Count the bits that differ between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+def frame_digest(frame):
+    """Get a digest of a frame's exact content."""
+    data = bytes(frame) if isinstance(frame, (bytes, bytearray)) else frame.tobytes()
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def quantize(frame):
+    """Map a frame onto the Game Boy's four shades as a 2-bit palette image."""
+    gray = to_image(frame).convert("L")
+    indexed = Image.frombytes("P", gray.size, gray.point(_SHADE_LUT).tobytes())
+    indexed.putpalette(_SHADE_PALETTE)
+    return indexed
+
+
+def preprocess_frame(frame, scale=1, region=None):
+    """
+    Prepare a frame for the VLM.
+
+    Args:
+        frame: PNG bytes, RGB array or PIL image
+        scale: Integer nearest-neighbour upscale factor
+        region: Optional name from REGIONS to crop to
+
+    Returns:
+        PNG bytes with a 2-bit palette and no metadata.
+    """
+    if region is not None and region not in REGIONS:
+        raise ValueError(f"Unknown region: {region}. Must be one of {list(REGIONS)}.")
+
+    key = (frame_digest(frame), scale, region)
+    with _preprocess_lock:
+        if key in _preprocess_cache:
+            _preprocess_cache.move_to_end(key)
+            return _preprocess_cache[key]
+
+    image = quantize(frame)
+    if region is not None:
+        image = image.crop(REGIONS[region])
+    if scale > 1:
+        image = image.resize((image.width * scale, image.height * scale), Image.NEAREST)
+
+    buffered = BytesIO()
+    image.save(buffered, format="PNG", bits=2, optimize=True)
+    data = buffered.getvalue()
+
+    with _preprocess_lock:
+        _preprocess_cache[key] = data
+        while len(_preprocess_cache) > PREPROCESS_CACHE_SIZE:
+            _preprocess_cache.popitem(last=False)
+    return data
+
+
+def encode_png(frame):
+    """Encode a frame as a plain RGB PNG, the way frames were sent before preprocessing."""
+    if isinstance(frame, (bytes, bytearray)):
+        return bytes(frame)
+    buffered = BytesIO()
+    to_image(frame).convert("RGB").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Compare VLM payloads before and after preprocessing")
+    parser.add_argument("frames", nargs="+", help="Screenshots to compare (PNG)")
+    parser.add_argument("--scale", type=int, default=1, help="Nearest-neighbour upscale factor")
+    parser.add_argument("--region", choices=sorted(REGIONS), help="Crop to a region of interest")
+    return parser.parse_args()
+
+
+def main():
+    """Report base64 payload sizes and encode times for each frame."""
+    args = parse_args()
+    for path in args.frames:
+        frame = to_image(open(path, "rb").read()).convert("RGB")
+
+        start = time.perf_counter()
+        raw = base64.b64encode(encode_png(frame))
+        raw_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compact = base64.b64encode(preprocess_frame(frame, args.scale, args.region))
+        compact_seconds = time.perf_counter() - start
+
+        logger.info(
+            f"{path}: {len(raw)} -> {len(compact)} bytes ({len(compact) / len(raw):.0%}), "
+            f"encode {raw_seconds * 1000:.2f}ms -> {compact_seconds * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
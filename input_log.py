@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Input Log for Grok Plays Pokémon
+Compact binary recording of button inputs with deterministic replay.
+
+File layout:
+    header:  b"PKIL" + version byte + 20-byte SHA-1 of the ROM
+             + 4-byte little-endian length + zlib-compressed initial emulator state
+    records: varint((frame_delta << 5) | code)
+             code 0-15: button event, (button_index << 1) | pressed
+             code 16:   state checkpoint, followed by an 8-byte state hash
+
+Frame deltas are relative to the previous record, so the typical
+press/release pair a few frames apart packs into one byte each. The initial
+state includes the battery save PyBoy loaded at power-on, so replaying the
+records against the same ROM from that state reproduces the session exactly,
+whatever has happened to the .ram file since; checkpoints let the replay
+verify that it has not diverged. Version 1 logs have no initial state and
+replay from power-on.
+"""
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import sys
+import time
+import zlib
+from io import BytesIO
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PKIL"
+VERSION = 2
+BUTTONS = ["a", "b", "start", "select", "up", "down", "left", "right"]
+CHECKPOINT_CODE = 16
+HASH_SIZE = 8
+DEFAULT_CHECKPOINT_INTERVAL = 600  # frames (10 seconds of game time)
+
+
+class InputLogError(Exception):
+    """Raised for malformed logs and replay divergence."""
+
+
+def rom_digest(rom_path):
+    """Get the SHA-1 digest of a ROM file."""
+    with open(rom_path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+class InputLogWriter:
+    """Appends button events and checkpoints to an input log file."""
+
+    def __init__(self, path, rom_path, initial_state):
+        """Create the log file and write its header, including the state the recording starts from."""
+        self.path = path
+        self._file = open(path, "wb")
+        state = zlib.compress(initial_state)
+        self._file.write(MAGIC + bytes([VERSION]) + rom_digest(rom_path) + len(state).to_bytes(4, "little") + state)
+        self._last_frame = 0
+        self.events = 0
+
+    def _write(self, frame, code, payload=b""):
+        if frame < self._last_frame:
+            raise InputLogError(f"Frame {frame} is before the previous record ({self._last_frame})")
+        self._file.write(_encode_varint(((frame - self._last_frame) << 5) | code) + payload)
+        self._last_frame = frame
+
+    def record(self, frame, button, pressed):
+        """Record a button press or release applied before the given frame."""
+        self._write(frame, (BUTTONS.index(button) << 1) | int(bool(pressed)))
+        self.events += 1
+
+    def checkpoint(self, frame, state_hash):
+        """Record the state hash at the given frame and flush to disk."""
+        self._write(frame, CHECKPOINT_CODE, state_hash[:HASH_SIZE])
+        self._file.flush()
+
+    def close(self):
+        """Flush and close the log."""
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_input_log(path):
+    """
+    Read an input log.
+
+    Returns:
+        The ROM digest, the initial emulator state (None for version 1 logs)
+        and a list of records, each either ("input", frame, button, pressed)
+        or ("checkpoint", frame, state_hash).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    header_size = len(MAGIC) + 1 + 20
+    if data[:len(MAGIC)] != MAGIC or len(data) < header_size:
+        raise InputLogError(f"Not an input log: {path}")
+    version = data[len(MAGIC)]
+    if version not in (1, VERSION):
+        raise InputLogError(f"Unsupported input log version: {version}")
+
+    digest = data[len(MAGIC) + 1:header_size]
+    initial_state = None
+    if version >= 2:
+        state_size = int.from_bytes(data[header_size:header_size + 4], "little")
+        state_end = header_size + 4 + state_size
+        if len(data) < state_end:
+            raise InputLogError(f"Input log header truncated: {path}")
+        try:
+            initial_state = zlib.decompress(data[header_size + 4:state_end])
+        except zlib.error as e:
+            raise InputLogError(f"Corrupt initial state in {path}: {e}")
+        header_size = state_end
+
+    records = []
+    frame = 0
+    pos = header_size
+    while pos < len(data):
+        value = shift = 0
+        while True:
+            if pos >= len(data):
+                # A truncated tail means the recorder was killed mid-write
+                logger.warning(f"Input log truncated at byte {pos}")
+                return digest, initial_state, records
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+
+        frame += value >> 5
+        code = value & 0x1F
+        if code == CHECKPOINT_CODE:
+            if pos + HASH_SIZE > len(data):
+                logger.warning(f"Input log truncated at byte {pos}")
+                return digest, initial_state, records
+            records.append(("checkpoint", frame, data[pos:pos + HASH_SIZE]))
+            pos += HASH_SIZE
+        elif code < CHECKPOINT_CODE:
+            records.append(("input", frame, BUTTONS[code >> 1], bool(code & 1)))
+        else:
+            raise InputLogError(f"Unknown record code {code} at byte {pos}")
+
+    return digest, initial_state, records
+
+
+def prune_input_logs(directory, keep):
+    """Delete all but the newest keep input logs in a directory."""
+    paths = sorted(glob.glob(os.path.join(directory, "*.pkil")), key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+            logger.info(f"Removed old input log {path}")
+        except OSError as e:
+            logger.warning(f"Could not remove old input log {path}: {e}")
+
+
+def replay(rom_path, log_path, verify=True, backend=None):
+    """
+    Re-run a recorded session headless and uncapped.
+
+    Args:
+        rom_path: The ROM the session was recorded with
+        log_path: Path of the input log
+        verify: Compare state hashes at every checkpoint
+        backend: Backend to replay on (see backends.py); PyBoy with rom_path if None
+
+    Returns:
+        A dict with replay statistics.
+    """
+    from emulator import PokemonEmulator
+
+    digest, initial_state, records = read_input_log(log_path)
+    if digest != rom_digest(rom_path):
+        raise InputLogError("The input log was recorded with a different ROM")
+
+    emulator = PokemonEmulator(rom_path, headless=True, speed=0, backend=backend)
+    if initial_state is not None:
+        emulator.backend.load_state(BytesIO(initial_state))
+    emulator.start()
+    checkpoints = 0
+    start = time.perf_counter()
+    try:
+        for record in records:
+            frame = record[1]
+            if frame > emulator.frame_count:
+                emulator.tick(frame - emulator.frame_count)
+
+            if record[0] == "input":
+                emulator.send_button(record[2], record[3])
+            elif verify:
+                actual = emulator.get_state_hash()
+                if actual != record[2]:
+                    if frame == 0:
+                        raise InputLogError("Initial state differs from the recording (was the battery save changed?)")
+                    raise InputLogError(
+                        f"Replay diverged at frame {frame}: expected {record[2].hex()}, got {actual.hex()}"
+                    )
+                checkpoints += 1
+    finally:
+        elapsed = time.perf_counter() - start
+        frames = emulator.frame_count
+        # Leave the battery save alone so later replays start from the same state
+        emulator.stop(save=False)
+
+    return {
+        "frames": frames,
+        "inputs": sum(1 for record in records if record[0] == "input"),
+        "checkpoints_verified": checkpoints,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "speedup": frames / 60 / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Replay a recorded input log headless and uncapped")
+    parser.add_argument("rom", help="Path to the ROM the session was recorded with")
+    parser.add_argument("log", help="Path to the input log")
+    parser.add_argument("--no-verify", action="store_true", help="Skip state hash verification")
+    return parser.parse_args()
+
+
+def main():
+    """Replay an input log from the command line."""
+    args = parse_args()
+    try:
+        stats = replay(args.rom, args.log, verify=not args.no_verify)
+    except InputLogError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    logger.info(
+        f"Replayed {stats['frames']} frames and {stats['inputs']} inputs in {stats['seconds']:.1f}s "
+        f"({stats['fps']:.0f} fps, {stats['speedup']:.1f}x real time), "
+        f"{stats['checkpoints_verified']} checkpoints verified"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+LLM Response Cache for Grok Plays Pokémon
+Content-addressed cache for model responses, so repeated situations are not re-billed.
+
+Keys combine an exact digest of the frame, quantized to the Game Boy's four
+shades, with a hash of the whitespace-normalized prompt. A perceptual hash
+would be too coarse: dialogue pages and menus that differ only in their text
+look alike and would share a description. Lookups go through an in-memory LRU tier first
+and then an optional SQLite tier on disk; both honour a TTL.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from image_utils import quantize
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = Counter('pokemon_llm_cache_requests_total', 'LLM/VLM response cache lookups', ['kind', 'result'])
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so formatting differences do not change the key."""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of model responses."""
+
+    def __init__(self, capacity=256, path=None, ttl=3600.0):
+        """
+        Initialize the cache.
+
+        Args:
+            capacity: Entries kept in the in-memory LRU tier
+            path: SQLite file for the on-disk tier, or None for memory only
+            ttl: Seconds an entry stays valid (None for no expiry)
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def make_key(self, kind, prompt, frame=None, **params):
+        """
+        Build a cache key.
+
+        Args:
+            kind: The call type, e.g. "vlm" or "llm"
+            prompt: The prompt text (normalized before hashing)
+            frame: Optional frame; a digest of its quantized pixels becomes part of the key
+            params: Other request parameters that change the response (model, budget...)
+        """
+        digest = hashlib.sha256()
+        digest.update(kind.encode("utf-8"))
+        digest.update(normalize_prompt(prompt).encode("utf-8"))
+        for name in sorted(params):
+            digest.update(f"\0{name}={params[name]}".encode("utf-8"))
+        frame_part = hashlib.sha256(quantize(frame).tobytes()).hexdigest()[:32] if frame is not None else "-"
+        return f"{kind}:{frame_part}:{digest.hexdigest()}"
+
+    def get(self, key):
+        """Get a cached response, or None."""
+        kind = key.split(":", 1)[0]
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at >= now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.labels(kind, "memory_hit").inc()
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and (row[1] is None or row[1] >= now):
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    CACHE_REQUESTS.labels(kind, "disk_hit").inc()
+                    return row[0]
+
+            self.misses += 1
+            CACHE_REQUESTS.labels(kind, "miss").inc()
+            return None
+
+    def put(self, key, value):
+        """Store a response in both tiers."""
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, value, expires_at))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing LLM cache: {e}")
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        """Close the on-disk tier."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Mock Anthropic Server for Grok Plays Pokémon
+A local stand-in for the Anthropic Messages API, for offline benchmarks and CI.
+
+Speaks enough of POST /v1/messages for the anthropic client used by ClaudeAI:
+plain and streamed (server-sent events) responses, extended thinking blocks and
+base64 image inputs. Responses come from a script file or from a built-in
+responder that answers VLM requests with a screen description and LLM
+requests in the ACTION/REASONING format ClaudeAI parses. Latency is drawn from
+a configurable distribution and errors can be injected at a fixed rate.
+
+Point ClaudeAI at it with CLAUDE_BASE_URL=http://localhost:8008 (any API key works).
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+import metrics
+from metrics import Counter, Histogram
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_PORT = 8008
+CHUNK_SIZE = 16  # characters per streamed text delta
+
+RATE_LIMIT_RETRY_AFTER = 1  # seconds sent in the retry-after header of injected 429s
+MIN_CACHEABLE_TOKENS = 1024  # shorter prefixes aren't cached, as with the real API for Sonnet
+
+# Error types the real API returns for each injected status code
+ERROR_TYPES = {
+    400: "invalid_request_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error",
+}
+
+MOCK_REQUESTS = Counter('mock_anthropic_requests_total', 'Requests served by the mock server', ['stream', 'status'])
+MOCK_IMAGE_BYTES = Histogram('mock_anthropic_image_bytes', 'Decoded image bytes per request',
+                             buckets=metrics.SIZE_BUCKETS)
+
+app = Flask(__name__)
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution.
+
+    Accepted forms (seconds):
+        fixed:0.5
+        uniform:0.2,1.5
+        normal:1.0,0.3
+        lognormal:0.0,0.5   (mu and sigma of the underlying normal)
+
+    Returns:
+        A function returning one sample.
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(value) for value in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}")
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(*values)
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(*values))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda: random.lognormvariate(*values)
+    raise ValueError(f"Invalid latency spec: {spec}")
+
+
+def load_script(path):
+    """
+    Load scripted responses from a JSON list or a JSONL file.
+
+    Each entry is either a response string or a dict with "text" and optional
+    "match" (regex on the request's text), "image" (true/false to match only
+    requests with or without images), "latency" (seconds) and "error" (status).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        entries = json.loads(content)
+    else:
+        entries = [json.loads(line) for line in content.splitlines() if line.strip()]
+    return [entry if isinstance(entry, dict) else {"text": entry} for entry in entries]
+
+
+class MockModel:
+    """Decides what the mock server answers and how long it takes."""
+
+    def __init__(self, latency="fixed:0", chunk_delay=0.0, error_rate=0.0, error_status=529,
+                 script=None, seed=None, cached_latency_factor=1.0):
+        """
+        Initialize the mock model.
+
+        Args:
+            latency: Latency spec for the time to the first token (see parse_latency)
+            chunk_delay: Seconds between streamed chunks
+            error_rate: Fraction of requests that fail with error_status
+            error_status: HTTP status for injected failures
+            script: Optional list of scripted responses (see load_script)
+            seed: Seed for the random number generator, for repeatable runs
+            cached_latency_factor: Latency multiplier when the cacheable prompt prefix was seen before
+        """
+        if seed is not None:
+            random.seed(seed)
+        self.sample_latency = parse_latency(latency)
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.cached_latency_factor = cached_latency_factor
+        self._cached_prefixes = set()
+        self.script = script or []
+        self._script_position = 0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "images": 0, "image_bytes": 0}
+
+    def count(self, key, amount=1):
+        """Add to one of the request statistics."""
+        with self._lock:
+            self.stats[key] += amount
+
+    def prompt_cache(self, prefix):
+        """
+        Look up a cacheable prompt prefix: "read" if seen before, else "write".
+        Returns None for a prefix below the minimum cacheable length, which the
+        real API processes uncached without an error.
+        """
+        if _tokens(prefix) < MIN_CACHEABLE_TOKENS:
+            return None
+        key = hash(prefix)
+        with self._lock:
+            if key in self._cached_prefixes:
+                return "read"
+            self._cached_prefixes.add(key)
+            return "write"
+
+    def respond(self, text, has_image):
+        """
+        Pick the response for a request.
+
+        Returns:
+            A dict with "text", "latency" and "error" (a status code or None).
+        """
+        entry = self._scripted(text, has_image)
+        if entry is None:
+            entry = {"text": self._default_text(text, has_image)}
+
+        error = entry.get("error")
+        if error is None and self.error_rate and random.random() < self.error_rate:
+            error = self.error_status
+        latency = entry.get("latency")
+        return {
+            "text": entry.get("text", ""),
+            "latency": self.sample_latency() if latency is None else latency,
+            "error": error,
+        }
+
+    def _scripted(self, text, has_image):
+        if not self.script:
+            return None
+        with self._lock:
+            # Take the next entry that matches, so a script plays in order
+            for offset in range(len(self.script)):
+                index = (self._script_position + offset) % len(self.script)
+                entry = self.script[index]
+                if "image" in entry and entry["image"] != has_image:
+                    continue
+                if "match" in entry and not re.search(entry["match"], text):
+                    continue
+                self._script_position = index + 1
+                return entry
+        return None
+
+    def _default_text(self, text, has_image):
+        if has_image:
+            return ("The screen shows the overworld. The player is standing on a path "
+                    "with grass to the side and no text box open.")
+
+        action = random.choice(["up", "down", "left", "right", "a"])
+        location = re.search(r"Location:\s*([^\n]+)", text)
+        location = location.group(1).strip() if location else "this area"
+        return f"ACTION: {action}\nREASONING: Exploring {location}; trying {action} to see what is there."
+
+
+model = MockModel()
+
+
+def _request_content(body):
+    """Get the text and image sizes from a Messages API request body."""
+    texts = []
+    image_sizes = []
+    for message in body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for block in content:
+            if block.get("type") == "text":
+                texts.append(block.get("text", ""))
+            elif block.get("type") == "image":
+                source = block.get("source", {})
+                if source.get("type") != "base64":
+                    raise ValueError("Only base64 image sources are supported")
+                try:
+                    image_sizes.append(len(base64.b64decode(source.get("data", ""), validate=True)))
+                except (binascii.Error, ValueError):
+                    raise ValueError("Image data is not valid base64")
+    system = body.get("system")
+    if isinstance(system, str):
+        texts.insert(0, system)
+    elif isinstance(system, list):
+        texts[:0] = [block.get("text", "") for block in system]
+    return "\n".join(texts), image_sizes
+
+
+def _cacheable_prefix(body):
+    """Get the system text up to the last block marked with cache_control, or None."""
+    system = body.get("system")
+    if not isinstance(system, list):
+        return None
+    texts = []
+    prefix = None
+    for block in system:
+        texts.append(block.get("text", ""))
+        if block.get("cache_control"):
+            prefix = "\n".join(texts)
+    return prefix
+
+
+def _tokens(text):
+    # Roughly four characters per token is close enough for benchmarks
+    return max(1, len(text) // 4)
+
+
+def _error_response(status, message):
+    body = jsonify({"type": "error", "error": {"type": ERROR_TYPES.get(status, "api_error"), "message": message}})
+    # Like the real API, tell rate-limited clients when to come back
+    headers = {"retry-after": str(RATE_LIMIT_RETRY_AFTER)} if status == 429 else {}
+    return body, status, headers
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream(message, text, thinking, latency):
+    """Yield the server-sent events of a streamed response."""
+    yield _sse("message_start", {"type": "message_start", "message": dict(message, content=[], stop_reason=None)})
+    time.sleep(latency)
+
+    index = 0
+    if thinking:
+        yield _sse("content_block_start", {"type": "content_block_start", "index": index,
+                                           "content_block": {"type": "thinking", "thinking": "", "signature": ""}})
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": index,
+                                           "delta": {"type": "thinking_delta", "thinking": "Considering the options."}})
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": index,
+                                           "delta": {"type": "signature_delta", "signature": "mock"}})
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": index})
+        index += 1
+
+    yield _sse("content_block_start", {"type": "content_block_start", "index": index,
+                                       "content_block": {"type": "text", "text": ""}})
+    for start in range(0, len(text), CHUNK_SIZE):
+        if model.chunk_delay:
+            time.sleep(model.chunk_delay)
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": index,
+                                           "delta": {"type": "text_delta", "text": text[start:start + CHUNK_SIZE]}})
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": index})
+
+    yield _sse("message_delta", {"type": "message_delta",
+                                 "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                 "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+@app.route('/v1/messages', methods=['POST'])
+def create_message():
+    """Answer a Messages API request."""
+    body = request.get_json(silent=True)
+    stream = bool(body and body.get("stream"))
+    if not body or "messages" not in body or "max_tokens" not in body:
+        MOCK_REQUESTS.labels(str(stream).lower(), "400").inc()
+        return _error_response(400, "model, messages and max_tokens are required")
+
+    try:
+        text, image_sizes = _request_content(body)
+    except ValueError as e:
+        MOCK_REQUESTS.labels(str(stream).lower(), "400").inc()
+        return _error_response(400, str(e))
+
+    model.count("requests")
+    if image_sizes:
+        model.count("images", len(image_sizes))
+        model.count("image_bytes", sum(image_sizes))
+        MOCK_IMAGE_BYTES.observe(sum(image_sizes))
+
+    answer = model.respond(text, bool(image_sizes))
+    prefix = _cacheable_prefix(body)
+    cache = model.prompt_cache(prefix) if prefix else None
+    if cache == "read":
+        answer["latency"] *= model.cached_latency_factor
+    if answer["error"]:
+        model.count("errors")
+        MOCK_REQUESTS.labels(str(stream).lower(), str(answer["error"])).inc()
+        time.sleep(answer["latency"])
+        return _error_response(answer["error"], "Injected failure")
+
+    message = {
+        "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock"),
+        "content": [{"type": "text", "text": answer["text"]}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": _tokens(text) - (_tokens(prefix) if cache else 0) + 1000 * len(image_sizes),
+            "cache_creation_input_tokens": _tokens(prefix) if cache == "write" else 0,
+            "cache_read_input_tokens": _tokens(prefix) if cache == "read" else 0,
+            "output_tokens": _tokens(answer["text"]),
+        },
+    }
+    thinking = (body.get("thinking") or {}).get("type") == "enabled"
+    MOCK_REQUESTS.labels(str(stream).lower(), "200").inc()
+
+    if stream:
+        model.count("streamed")
+        return Response(_stream(message, answer["text"], thinking, answer["latency"]),
+                        content_type="text/event-stream")
+
+    time.sleep(answer["latency"])
+    if thinking:
+        message["content"].insert(0, {"type": "thinking", "thinking": "Considering the options.", "signature": "mock"})
+    return jsonify(message)
+
+
+@app.route('/stats')
+def get_stats():
+    """Get request counts since the server started."""
+    return jsonify(model.stats)
+
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics for the mock server."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Run a local mock of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--latency", default="fixed:0",
+                        help="Time to first token: fixed:S, uniform:LO,HI, normal:MEAN,SD or lognormal:MU,SIGMA")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=529, choices=sorted(ERROR_TYPES),
+                        help="HTTP status of injected failures")
+    parser.add_argument("--cached-latency-factor", type=float, default=1.0,
+                        help="Latency multiplier for requests whose cacheable prompt prefix was seen before")
+    parser.add_argument("--script", help="JSON or JSONL file of scripted responses")
+    parser.add_argument("--seed", type=int, help="Random seed for repeatable runs")
+    return parser.parse_args()
+
+
+def main():
+    """Run the mock server."""
+    global model
+    args = parse_args()
+    try:
+        model = MockModel(
+            latency=args.latency,
+            chunk_delay=args.chunk_delay,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            script=load_script(args.script) if args.script else None,
+            seed=args.seed,
+            cached_latency_factor=args.cached_latency_factor,
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+
+    logger.info(f"Mock Anthropic API on http://{args.host}:{args.port} (latency {args.latency}, "
+                f"error rate {args.error_rate:.0%})")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
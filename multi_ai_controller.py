@@ -7,7 +7,12 @@ Run this script to control the game with multiple AIs.
 import time
 import argparse
 import logging
-from ai_controller import AIManager, get_game_status, get_game_state, execute_action, start_game
+import metrics
+import tracing
+from ai_controller import AIManager, METRICS_PORT
+from api_client import get_client
+from backends import BACKENDS, SCENARIOS, create_backend
+from transport import TRANSPORTS, create_transport
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -32,6 +37,33 @@ def parse_args():
     parser.add_argument("--delay", type=float, default=1.0,
                       help="Delay between actions in seconds (default: 1.0)")
     
+    parser.add_argument("--transport", choices=TRANSPORTS, default="http",
+                      help="Drive the game server over HTTP, or run the emulator in this process (default: http)")
+    
+    parser.add_argument("--rom", default="roms/pokemon_red.gb",
+                      help="ROM to load with --transport inproc (default: roms/pokemon_red.gb)")
+    
+    parser.add_argument("--backend", choices=BACKENDS, default="pyboy",
+                      help="Emulate the ROM with PyBoy, or run on the ROM-free fake with --transport inproc (default: pyboy)")
+    
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="overworld",
+                      help="Starting state of the fake backend (default: overworld)")
+    
+    parser.add_argument("--screen", action="store_true",
+                      help="Pass the current frame to the AI on every step")
+    
+    parser.add_argument("--subscribe", action="store_true",
+                      help="Receive state updates over Socket.IO instead of polling /api/state")
+    
+    parser.add_argument("--route",
+                      help="Comma-separated moves to walk before asking the AI, e.g. up,up,left")
+    
+    parser.add_argument("--trace",
+                      help="Write per-step decision spans to this JSONL file (summarize with python tracing.py FILE)")
+    
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                      help="Serve AI decision metrics on this port at /metrics (default: off)")
+    
     return parser.parse_args()
 
 def main():
@@ -43,32 +75,39 @@ def main():
     logger.info(f"Pokémon AI: {args.pokemon}")
     logger.info(f"Mode: {args.mode}")
     
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    if args.trace:
+        tracing.configure(args.trace)
+    
     # Create AI manager
-    manager = AIManager()
+    backend = None
+    if args.backend == "fake":
+        if args.transport != "inproc":
+            raise SystemExit("--backend fake needs --transport inproc")
+        backend = create_backend("fake", scenario=args.scenario)
+    transport = create_transport(args.transport, rom_path=args.rom if backend is None else None, backend=backend)
+    manager = AIManager(transport=transport)
     
     # Configure AIs based on arguments
     manager.set_active_player_ai(args.player)
     manager.set_active_pokemon_ai(args.pokemon)
     manager.set_dual_mode(args.mode == "dual")
+    if args.route:
+        manager.set_route_plan([move.strip() for move in args.route.split(",")], "Following the route from the command line.")
+    
+    if args.subscribe and args.transport == "http":
+        get_client().subscribe()
     
     # Start the game if not running
-    status = get_game_status()
-    if status.get("status") != "running":
-        logger.info("Starting the game")
-        start_game()
-        time.sleep(2)  # Wait for game to initialize
+    transport.start_game()
     
     # Run the AIs for specified steps
-    logger.info(f"Running for {args.steps} steps with {args.delay}s delay")
+    logger.info(f"Running for {args.steps} steps with {args.delay}s delay ({args.transport} transport)")
+    run_start = time.perf_counter()
     for step in range(args.steps):
-        # Get current game state
-        state = get_game_state()
-        
-        # Get AI's decision
-        action, commentary = manager.get_action(state)
-        
-        # Execute the action
-        result = execute_action(action, commentary)
+        # Observe, decide and execute the action
+        action, commentary, result = manager.step(use_screen=args.screen)
         
         # Log the step
         logger.info(f"Step {step+1}/{args.steps}: {action} - {commentary}")
@@ -78,9 +117,22 @@ def main():
             logger.warning(f"Action failed: {result.get('error', 'Unknown error')}")
         
         # Wait before next action
-        time.sleep(args.delay)
+        transport.advance(args.delay)
     
-    logger.info("Multi-AI controller run completed")
+    elapsed = time.perf_counter() - run_start
+    shares = ", ".join(f"{tier} {share:.0%}" for tier, share in sorted(manager.tier_report().items()))
+    logger.info(f"Steps decided by: {shares}")
+    if manager.calls_per_tile() is not None:
+        logger.info(f"{manager.calls_per_tile():.2f} AI decisions per tile walked ({manager.tiles_moved} tiles)")
+    stuck = manager.stuck.report()
+    if stuck["detections"]:
+        logger.info(f"Loops: {stuck['detections']} detected, {stuck['recovered']} recovered, "
+                    f"{stuck['wasted_steps']} steps wasted before detection, ~{stuck['avoided_steps']} avoided")
+    logger.info(f"Multi-AI controller run completed: {args.steps} steps in {elapsed:.1f}s "
+                f"({args.steps / elapsed if elapsed else 0:.1f} steps/s)")
+    transport.close()
+    manager.episodes.close()
+    tracing.configure(None)  # flush the trace file
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Movement Plans for Grok Plays Pokémon
+Helpers for multi-move plans: where each move should take the player, how to
+turn a goal tile into moves, and when the game has stopped following the plan.
+
+Coordinates are (x, y) tiles as reported in the game state's "coordinates"
+field; y grows downwards, so "up" decreases it.
+"""
+
+import re
+
+# Configuration
+MAX_PLAN_LENGTH = 8  # moves the AI may plan at once
+PLAN_CHECKPOINT_EVERY = 4  # moves between comparisons of the expected and actual state
+
+MOVES = {
+    "up": (0, -1),
+    "down": (0, 1),
+    "left": (-1, 0),
+    "right": (1, 0),
+}
+
+_COORDINATES = re.compile(r"\(?\s*(\d+)\s*,\s*(\d+)\s*\)?")
+
+
+def parse_coordinates(value):
+    """Parse "(x,y)" (or an (x, y) pair) into a tuple, or None."""
+    if isinstance(value, (tuple, list)) and len(value) == 2:
+        return int(value[0]), int(value[1])
+    if not isinstance(value, str):
+        return None
+    match = _COORDINATES.fullmatch(value.strip())
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def tile_distance(a, b):
+    """Get the number of tiles walked between two positions."""
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def expected_positions(start, moves):
+    """Get the position the player should be at after each move."""
+    positions = []
+    x, y = start
+    for move in moves:
+        dx, dy = MOVES.get(move, (0, 0))
+        x, y = x + dx, y + dy
+        positions.append((x, y))
+    return positions
+
+
+def moves_toward(start, goal, limit=MAX_PLAN_LENGTH):
+    """Get the moves of a straight walk from start to goal, horizontal first."""
+    dx = goal[0] - start[0]
+    dy = goal[1] - start[1]
+    moves = ["right" if dx > 0 else "left"] * abs(dx) + ["down" if dy > 0 else "up"] * abs(dy)
+    return moves[:limit]
+
+
+def plan_divergence(start_state, state, expected_position):
+    """
+    Compare the game state with what the plan expected.
+
+    Returns:
+        A description of the difference, or None if the plan is on track.
+    """
+    if state.get("map_id") != start_state.get("map_id"):
+        return "the map changed"
+    if state.get("text_box_open") and not start_state.get("text_box_open"):
+        return "a text box opened"
+    if state.get("battle_type") in (1, 2):
+        return "a battle started"
+    position = parse_coordinates(state.get("coordinates"))
+    if position is not None and position != expected_position:
+        return f"the player is at {position} instead of {expected_position}"
+    return None
@@ -0,0 +1,151 @@
+"""
+Profiler for Grok Plays Pokémon
+On-demand profiling of the running server for a bounded time window.
+
+Two modes are supported:
+- "sample": a background thread samples the server thread's stack every few
+  milliseconds and writes collapsed stacks (flamegraph.pl / speedscope format).
+- "cprofile": cProfile is enabled on the server thread and the result is
+  written as a pstats file.
+
+The server runs its game loop, screenshot loop and request handlers as green
+threads on one OS thread, so profiling that thread covers all of them.
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sample", "cprofile")
+
+
+class ProfilerError(Exception):
+    """Raised when a profiling session cannot be started or stopped."""
+
+
+class Profiler:
+    """Runs at most one profiling session at a time."""
+
+    def __init__(self, output_dir="profiles", max_duration=300.0):
+        """Initialize the profiler."""
+        self.output_dir = output_dir
+        self.max_duration = max_duration
+        self._lock = threading.Lock()
+        self._session = None
+        self.last_result = None
+
+    @property
+    def running(self):
+        return self._session is not None
+
+    def start(self, mode="sample", duration=30.0, interval=0.005):
+        """
+        Start profiling the calling thread.
+
+        Args:
+            mode: "sample" for collapsed stacks or "cprofile" for pstats output
+            duration: Seconds after which the session stops on its own
+            interval: Seconds between stack samples (sample mode only)
+
+        Returns:
+            A dict describing the session.
+        """
+        if mode not in MODES:
+            raise ProfilerError(f"Unknown profiler mode: {mode}. Must be one of {MODES}.")
+
+        duration = max(0.1, min(float(duration), self.max_duration))
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerError("A profiling session is already running")
+
+            session = {
+                "mode": mode,
+                "started": time.time(),
+                "deadline": time.monotonic() + duration,
+                "duration": duration,
+                "thread_id": threading.get_ident(),
+            }
+            if mode == "cprofile":
+                session["profile"] = cProfile.Profile()
+                session["profile"].enable()
+            else:
+                session["interval"] = max(0.001, float(interval))
+                session["stacks"] = Counter()
+                session["stop_event"] = threading.Event()
+                session["sampler"] = threading.Thread(
+                    target=self._sample, args=(session,), name="profiler-sampler", daemon=True
+                )
+                session["sampler"].start()
+            self._session = session
+
+        logger.info(f"Profiling started ({mode}, {duration:.1f}s)")
+        return {"mode": mode, "duration": duration, "started": session["started"]}
+
+    def stop(self):
+        """
+        Stop the running session and write its result.
+
+        Must be called from the thread that started a cprofile session.
+
+        Returns:
+            The path of the result file.
+        """
+        with self._lock:
+            session = self._session
+            if session is None:
+                raise ProfilerError("No profiling session is running")
+            self._session = None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session["started"]))
+
+        if session["mode"] == "cprofile":
+            session["profile"].disable()
+            path = os.path.join(self.output_dir, f"profile-{stamp}.pstats")
+            session["profile"].dump_stats(path)
+        else:
+            session["stop_event"].set()
+            session["sampler"].join()
+            path = os.path.join(self.output_dir, f"profile-{stamp}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in session["stacks"].most_common():
+                    f.write(f"{stack} {count}\n")
+
+        self.last_result = path
+        logger.info(f"Profiling stopped, result written to {path}")
+        return path
+
+    def stop_if_expired(self):
+        """Stop the running session if its time window has passed."""
+        session = self._session
+        if session is not None and time.monotonic() >= session["deadline"]:
+            try:
+                return self.stop()
+            except ProfilerError:
+                pass
+        return None
+
+    def _sample(self, session):
+        """Sample the profiled thread's stack until stopped or past the deadline."""
+        thread_id = session["thread_id"]
+        interval = session["interval"]
+        stacks = session["stacks"]
+        stop_event = session["stop_event"]
+
+        while not stop_event.wait(interval) and time.monotonic() < session["deadline"]:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stacks[";".join(reversed(names))] += 1
@@ -0,0 +1,104 @@
+"""
+Rule-Based Fast Path for Grok Plays Pokémon
+Deterministic rules that decide the obvious steps without calling a model.
+
+AIManager asks the rules first and only falls through to the player or
+Pokémon AI when none of them applies. The rules look at the decoded game
+state only, so they answer in microseconds:
+
+    route_plan    the next move of a walk planned earlier (see set_route_plan)
+    advance_text  press A while a dialogue box is open outside battle
+
+The text box flag in RAM only says the font is loaded, which is also true in
+the start menu and the bag, so advance_text waits for the dialogue box frame
+to be drawn with no menu cursor on screen. Pressing A blindly in a menu would
+pick items and options.
+
+A rule that keeps firing without visible effect hands control back to the AI,
+so a misread state can't lock the game in a loop.
+"""
+
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+MAX_TEXT_PRESSES = 8  # A presses in a row before the AI gets a look at the text box
+DIRECTIONS = ("up", "down", "left", "right")
+
+
+class RulePolicy:
+    """Ordered deterministic rules tried before the AI."""
+
+    def __init__(self):
+        """Initialize the rules with no route plan."""
+        self.route_plan = deque()
+        self.route_reason = None
+        self._route_position = None
+        self._text_presses = 0
+
+    def set_route_plan(self, moves, reason=None):
+        """
+        Queue moves to walk without consulting the AI.
+
+        Args:
+            moves: Directions ("up", "down", "left", "right") in order
+            reason: Commentary shown while the plan is followed
+        """
+        invalid = [move for move in moves if move not in DIRECTIONS]
+        if invalid:
+            raise ValueError(f"Route plans can only contain directions, got {invalid}")
+        self.route_plan = deque(moves)
+        self.route_reason = reason
+        self._route_position = None
+        logger.info(f"Route plan set: {len(self.route_plan)} moves")
+
+    def clear_route_plan(self):
+        """Drop any remaining planned moves."""
+        self.route_plan.clear()
+        self.route_reason = None
+        self._route_position = None
+
+    def decide(self, game_state, in_battle):
+        """
+        Try each rule in order.
+
+        Returns:
+            (rule name, action, commentary), or None if the AI should decide.
+        """
+        decision = self._route_plan(game_state, in_battle)
+        if decision is None:
+            decision = self._advance_text(game_state, in_battle)
+        if decision is None or decision[0] != "advance_text":
+            self._text_presses = 0
+        return decision
+
+    def _route_plan(self, game_state, in_battle):
+        if not self.route_plan:
+            return None
+        if in_battle or game_state.get("text_box_open"):
+            # Something interrupted the walk; let the other rules and the AI handle it
+            return None
+
+        position = (game_state.get("map_id"), game_state.get("coordinates"))
+        if self._route_position is not None and position == self._route_position:
+            logger.info(f"Route plan blocked at {position}, dropping {len(self.route_plan)} moves")
+            self.clear_route_plan()
+            return None
+
+        self._route_position = position
+        action = self.route_plan.popleft()
+        commentary = self.route_reason or "Following the planned route."
+        return "route_plan", action, commentary
+
+    def _advance_text(self, game_state, in_battle):
+        if in_battle or not game_state.get("dialogue_open") or game_state.get("menu_open"):
+            return None
+        if self._text_presses >= MAX_TEXT_PRESSES:
+            # A misread screen or a very long dialogue; let the AI look at it once
+            self._text_presses = 0
+            return None
+
+        self._text_presses += 1
+        return "advance_text", "a", "Continuing the dialogue."
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Request Scheduler for Grok Plays Pokémon
+Coordinates Anthropic API calls from every Claude AI in the process.
+
+All calls go through one shared scheduler, so sessions sharing an API key
+queue behind the same budgets instead of racing into rate limits:
+
+    - token buckets for requests per minute and input tokens per minute
+    - priority lanes: a waiting battle decision goes ahead of the overworld
+    - retries with full-jitter exponential backoff, honouring retry-after
+    - a circuit breaker that fails calls fast after repeated errors, so the
+      caller can fall back to local play until the API recovers
+
+Budgets are per process. When several controller processes share a key,
+give each its share with CLAUDE_RPM and CLAUDE_ITPM.
+
+Try it against the mock server:
+    python mock_anthropic.py --error-rate 0.2 --error-status 429
+    python scheduler.py --base-url http://localhost:8008 --sessions 8 --rpm 120
+"""
+
+import argparse
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Counter, Gauge, Histogram
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Configuration
+CLAUDE_RPM = float(os.getenv("CLAUDE_RPM", "50"))  # requests per minute for the whole process
+CLAUDE_ITPM = float(os.getenv("CLAUDE_ITPM", "40000"))  # input tokens per minute
+MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0  # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 30.0
+BREAKER_THRESHOLD = int(os.getenv("CLAUDE_BREAKER_THRESHOLD", "5"))  # failed calls in a row that open the circuit
+BREAKER_COOLDOWN = float(os.getenv("CLAUDE_BREAKER_COOLDOWN", "30"))  # seconds before a trial call is let through
+
+# Lower runs first
+LANES = {"battle": 0, "overworld": 1}
+
+# Statuses worth retrying: timeouts, rate limits, server errors and overload
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+SCHEDULER_WAIT_SECONDS = Histogram('pokemon_scheduler_wait_seconds', 'Time calls waited for rate-limit budget',
+                                   ['lane'])
+SCHEDULER_CALLS = Counter('pokemon_scheduler_calls_total', 'API calls by lane and outcome', ['lane', 'result'])
+SCHEDULER_RETRIES = Counter('pokemon_scheduler_retries_total', 'Retried API calls by reason', ['reason'])
+SCHEDULER_QUEUE = Gauge('pokemon_scheduler_queue_depth', 'Calls waiting for rate-limit budget')
+BREAKER_STATE = Gauge('pokemon_scheduler_breaker_open', '1 while the circuit breaker is open')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+    pass
+
+
+class TokenBucket:
+    """Refills at a steady rate up to a capacity of one minute's budget."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount):
+        """Get the seconds until amount can be taken (0 if it can be now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        """Return an over-estimate, or charge more when amount is negative."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the API said the limit was hit."""
+        self._refill()
+        self.level = min(self.level, 0.0)
+
+
+class CircuitBreaker:
+    """Opens after repeated failures and lets one trial call through after a cooldown."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """Check whether a call may go out now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("API calls are succeeding again, closing the circuit")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+            BREAKER_STATE.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.threshold):
+                logger.warning(f"Opening the circuit after {self.failures} failed API calls, "
+                               f"retrying in {self.cooldown:.0f}s")
+                self.opened_at = time.monotonic()
+                BREAKER_STATE.set(1)
+            self._trial = False
+
+
+def error_status(error):
+    """Get the HTTP status of an API error, or None for connection errors."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error):
+    """Check whether an API error is worth retrying."""
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Connection errors and timeouts carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError")
+
+
+def retry_after(error):
+    """Get the server's retry-after hint in seconds, if it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages, system=None):
+    """Roughly estimate the input tokens of a request (4 characters per token, ~1,600 per image)."""
+    characters = 0
+    images = 0
+    parts = list(messages)
+    if system:
+        parts.append({"content": system})
+    for part in parts:
+        content = part.get("content")
+        blocks = [content] if isinstance(content, str) else (content or [])
+        for block in blocks:
+            if isinstance(block, str):
+                characters += len(block)
+            elif block.get("type") == "image":
+                images += 1
+            else:
+                characters += len(block.get("text", ""))
+    return characters // 4 + images * 1600
+
+
+class RequestScheduler:
+    """Shared rate-limit budget, priority queue, retries and circuit breaker for API calls."""
+
+    def __init__(self, rpm=CLAUDE_RPM, itpm=CLAUDE_ITPM, max_retries=MAX_RETRIES, breaker=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            rpm: Requests per minute across all callers
+            itpm: Input tokens per minute across all callers
+            max_retries: Retries per call after the first attempt
+            breaker: CircuitBreaker to use (a default one if None)
+        """
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(itpm)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    def call(self, function, lane="overworld", tokens=0):
+        """
+        Run an API call once budget allows, retrying transient errors.
+
+        Args:
+            function: Makes the request; called again on each retry
+            lane: "battle" or "overworld"
+            tokens: Estimated input tokens of the request
+
+        Returns:
+            Whatever function returns.
+
+        Raises:
+            CircuitOpenError: The circuit is open, so the call was not made
+            The last error, if it is not retryable or retries run out
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                SCHEDULER_CALLS.labels(lane, "rejected").inc()
+                raise CircuitOpenError("Too many failed API calls; waiting before trying again")
+
+            self._acquire(lane, tokens)
+            try:
+                result = function()
+            except Exception as e:
+                if not is_retryable(e):
+                    # The request itself is wrong; the API is fine
+                    self.breaker.record_success()
+                    SCHEDULER_CALLS.labels(lane, "error").inc()
+                    raise
+                self.breaker.record_failure()
+                if error_status(e) == 429:
+                    # Everyone sharing the key is over budget, not just this call
+                    with self._condition:
+                        self.requests.drain()
+                if attempt >= self.max_retries or self.breaker.is_open:
+                    SCHEDULER_CALLS.labels(lane, "failed").inc()
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                attempt += 1
+                reason = str(error_status(e) or type(e).__name__)
+                SCHEDULER_RETRIES.labels(reason).inc()
+                logger.warning(f"API call failed ({reason}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            SCHEDULER_CALLS.labels(lane, "ok").inc()
+            return result
+
+    def settle(self, estimated, actual):
+        """Correct the token budget once a response reports the real input tokens."""
+        with self._condition:
+            self.tokens.give(estimated - actual)
+            self._condition.notify_all()
+
+    def _acquire(self, lane, tokens):
+        """Wait until this call is first in line and both buckets have room."""
+        ticket = (LANES.get(lane, len(LANES)), next(self._sequence))
+        start = time.perf_counter()
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            SCHEDULER_QUEUE.set(len(self._waiting))
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        timeout = max(self.requests.delay(1), self.tokens.delay(tokens))
+                        if timeout <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            return
+                    self._condition.wait(timeout)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                SCHEDULER_QUEUE.set(len(self._waiting))
+                self._condition.notify_all()
+                SCHEDULER_WAIT_SECONDS.labels(lane).observe(time.perf_counter() - start)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler():
+    """Get the scheduler shared by every caller in this process."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RequestScheduler()
+        return _shared
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Load-test the request scheduler with concurrent sessions")
+    parser.add_argument("--base-url", default="http://localhost:8008", help="API to call, e.g. mock_anthropic.py")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent callers sharing the scheduler")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per session")
+    parser.add_argument("--battle-share", type=float, default=0.25, help="Fraction of requests in the battle lane")
+    parser.add_argument("--rpm", type=float, default=CLAUDE_RPM, help="Requests per minute")
+    parser.add_argument("--itpm", type=float, default=CLAUDE_ITPM, help="Input tokens per minute")
+    return parser.parse_args()
+
+
+def main():
+    """Fire requests from several sessions through one scheduler and report the outcome."""
+    import anthropic
+
+    args = parse_args()
+    client = anthropic.Anthropic(api_key="mock", base_url=args.base_url, max_retries=0)
+    scheduler = RequestScheduler(rpm=args.rpm, itpm=args.itpm)
+    messages = [{"role": "user", "content": "What should be the next action?"}]
+    outcomes = {"ok": 0, "failed": 0, "rejected": 0}
+    waits = {lane: [] for lane in LANES}
+    lock = threading.Lock()
+
+    def session(session_id):
+        for _ in range(args.requests):
+            lane = "battle" if random.random() < args.battle_share else "overworld"
+            start = time.perf_counter()
+            try:
+                scheduler.call(lambda: client.messages.create(model="mock", max_tokens=256, messages=messages),
+                               lane=lane, tokens=estimate_tokens(messages))
+                outcome = "ok"
+            except CircuitOpenError:
+                outcome = "rejected"
+                time.sleep(1)
+            except Exception:
+                outcome = "failed"
+            with lock:
+                outcomes[outcome] += 1
+                waits[lane].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        list(pool.map(session, range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(outcomes.values())
+    print(f"{total} requests from {args.sessions} sessions in {elapsed:.1f}s "
+          f"({total / elapsed * 60:.0f}/min, budget {args.rpm:.0f}/min)")
+    print(", ".join(f"{outcome} {count}" for outcome, count in outcomes.items()))
+    for lane, values in waits.items():
+        if values:
+            print(f"{lane}: mean {sum(values) / len(values):.2f}s per call over {len(values)} calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Session Manager for Grok Plays Pokémon
+Hosts many independent emulator sessions spread across worker processes.
+
+Each worker process owns a set of PokemonEmulator instances and runs one game
+loop that advances all of them. The server talks to workers over pipes:
+commands go down as ("call", request_id, method, kwargs) and come back as
+("reply", request_id, ok, result); workers also push ("event", session_id,
+name, data) messages that the server forwards to the session's Socket.IO room.
+"""
+
+import base64
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from io import BytesIO
+
+import eventlet
+from eventlet.event import Event
+from eventlet.hubs import trampoline
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+GAME_LOOP_HZ = 30  # loop iterations per second, matching app.game_loop
+FRAMES_PER_ITERATION = 2
+STATE_UPDATE_FRAMES = 30  # decode the game state every N frames
+CALL_TIMEOUT = 30.0  # seconds to wait for a worker reply
+
+DEFAULT_AI_SETTINGS = {
+    "playerAI": "grok",
+    "pokemonAI": "claude",
+    "mode": "dual",
+    "currentAI": "Grok"
+}
+
+
+class SessionError(Exception):
+    """Raised when a session command fails."""
+
+
+def select_current_ai(ai_settings, in_battle):
+    """Get the name of the AI that should be in control."""
+    if ai_settings["mode"] == "dual" and in_battle:
+        return "Claude" if ai_settings["pokemonAI"] == "claude" else "Grok"
+    return "Grok" if ai_settings["playerAI"] == "grok" else "Claude"
+
+
+def _max_rss_bytes():
+    """Get the peak resident memory of this process in bytes, if known."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return rss if os.uname().sysname == "Darwin" else rss * 1024
+
+
+class _SessionWorker:
+    """Runs inside a worker process and owns that worker's emulators."""
+
+    def __init__(self, conn, worker_id, rom_directory, screenshot_interval):
+        self.conn = conn
+        self.worker_id = worker_id
+        self.rom_directory = rom_directory
+        self.screenshot_interval = screenshot_interval
+        self.sessions = {}
+        self.base_rss = _max_rss_bytes()
+        self.cpu_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def run(self):
+        """Serve commands and advance every session until told to shut down."""
+        logger.info(f"Session worker {self.worker_id} started (pid {os.getpid()})")
+        interval = 1 / GAME_LOOP_HZ
+        while True:
+            loop_start = time.perf_counter()
+            cpu_start = time.process_time()
+
+            # Block while idle, otherwise only drain what is already queued
+            timeout = None if not self.sessions else 0
+            while self.conn.poll(timeout):
+                timeout = 0
+                message = self.conn.recv()
+                if message[0] == "shutdown":
+                    self._shutdown()
+                    return
+                self._handle_call(*message[1:])
+
+            for session_id, session in list(self.sessions.items()):
+                start = time.process_time()
+                try:
+                    self._advance(session_id, session)
+                except Exception as e:
+                    logger.error(f"Error in session {session_id}: {e}")
+                session["cpu_seconds"] += time.process_time() - start
+
+            elapsed = time.perf_counter() - loop_start
+            if self.sessions:
+                self.cpu_seconds += time.process_time() - cpu_start
+                self.wall_seconds += max(elapsed, interval)
+            if elapsed < interval:
+                time.sleep(interval - elapsed)
+
+    def _handle_call(self, request_id, method, kwargs):
+        handler = getattr(self, f"cmd_{method}", None)
+        try:
+            if handler is None:
+                raise SessionError(f"Unknown command: {method}")
+            self.conn.send(("reply", request_id, True, handler(**kwargs)))
+        except Exception as e:
+            self.conn.send(("reply", request_id, False, str(e)))
+
+    def _emit(self, session_id, name, data):
+        self.conn.send(("event", session_id, name, data))
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionError(f"Unknown session: {session_id}")
+        return session
+
+    def _advance(self, session_id, session):
+        emulator = session["emulator"]
+        if not emulator.is_running:
+            return
+
+        emulator.tick(FRAMES_PER_ITERATION)
+        if emulator.frame_count - session["last_state_frame"] >= STATE_UPDATE_FRAMES:
+            session["last_state_frame"] = emulator.frame_count
+            state = emulator.get_state()
+            ai_settings = session["ai_settings"]
+            ai_settings["currentAI"] = select_current_ai(ai_settings, emulator.is_in_battle())
+            pushed = (emulator.state_version, ai_settings["currentAI"])
+            if pushed != session["last_pushed"]:
+                session["last_pushed"] = pushed
+                self._emit(session_id, "state_update", dict(state, currentAI=ai_settings["currentAI"]))
+
+        now = time.monotonic()
+        if now - session["last_screenshot"] >= self.screenshot_interval:
+            session["last_screenshot"] = now
+            png = self.cmd_get_screenshot(session_id)
+            self._emit(session_id, "screenshot_update", {"image": base64.b64encode(png).decode("utf-8")})
+
+    def _shutdown(self):
+        for session in self.sessions.values():
+            session["emulator"].stop(save=False)
+        self.sessions.clear()
+        logger.info(f"Session worker {self.worker_id} stopped")
+
+    def cmd_create_session(self, session_id, rom_file, ai_settings):
+        from emulator import PokemonEmulator
+
+        # No window and no frame limiter: the worker loop paces every session at GAME_LOOP_HZ
+        emulator = PokemonEmulator(os.path.join(self.rom_directory, rom_file), headless=True, speed=0)
+        emulator.start()
+        self.sessions[session_id] = {
+            "emulator": emulator,
+            "ai_settings": dict(DEFAULT_AI_SETTINGS, **ai_settings),
+            "created": time.time(),
+            "last_state_frame": 0,
+            "last_pushed": None,
+            "last_screenshot": 0.0,
+            "cpu_seconds": 0.0,
+        }
+        return self._describe(session_id)
+
+    def cmd_destroy_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise SessionError(f"Unknown session: {session_id}")
+        # Sessions on the same ROM share its battery save file; leave it alone
+        session["emulator"].stop(save=False)
+        return True
+
+    def cmd_get_state(self, session_id):
+        session = self._session(session_id)
+        return dict(session["emulator"].get_state(), currentAI=session["ai_settings"]["currentAI"])
+
+    def cmd_get_screenshot(self, session_id):
+        buffered = BytesIO()
+        self._session(session_id)["emulator"].get_screenshot().save(buffered, format="PNG")
+        return buffered.getvalue()
+
+    def cmd_execute_action(self, session_id, action):
+        return self._session(session_id)["emulator"].execute_action(action)
+
+    def cmd_execute_sequence(self, session_id, actions):
+        return self._session(session_id)["emulator"].execute_sequence(actions)
+
+    def cmd_update_ai_settings(self, session_id, settings):
+        ai_settings = self._session(session_id)["ai_settings"]
+        for key in ("playerAI", "pokemonAI", "mode"):
+            if key in settings:
+                ai_settings[key] = settings[key]
+        if ai_settings["mode"] == "single":
+            ai_settings["currentAI"] = select_current_ai(ai_settings, False)
+        self._emit(session_id, "ai_settings_update", dict(ai_settings, success=True))
+        return dict(ai_settings)
+
+    def cmd_describe(self, session_id):
+        return self._describe(session_id)
+
+    def cmd_stats(self):
+        rss = _max_rss_bytes()
+        busy_fraction = self.cpu_seconds / self.wall_seconds if self.wall_seconds else 0.0
+        count = len(self.sessions)
+        now = time.time()
+        # CPU time each session used per second of wall time, averaged over the sessions
+        fractions = [session["cpu_seconds"] / max(now - session["created"], 1e-9)
+                     for session in self.sessions.values()]
+        per_session_cpu = sum(fractions) / count if count else None
+        return {
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "sessions": count,
+            "busy_fraction": busy_fraction,
+            # Share of one core each session needs to run at full speed
+            "cpu_per_session": per_session_cpu,
+            "max_sessions_per_core": int(1 / per_session_cpu) if per_session_cpu else None,
+            "rss_bytes": rss,
+            "rss_per_session_bytes": (rss - self.base_rss) // count if count and rss and self.base_rss else None,
+        }
+
+    def _describe(self, session_id):
+        session = self._session(session_id)
+        emulator = session["emulator"]
+        age = max(time.time() - session["created"], 1e-9)
+        return {
+            "session_id": session_id,
+            "worker_id": self.worker_id,
+            "status": "running" if emulator.is_running else "stopped",
+            "frame_count": emulator.frame_count,
+            "ai_settings": dict(session["ai_settings"]),
+            "created": session["created"],
+            "cpu_fraction": session["cpu_seconds"] / age,
+        }
+
+
+def _worker_main(conn, worker_id, rom_directory, screenshot_interval):
+    """Entry point of a session worker process."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    _SessionWorker(conn, worker_id, rom_directory, screenshot_interval).run()
+
+
+class SessionManager:
+    """
+    Creates, tracks and destroys emulator sessions on a pool of worker processes.
+
+    Meant to be used from the eventlet server: calls block only the calling
+    green thread while the worker replies.
+    """
+
+    def __init__(self, rom_directory, num_workers=None, max_sessions=64,
+                 screenshot_interval=1.0, on_event=None):
+        """Initialize the manager. Worker processes start on first use."""
+        self.rom_directory = rom_directory
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_sessions = max_sessions
+        self.screenshot_interval = screenshot_interval
+        self.on_event = on_event
+        self._workers = []
+        self._sessions = {}  # session_id -> worker index
+        self._pending = {}  # request_id -> Event
+        self._running = False
+
+    def _start_workers(self):
+        if self._running:
+            return
+        # Spawn rather than fork so workers do not inherit the eventlet hub
+        context = multiprocessing.get_context("spawn")
+        for worker_id in range(self.num_workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(child_conn, worker_id, self.rom_directory, self.screenshot_interval),
+                name=f"session-worker-{worker_id}",
+                daemon=True,
+            )
+            process.start()
+            worker = {"id": worker_id, "process": process, "conn": parent_conn}
+            worker["reader"] = eventlet.spawn(self._read_loop, worker)
+            self._workers.append(worker)
+        self._running = True
+        logger.info(f"Started {self.num_workers} session workers")
+
+    def _read_loop(self, worker):
+        """Dispatch replies and events coming back from one worker."""
+        conn = worker["conn"]
+        while self._running:
+            try:
+                # Park this green thread until the pipe is readable
+                trampoline(conn.fileno(), read=True)
+                message = conn.recv()
+            except (EOFError, OSError):
+                if self._running:
+                    logger.error(f"Session worker {worker['id']} exited")
+                return
+
+            if message[0] == "reply":
+                _, request_id, ok, result = message
+                event = self._pending.pop(request_id, None)
+                if event is not None:
+                    event.send((ok, result))
+            elif message[0] == "event" and self.on_event:
+                _, session_id, name, data = message
+                try:
+                    self.on_event(session_id, name, data)
+                except Exception as e:
+                    logger.error(f"Error forwarding {name} for session {session_id}: {e}")
+
+    def _call_worker(self, worker, method, **kwargs):
+        request_id = uuid.uuid4().hex
+        event = Event()
+        self._pending[request_id] = event
+        worker["conn"].send(("call", request_id, method, kwargs))
+        try:
+            with eventlet.Timeout(CALL_TIMEOUT):
+                ok, result = event.wait()
+        except eventlet.Timeout:
+            self._pending.pop(request_id, None)
+            raise SessionError(f"Worker {worker['id']} did not answer {method} in time")
+        if not ok:
+            raise SessionError(result)
+        return result
+
+    def create(self, rom_file, ai_settings=None):
+        """Create a session on the least loaded worker and return its description."""
+        if len(self._sessions) >= self.max_sessions:
+            raise SessionError(f"Session limit reached ({self.max_sessions})")
+        self._start_workers()
+
+        load = [0] * len(self._workers)
+        for index in self._sessions.values():
+            load[index] += 1
+        index = load.index(min(load))
+
+        session_id = uuid.uuid4().hex[:12]
+        info = self._call_worker(self._workers[index], "create_session", session_id=session_id,
+                                 rom_file=rom_file, ai_settings=ai_settings or {})
+        self._sessions[session_id] = index
+        logger.info(f"Created session {session_id} on worker {index}")
+        return info
+
+    def destroy(self, session_id):
+        """Stop and remove a session."""
+        index = self._index(session_id)
+        self._call_worker(self._workers[index], "destroy_session", session_id=session_id)
+        del self._sessions[session_id]
+        logger.info(f"Destroyed session {session_id}")
+
+    def list(self):
+        """Describe every session."""
+        return [self.call(session_id, "describe") for session_id in list(self._sessions)]
+
+    def call(self, session_id, method, **kwargs):
+        """Run a command against one session on its worker."""
+        index = self._index(session_id)
+        return self._call_worker(self._workers[index], method, session_id=session_id, **kwargs)
+
+    def stats(self):
+        """Per-worker overhead figures and an estimate of sessions per core."""
+        workers = [self._call_worker(worker, "stats") for worker in self._workers]
+        costs = [w["cpu_per_session"] for w in workers if w["cpu_per_session"]]
+        per_session = sum(costs) / len(costs) if costs else None
+        return {
+            "sessions": len(self._sessions),
+            "workers": workers,
+            "cpu_per_session": per_session,
+            "max_sessions_per_core": int(1 / per_session) if per_session else None,
+        }
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def _index(self, session_id):
+        index = self._sessions.get(session_id)
+        if index is None:
+            raise SessionError(f"Unknown session: {session_id}")
+        return index
+
+    def shutdown(self):
+        """Stop every worker process."""
+        if not self._running:
+            return
+        self._running = False
+        for worker in self._workers:
+            try:
+                worker["conn"].send(("shutdown",))
+            except OSError:
+                pass
+            worker["process"].join(timeout=5)
+        self._workers = []
+        self._sessions.clear()
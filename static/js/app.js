@@ -18,8 +18,12 @@ const playerAISelect = document.getElementById('player-ai');
 const pokemonAISelect = document.getElementById('pokemon-ai');
 const aiModeSelect = document.getElementById('ai-mode');
 
+// Maximum number of commentary lines kept on the page
+const MAX_COMMENTARY_ITEMS = 200;
+
 // Game state
 let gameRunning = false;
+let lastCommentaryId = 0;
 let currentAISettings = {
     playerAI: 'grok',
     pokemonAI: 'claude',
@@ -248,6 +252,11 @@ function addCommentary(text) {
     commentaryItem.textContent = text;
     
     commentaryEl.appendChild(commentaryItem);
+    
+    // Keep the DOM bounded on long streams
+    while (commentaryEl.childElementCount > MAX_COMMENTARY_ITEMS) {
+        commentaryEl.removeChild(commentaryEl.firstElementChild);
+    }
     commentaryEl.scrollTop = commentaryEl.scrollHeight; // Auto-scroll to bottom
 }
 
@@ -269,18 +278,43 @@ function fetchGameState() {
         });
 }
 
-// Fetch commentary history
+// Add a stored commentary entry, skipping ones we have already shown
+function addCommentaryEntry(entry) {
+    if (entry.id !== undefined) {
+        if (entry.id <= lastCommentaryId) return;
+        lastCommentaryId = entry.id;
+    }
+    addCommentary(entry.text);
+}
+
+// Fetch the most recent page of commentary history
 function fetchCommentary() {
-    fetch('/api/commentary')
+    fetch('/api/commentary?limit=50')
         .then(response => response.json())
         .then(data => {
             commentaryEl.innerHTML = '';
-            if (data.length === 0) {
+            lastCommentaryId = 0;
+            if (data.commentary.length === 0) {
                 addCommentary('Waiting for AI to start commenting...');
             } else {
-                data.forEach(comment => {
-                    addCommentary(comment.text);
-                });
+                data.commentary.forEach(addCommentaryEntry);
+            }
+        })
+        .catch(error => {
+            console.error('Error fetching commentary:', error);
+        });
+}
+
+// Fetch commentary we missed (e.g. while disconnected), one page at a time
+function fetchNewCommentary() {
+    if (lastCommentaryId === 0) return;
+    
+    fetch(`/api/commentary?since=${lastCommentaryId}&limit=50`)
+        .then(response => response.json())
+        .then(data => {
+            data.commentary.forEach(addCommentaryEntry);
+            if (data.has_more) {
+                fetchNewCommentary();
             }
         })
         .catch(error => {
@@ -346,6 +380,7 @@ function stopGame() {
 socket.on('connect', () => {
     console.log('Connected to server');
     addCommentary('Connected to Pokémon server!');
+    fetchNewCommentary();
 });
 
 socket.on('disconnect', () => {
@@ -371,7 +406,7 @@ socket.on('state_update', (data) => {
 });
 
 socket.on('commentary_update', (data) => {
-    addCommentary(data.text);
+    addCommentaryEntry(data);
 });
 
 socket.on('ai_settings_update', (data) => {
@@ -0,0 +1,171 @@
+"""
+Stuck and Loop Detection for Grok Plays Pokémon
+Spots the AI wasting steps and picks a way out.
+
+The detector keeps a rolling window of recent states, each (map, coordinates,
+screen hash), with a count per state, so every step is O(1):
+
+    stuck   the same state STILL_LIMIT steps in a row (a wall, a closed dialogue)
+    cycle   a full window that only ever visits MAX_CYCLE_STATES states
+            (oscillating between two tiles)
+
+The screen hash only counts while a text box is open. In the overworld,
+animated water and flowers change the frame without any progress being made.
+
+Recoveries, in order of preference:
+
+    menu_escape  press B to back out of a text box or menu
+    frontier     walk toward the least-visited open neighbouring tile
+    think_harder give the LLM a higher thinking budget for the next decision
+"""
+
+import logging
+import random
+from collections import deque
+
+from metrics import Counter
+from plans import MOVES, parse_coordinates
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WINDOW = 12  # recent steps kept for cycle detection
+STILL_LIMIT = 6  # identical states in a row before the AI counts as stuck
+MAX_CYCLE_STATES = 2  # distinct states a full window may visit before it counts as a cycle
+RECOVERY_GRACE = 5  # steps a recovery has to reach a state the loop never visited
+FRONTIER_STEPS = 4  # length of the walk toward the frontier
+MENU_ESCAPE = ["b", "b"]
+
+STUCK_EVENTS = Counter('pokemon_stuck_events_total', 'Loops detected, by kind and recovery', ['kind', 'recovery'])
+STUCK_STEPS = Counter('pokemon_stuck_steps_total', 'Steps spent in loops before detection, and estimated steps saved',
+                      ['kind'])
+
+
+def state_key(game_state, frame_hash=None):
+    """Get the key steps that made no progress share."""
+    screen = frame_hash if game_state.get("text_box_open") else None
+    return game_state.get("map_id"), game_state.get("coordinates"), screen
+
+
+def frontier_walk(episodes, game_state, length=FRONTIER_STEPS):
+    """
+    Plan a short straight walk toward the least-visited neighbouring tile.
+
+    Moves known to run into a wall are skipped. Returns None if the position
+    is unknown or every direction is a known wall.
+    """
+    position = parse_coordinates(game_state.get("coordinates"))
+    if episodes is None or position is None:
+        return None
+    map_id = game_state.get("map_id")
+    options = {}
+    for direction, (dx, dy) in MOVES.items():
+        if not episodes.is_dead_end(map_id, position, direction):
+            options[direction] = episodes.visits(map_id, (position[0] + dx, position[1] + dy))
+    if not options:
+        return None
+    fewest = min(options.values())
+    direction = random.choice([direction for direction, visits in options.items() if visits == fewest])
+    return [direction] * length
+
+
+class StuckDetector:
+    """Rolling-window detector of zero-progress streaks and short cycles."""
+
+    def __init__(self):
+        """Initialize the detector with an empty window."""
+        self._window = deque()
+        self._counts = {}
+        self._last = None
+        self.still = 0
+        self._recovery = None
+        self.detections = 0
+        self.recovered = 0
+        self.wasted_steps = 0
+        self.avoided_steps = 0
+
+    def observe(self, game_state, frame_hash=None, in_battle=False):
+        """
+        Add a step's state to the window.
+
+        Returns:
+            "stuck", "cycle" or None.
+        """
+        if in_battle:
+            # Battle turns legitimately repeat the same overworld state
+            self.reset()
+            return None
+
+        key = state_key(game_state, frame_hash)
+        self._settle_recovery(key)
+
+        self.still = self.still + 1 if key == self._last else 1
+        self._last = key
+        self._window.append(key)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        if len(self._window) > WINDOW:
+            old = self._window.popleft()
+            self._counts[old] -= 1
+            if not self._counts[old]:
+                del self._counts[old]
+
+        if self.still >= STILL_LIMIT:
+            return "stuck"
+        if len(self._window) == WINDOW and len(self._counts) <= MAX_CYCLE_STATES:
+            return "cycle"
+        return None
+
+    @property
+    def looping(self):
+        """Check whether the last step returned to a state already in the window, or a recovery is under way."""
+        return self._recovery is not None or self._counts.get(self._last, 0) > 1
+
+    def recovering(self, kind, recovery):
+        """
+        Note that a recovery was started for a detected loop.
+
+        The window is cleared, so the recovery gets a fresh window before the
+        detector can fire again.
+        """
+        steps = self.still if kind == "stuck" else len(self._window)
+        self.detections += 1
+        self.wasted_steps += steps
+        STUCK_EVENTS.labels(kind, recovery).inc()
+        STUCK_STEPS.labels("wasted").inc(steps)
+        logger.info(f"Detected a {kind} after {steps} steps, recovering with {recovery}")
+        self._recovery = {"kind": kind, "recovery": recovery, "steps": 0, "loop_steps": steps,
+                          "visited": set(self._counts)}
+        self.reset()
+
+    def _settle_recovery(self, key):
+        recovery = self._recovery
+        if recovery is None:
+            return
+        recovery["steps"] += 1
+        if key not in recovery["visited"]:
+            # Assume the loop would have repeated at least once more without the recovery
+            saved = max(0, recovery["loop_steps"] - recovery["steps"])
+            self.recovered += 1
+            self.avoided_steps += saved
+            STUCK_STEPS.labels("avoided").inc(saved)
+            logger.info(f"{recovery['recovery']} got out of the {recovery['kind']} in {recovery['steps']} steps")
+            self._recovery = None
+        elif recovery["steps"] >= RECOVERY_GRACE:
+            logger.info(f"{recovery['recovery']} did not get out of the {recovery['kind']}")
+            self._recovery = None
+
+    def reset(self):
+        """Forget the window (the streak starts again from the next step)."""
+        self._window.clear()
+        self._counts.clear()
+        self._last = None
+        self.still = 0
+
+    def report(self):
+        """Get detections, successful recoveries and wasted and avoided steps."""
+        return {
+            "detections": self.detections,
+            "recovered": self.recovered,
+            "wasted_steps": self.wasted_steps,
+            "avoided_steps": self.avoided_steps,
+        }
@@ -0,0 +1,74 @@
+import pytest
+
+from episodes import MAX_DEAD_ENDS, EpisodeStore, classify_outcome
+
+HERE = {"map_id": 12, "coordinates": "(5,5)", "text_box_open": False, "battle_type": 0}
+
+
+@pytest.mark.parametrize("after, action, outcome", [
+    (dict(HERE, battle_type=1), "up", "battle"),
+    (dict(HERE, map_id=13), "up", "map_change"),
+    (dict(HERE, text_box_open=True), "a", "text"),
+    (dict(HERE, coordinates="(5,4)"), "up", "moved"),
+    (HERE, "up", "blocked"),
+    (HERE, ["left", "left"], "blocked"),
+    (HERE, "a", "no_change"),
+])
+def test_classify_outcome(after, action, outcome):
+    assert classify_outcome(HERE, action, after) == outcome
+
+
+def test_pressing_a_direction_in_a_text_box_is_not_a_wall():
+    before = dict(HERE, text_box_open=True)
+    assert classify_outcome(before, "up", before) == "no_change"
+
+
+def test_walls_are_recorded_and_cleared():
+    episodes = EpisodeStore()
+    assert episodes.record(HERE, "up", HERE) == "blocked"
+    assert episodes.is_dead_end(12, (5, 5), "up")
+    assert episodes.describe_map(12) == "Moves that ran into a wall on this map: up at (5,5)"
+
+    # The NPC that was in the way walked off
+    assert episodes.record(HERE, "up", dict(HERE, coordinates="(5,4)")) == "moved"
+    assert not episodes.is_dead_end(12, (5, 5), "up")
+    assert episodes.describe_map(12) is None
+    assert episodes.visits(12, (5, 5)) == 2
+
+
+def test_plans_are_indexed_by_their_first_move():
+    episodes = EpisodeStore()
+    episodes.record(HERE, ["left", "up"], HERE)
+    assert episodes.is_dead_end(12, (5, 5), "left")
+    assert episodes.last_here(12, (5, 5))[0]["action"] == "left,up"
+
+
+def test_dead_ends_are_sorted_and_capped_in_the_summary():
+    episodes = EpisodeStore()
+    for x in reversed(range(MAX_DEAD_ENDS + 10)):
+        episodes.record(dict(HERE, coordinates=f"({x},5)"), "up", dict(HERE, coordinates=f"({x},5)"))
+    walls = episodes.dead_ends(12)
+    assert walls == sorted(walls)
+    assert len(walls) == MAX_DEAD_ENDS + 10
+    assert episodes.describe_map(12).count(" at (") == MAX_DEAD_ENDS
+
+
+def test_battle_turns_are_not_recorded():
+    episodes = EpisodeStore()
+    battle = dict(HERE, battle_type=1)
+    assert episodes.record(battle, "a", battle) is None
+    assert episodes.count == 0
+
+
+def test_episodes_survive_a_restart(tmp_path):
+    path = str(tmp_path / "episodes.sqlite")
+    episodes = EpisodeStore(path)
+    episodes.record(HERE, "up", HERE)
+    episodes.record(HERE, "a", dict(HERE, text_box_open=True))
+    episodes.close()
+
+    episodes = EpisodeStore(path)
+    assert episodes.count == 2
+    assert episodes.is_dead_end(12, (5, 5), "up")
+    assert [episode["outcome"] for episode in episodes.last_here(12, (5, 5))] == ["text", "blocked"]
+    episodes.close()
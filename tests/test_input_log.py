@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from input_log import (BUTTONS, InputLogError, InputLogWriter, prune_input_logs, read_input_log, replay,
+                       rom_digest)
+
+
+@pytest.fixture
+def rom(tmp_path):
+    path = tmp_path / "game.gb"
+    path.write_bytes(b"not really a ROM")
+    return str(path)
+
+
+def test_records_round_trip(tmp_path, rom):
+    path = str(tmp_path / "session.pkil")
+    writer = InputLogWriter(path, rom, b"initial state")
+    writer.checkpoint(0, b"\x01" * 8)
+    for frame, button in enumerate(BUTTONS):
+        writer.record(frame * 100, button, True)
+        writer.record(frame * 100 + 5, button, False)
+    writer.checkpoint(1000, b"\x02" * 8)
+    writer.close()
+
+    digest, initial_state, records = read_input_log(path)
+    assert digest == rom_digest(rom)
+    assert initial_state == b"initial state"
+    assert records[0] == ("checkpoint", 0, b"\x01" * 8)
+    assert records[1:3] == [("input", 0, "a", True), ("input", 5, "a", False)]
+    assert records[-2] == ("input", 705, "right", False)
+    assert records[-1] == ("checkpoint", 1000, b"\x02" * 8)
+
+
+def test_truncated_tail_keeps_the_complete_records(tmp_path, rom):
+    path = tmp_path / "session.pkil"
+    writer = InputLogWriter(str(path), rom, b"")
+    writer.record(10, "a", True)
+    writer.checkpoint(20, b"\x03" * 8)
+    writer.close()
+    path.write_bytes(path.read_bytes()[:-3])
+
+    _, _, records = read_input_log(str(path))
+    assert records == [("input", 10, "a", True)]
+
+
+def test_records_must_be_in_frame_order(tmp_path, rom):
+    writer = InputLogWriter(str(tmp_path / "session.pkil"), rom, b"")
+    writer.record(10, "a", True)
+    with pytest.raises(InputLogError):
+        writer.record(9, "a", False)
+    writer.close()
+
+
+def test_not_an_input_log(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"hello, this is not a log")
+    with pytest.raises(InputLogError):
+        read_input_log(str(path))
+
+
+def test_prune_keeps_the_newest_logs(tmp_path):
+    for index in range(5):
+        path = tmp_path / f"session-{index}.pkil"
+        path.write_bytes(b"")
+        os.utime(path, (index, index))
+    prune_input_logs(str(tmp_path), keep=2)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["session-3.pkil", "session-4.pkil"]
+
+
+def record_session(rom, log_path, backend):
+    from emulator import PokemonEmulator
+
+    emulator = PokemonEmulator(rom, backend=backend, input_log_path=log_path, checkpoint_interval=20)
+    emulator.start()
+    emulator.execute_sequence(["up", "up", "left", "a", "a"])
+    emulator.tick(60)
+    emulator.stop(save=False)
+
+
+def test_record_and_replay_on_the_fake_backend(tmp_path, rom):
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    from backends import BATTLE_TYPE, FakeBackend
+
+    log_path = str(tmp_path / "session.pkil")
+    script = [(40, {BATTLE_TYPE: 1})]
+    record_session(rom, log_path, FakeBackend("route_grass", script=script))
+
+    stats = replay(rom, log_path, backend=FakeBackend("route_grass", script=script))
+    assert stats["inputs"] == 10
+    assert stats["checkpoints_verified"] >= 5
+
+    # Without the scripted battle the game takes another path
+    with pytest.raises(InputLogError, match="diverged"):
+        replay(rom, log_path, backend=FakeBackend("route_grass"))
+
+
+def test_replay_starts_from_the_recorded_state(tmp_path, rom):
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    from backends import FakeBackend
+
+    # Recording starts mid-battle, one A press into it
+    backend = FakeBackend("battle")
+    backend.send_input("a", True)
+    backend.send_input("a", False)
+    log_path = str(tmp_path / "session.pkil")
+    record_session(rom, log_path, backend)
+
+    stats = replay(rom, log_path, backend=FakeBackend("battle"))
+    assert stats["checkpoints_verified"] >= 5
+
+
+def test_replay_rejects_another_rom(tmp_path, rom):
+    pytest.importorskip("numpy")
+    pytest.importorskip("PIL")
+    log_path = str(tmp_path / "session.pkil")
+    InputLogWriter(log_path, rom, b"").close()
+    other = tmp_path / "other.gb"
+    other.write_bytes(b"a different game")
+    with pytest.raises(InputLogError, match="different ROM"):
+        replay(str(other), log_path)
@@ -0,0 +1,94 @@
+"""Claude's request path, driven end to end against mock_anthropic.py."""
+
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+import mock_anthropic  # noqa: E402
+
+OVERWORLD = {"map_id": 12, "location": "ROUTE 1", "coordinates": "(5,5)", "battle_type": 0,
+             "text_box_open": False, "pokemon_team": [], "items": [], "badges": 0, "money": 3000}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = mock_anthropic.MockModel(seed=0)
+    monkeypatch.setattr(mock_anthropic, "model", model)
+    return model
+
+
+def ask(client, system, stream=False):
+    return client.post("/v1/messages", json={
+        "model": "mock", "max_tokens": 64, "stream": stream, "system": system,
+        "messages": [{"role": "user", "content": "What should be the next action?"}],
+    })
+
+
+def cached_block(characters):
+    return [{"type": "text", "text": "x" * characters, "cache_control": {"type": "ephemeral"}}]
+
+
+def test_short_prefixes_are_not_cached(model):
+    client = mock_anthropic.app.test_client()
+    for _ in range(2):
+        usage = ask(client, cached_block(400)).get_json()["usage"]
+        assert usage["cache_creation_input_tokens"] == usage["cache_read_input_tokens"] == 0
+        assert usage["input_tokens"] >= 100
+
+
+def test_long_prefixes_are_written_then_read(model):
+    client = mock_anthropic.app.test_client()
+    size = mock_anthropic.MIN_CACHEABLE_TOKENS * 4
+    first = ask(client, cached_block(size)).get_json()["usage"]
+    second = ask(client, cached_block(size)).get_json()["usage"]
+    assert first["cache_creation_input_tokens"] == second["cache_read_input_tokens"] == size // 4
+    assert second["input_tokens"] < size // 4
+
+
+def test_system_prompts_are_long_enough_to_cache():
+    prompts = pytest.importorskip("prompts")
+    for prompt in (prompts.player_system_prompt(), prompts.battle_system_prompt()):
+        assert len(prompt) // 4 >= mock_anthropic.MIN_CACHEABLE_TOKENS
+
+
+@pytest.fixture
+def claude(monkeypatch, model):
+    werkzeug = pytest.importorskip("werkzeug.serving")
+    ai_controller = pytest.importorskip("ai_controller")
+
+    server = werkzeug.make_server("127.0.0.1", 0, mock_anthropic.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ai_controller, "CLAUDE_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(ai_controller, "LLM_CACHE_PATH", "")
+    claude = ai_controller.ClaudeAI()
+    claude.early_exit = "off"
+    yield claude
+    server.shutdown()
+
+
+def test_claude_action(claude, model):
+    model.script = [{"text": "ACTION: left\nREASONING: The way north is blocked."}]
+    assert claude.decide_action(OVERWORLD) == ("left", "The way north is blocked.")
+    assert claude.lane == "overworld"
+
+
+def test_claude_plan_at_the_end_of_the_response(claude, model):
+    model.script = [{"text": "REASONING: The path is clear.\nPLAN: up, up, left"}]
+    action, reasoning = claude.decide_action(OVERWORLD)
+    assert action == ["up", "up", "left"]
+    assert reasoning == "The path is clear."
+
+
+def test_claude_battle_goes_through_the_model_in_the_battle_lane(claude, model):
+    model.script = [{"text": "ACTION: a\nREASONING: Tackle is the best move here."}]
+    battle = dict(OVERWORLD, battle_type=2)
+    assert claude.decide_action(battle, role="pokemon") == ("a", "Tackle is the best move here.")
+    assert claude.lane == "battle"
+    assert model.stats["requests"] == 1
+
+
+def test_claude_battle_rejects_plans(claude, model):
+    model.script = [{"text": "PLAN: up, up\nREASONING: Run away."}]
+    action, _ = claude.decide_action(dict(OVERWORLD, battle_type=1), role="pokemon")
+    assert action in ("a", "b", "down")  # the local fallback strategy
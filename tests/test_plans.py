@@ -0,0 +1,38 @@
+from plans import expected_positions, moves_toward, parse_coordinates, plan_divergence
+
+START = {"map_id": 12, "coordinates": "(5,5)", "text_box_open": False, "battle_type": 0}
+
+
+def test_parse_coordinates():
+    assert parse_coordinates("(5,7)") == (5, 7)
+    assert parse_coordinates(" 12, 4 ") == (12, 4)
+    assert parse_coordinates([3, 4]) == (3, 4)
+    assert parse_coordinates("north") is None
+    assert parse_coordinates(None) is None
+
+
+def test_moves_toward_walks_horizontally_first():
+    assert moves_toward((5, 5), (7, 3)) == ["right", "right", "up", "up"]
+    assert moves_toward((5, 5), (5, 5)) == []
+    assert len(moves_toward((0, 0), (20, 0))) == 8
+
+
+def test_expected_positions():
+    assert expected_positions((5, 5), ["up", "up", "left"]) == [(5, 4), (5, 3), (4, 3)]
+
+
+def test_plan_on_track():
+    assert plan_divergence(START, dict(START, coordinates="(5,3)"), (5, 3)) is None
+
+
+def test_plan_divergence_reasons():
+    assert plan_divergence(START, dict(START, map_id=13), (5, 3)) == "the map changed"
+    assert plan_divergence(START, dict(START, text_box_open=True), (5, 5)) == "a text box opened"
+    assert plan_divergence(START, dict(START, battle_type=1), (5, 5)) == "a battle started"
+    assert plan_divergence(START, dict(START, coordinates="(5,4)"), (5, 3)) == \
+        "the player is at (5, 4) instead of (5, 3)"
+
+
+def test_text_box_open_from_the_start_is_not_a_divergence():
+    start = dict(START, text_box_open=True)
+    assert plan_divergence(start, dict(start, coordinates="(5,4)"), (5, 4)) is None
@@ -0,0 +1,62 @@
+import pytest
+
+from rules import MAX_TEXT_PRESSES, RulePolicy
+
+OVERWORLD = {"map_id": 12, "coordinates": "(5,5)", "text_box_open": False, "dialogue_open": False,
+             "menu_open": False}
+DIALOGUE = dict(OVERWORLD, text_box_open=True, dialogue_open=True)
+
+
+def test_no_rule_applies_in_the_open():
+    assert RulePolicy().decide(OVERWORLD, in_battle=False) is None
+
+
+def test_advance_text_presses_a_in_dialogue():
+    rule, action, _ = RulePolicy().decide(DIALOGUE, in_battle=False)
+    assert (rule, action) == ("advance_text", "a")
+
+
+@pytest.mark.parametrize("state, in_battle", [
+    (dict(DIALOGUE, menu_open=True), False),  # a yes/no choice or the start menu
+    (dict(OVERWORLD, text_box_open=True), False),  # font loaded but no dialogue box drawn
+    (DIALOGUE, True),
+])
+def test_advance_text_stays_out_of_menus_and_battles(state, in_battle):
+    assert RulePolicy().decide(state, in_battle) is None
+
+
+def test_advance_text_hands_over_after_too_many_presses():
+    rules = RulePolicy()
+    decisions = [rules.decide(DIALOGUE, in_battle=False) for _ in range(MAX_TEXT_PRESSES + 2)]
+    assert all(decision is not None for decision in decisions[:MAX_TEXT_PRESSES])
+    assert decisions[MAX_TEXT_PRESSES] is None
+    assert decisions[MAX_TEXT_PRESSES + 1] is not None
+
+
+def test_route_plan_is_followed_in_order():
+    rules = RulePolicy()
+    rules.set_route_plan(["up", "left"], reason="To the door")
+    assert rules.decide(OVERWORLD, False) == ("route_plan", "up", "To the door")
+    assert rules.decide(dict(OVERWORLD, coordinates="(5,4)"), False) == ("route_plan", "left", "To the door")
+    assert rules.decide(dict(OVERWORLD, coordinates="(4,4)"), False) is None
+
+
+def test_blocked_route_plan_is_dropped():
+    rules = RulePolicy()
+    rules.set_route_plan(["up", "up", "up"])
+    assert rules.decide(OVERWORLD, False)[1] == "up"
+    # The player didn't move, so something is in the way
+    assert rules.decide(OVERWORLD, False) is None
+    assert not rules.route_plan
+
+
+def test_route_plan_waits_for_text_boxes():
+    rules = RulePolicy()
+    rules.set_route_plan(["up"])
+    assert rules.decide(DIALOGUE, False)[0] == "advance_text"
+    assert list(rules.route_plan) == ["up"]
+
+
+def test_route_plans_only_take_directions():
+    with pytest.raises(ValueError):
+        RulePolicy().set_route_plan(["up", "a"])
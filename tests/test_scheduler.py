@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import CircuitBreaker, CircuitOpenError, RequestScheduler
+
+
+class ApiError(Exception):
+    """Looks like an anthropic.APIStatusError to the scheduler."""
+
+    def __init__(self, status, retry_after="0"):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers={"retry-after": retry_after})
+
+
+class Flaky:
+    """A call that fails with the given statuses, then succeeds."""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.statuses:
+            raise ApiError(self.statuses.pop(0))
+        return "ok"
+
+
+def make_scheduler(rpm=6000, max_retries=3, threshold=10, cooldown=60):
+    return RequestScheduler(rpm=rpm, itpm=1e9, max_retries=max_retries,
+                            breaker=CircuitBreaker(threshold=threshold, cooldown=cooldown))
+
+
+def test_transient_errors_are_retried():
+    call = Flaky(529, 503)
+    assert make_scheduler().call(call) == "ok"
+    assert call.calls == 3
+
+
+def test_retries_run_out():
+    call = Flaky(529, 529, 529)
+    with pytest.raises(ApiError):
+        make_scheduler(max_retries=2).call(call)
+    assert call.calls == 3
+
+
+def test_bad_requests_are_not_retried_and_dont_count_against_the_api():
+    scheduler = make_scheduler(threshold=1)
+    call = Flaky(400)
+    with pytest.raises(ApiError):
+        scheduler.call(call)
+    assert call.calls == 1
+    assert not scheduler.breaker.is_open
+
+
+def test_rate_limit_drains_the_shared_request_budget():
+    scheduler = make_scheduler()
+    assert scheduler.call(Flaky(529)) == "ok"
+    assert scheduler.requests.level > scheduler.requests.capacity - 3
+
+    # A 429 means everyone sharing the key is over budget: the retry waits for a refill
+    assert scheduler.call(Flaky(429)) == "ok"
+    assert scheduler.requests.level < 1
+
+
+def test_breaker_opens_and_rejects_without_calling():
+    scheduler = make_scheduler(max_retries=0, threshold=2)
+    for _ in range(2):
+        with pytest.raises(ApiError):
+            scheduler.call(Flaky(529))
+    assert scheduler.breaker.is_open
+
+    call = Flaky()
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(call)
+    assert call.calls == 0
+
+
+def test_breaker_stops_retries_once_open():
+    scheduler = make_scheduler(max_retries=5, threshold=2)
+    call = Flaky(529, 529, 529)
+    with pytest.raises(ApiError):
+        scheduler.call(call)
+    assert call.calls == 2
+
+
+def test_breaker_trial_call_closes_or_reopens_the_circuit():
+    scheduler = make_scheduler(max_retries=0, threshold=1, cooldown=0)
+    with pytest.raises(ApiError):
+        scheduler.call(Flaky(529))
+    assert scheduler.breaker.is_open
+
+    # After the cooldown one trial call goes through; a failure opens the circuit again
+    with pytest.raises(ApiError):
+        scheduler.call(Flaky(529))
+    assert scheduler.breaker.is_open
+
+    assert scheduler.call(Flaky()) == "ok"
+    assert not scheduler.breaker.is_open
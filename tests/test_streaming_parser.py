@@ -0,0 +1,50 @@
+import pytest
+
+ai_controller = pytest.importorskip("ai_controller")
+StreamingActionParser = ai_controller.StreamingActionParser
+
+
+def feed_all(chunks):
+    parser = StreamingActionParser()
+    done = [parser.feed(chunk) for chunk in chunks]
+    return parser, done
+
+
+def test_action_split_across_chunks():
+    parser, done = feed_all(["Let me think. AC", "TION", ": le", "ft", "\nREASONING: a wall"])
+    assert done == [False, False, False, False, True]
+    assert parser.action == "left"
+
+
+def test_half_streamed_word_is_not_an_action():
+    # "le" could still become "left"
+    parser, done = feed_all(["ACTION: le"])
+    assert done == [False]
+    assert parser.action is None
+
+
+def test_bracketed_action():
+    parser, _ = feed_all(["ACTION: [up]\n"])
+    assert parser.action == "up"
+
+
+def test_invalid_words_are_skipped():
+    parser, done = feed_all(["ACTION: jump\n", "ACTION: [chosen action]\n", "ACTION: b\n"])
+    assert done == [False, False, True]
+    assert parser.action == "b"
+
+
+def test_plan_needs_its_whole_line():
+    parser, done = feed_all(["PLAN: up, up", ", left"])
+    assert done == [False, False]
+    assert parser.plan_line is None
+
+    # A plan at the very end of the response has no newline; it is parsed from the full text instead
+    assert parser.feed("\n")
+    assert parser.plan_line == "PLAN: up, up, left"
+
+
+def test_first_decision_wins():
+    parser, _ = feed_all(["GOAL: 12,4\nACTION: up\n"])
+    assert parser.plan_line == "GOAL: 12,4"
+    assert parser.action is None
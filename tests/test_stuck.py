@@ -0,0 +1,71 @@
+from episodes import EpisodeStore
+from stuck import MAX_CYCLE_STATES, STILL_LIMIT, WINDOW, StuckDetector, frontier_walk
+
+
+def state(x, y=5, map_id=12, text_box_open=False):
+    return {"map_id": map_id, "coordinates": f"({x},{y})", "text_box_open": text_box_open}
+
+
+def test_same_state_in_a_row_is_stuck():
+    detector = StuckDetector()
+    results = [detector.observe(state(5)) for _ in range(STILL_LIMIT)]
+    assert results[:-1] == [None] * (STILL_LIMIT - 1)
+    assert results[-1] == "stuck"
+
+
+def test_walking_is_not_stuck():
+    detector = StuckDetector()
+    assert all(detector.observe(state(x)) is None for x in range(3 * WINDOW))
+
+
+def test_pacing_between_two_tiles_is_a_cycle():
+    detector = StuckDetector()
+    results = [detector.observe(state(5 + step % MAX_CYCLE_STATES)) for step in range(WINDOW)]
+    assert results[:-1] == [None] * (WINDOW - 1)
+    assert results[-1] == "cycle"
+
+
+def test_screen_hash_only_counts_in_text_boxes():
+    detector = StuckDetector()
+    # Animated tiles change the frame, but the player is still stuck
+    results = [detector.observe(state(5), frame_hash=step) for step in range(STILL_LIMIT)]
+    assert results[-1] == "stuck"
+
+    detector = StuckDetector()
+    # Each dialogue page is progress
+    results = [detector.observe(state(5, text_box_open=True), frame_hash=step) for step in range(STILL_LIMIT)]
+    assert results[-1] is None
+
+
+def test_battles_reset_the_window():
+    detector = StuckDetector()
+    for _ in range(STILL_LIMIT - 1):
+        detector.observe(state(5))
+    assert detector.observe(state(5), in_battle=True) is None
+    assert detector.observe(state(5)) is None
+
+
+def test_looping_and_recovery():
+    detector = StuckDetector()
+    detector.observe(state(5))
+    assert not detector.looping
+    detector.observe(state(5))
+    assert detector.looping
+
+    detector.recovering("stuck", "frontier")
+    assert detector.looping  # until the recovery reaches a new state
+    detector.observe(state(6))
+    assert not detector.looping
+    assert detector.report() == {"detections": 1, "recovered": 1, "wasted_steps": 2, "avoided_steps": 1}
+
+
+def test_frontier_walk_avoids_walls_and_visited_tiles():
+    episodes = EpisodeStore()
+    here = state(5)
+    for direction in ("up", "down", "left"):
+        episodes.record(here, direction, here)
+    assert frontier_walk(episodes, here, length=3) == ["right"] * 3
+
+    episodes.record(here, "right", here)
+    assert frontier_walk(episodes, here) is None
+    assert frontier_walk(None, here) is None
@@ -0,0 +1,211 @@
+"""
+Thinking Budget Policy for Grok Plays Pokémon
+Picks how many tokens Claude may spend on each decision.
+
+Decisions fall into three tiers:
+    trivial    advancing text - no extended thinking
+    routine    everything else
+    important  a new map, a trainer (gym) battle, or a spot the AI keeps
+               coming back to - the full thinking budget
+
+The policy learns from the decisions it has made. A decision that left the
+game unchanged (walked into a wall, same text box) counts as a failure for its
+situation, and repeated failures push that situation up a tier. Each tier also
+has a latency target: when its recent p90 is over target its thinking budget
+shrinks, and when it is comfortably under target but failing it grows back.
+Answers served from the response cache take no model time, so they are left
+out of the latency window.
+"""
+
+import logging
+import time
+from collections import Counter, defaultdict, deque
+
+from metrics import Histogram, percentile
+
+logger = logging.getLogger(__name__)
+
+TIER_ORDER = ["trivial", "routine", "important"]
+
+# max_tokens and the extended thinking budget per tier (None disables thinking)
+TIERS = {
+    "trivial": {"max_tokens": 1024, "budget_tokens": None},
+    "routine": {"max_tokens": 8192, "budget_tokens": 4096},
+    "important": {"max_tokens": 64000, "budget_tokens": 32000},
+}
+
+# p90 latency each tier should stay under, in seconds
+LATENCY_TARGETS = {"trivial": 3.0, "routine": 10.0, "important": 45.0}
+
+MIN_THINKING_BUDGET = 1024  # the smallest budget the API accepts
+REVISIT_WINDOW = 20  # recent decisions checked for returns to the same spot
+REVISIT_LIMIT = 3  # decisions at one spot within the window before it counts as pacing
+ESCALATE_AFTER = 2  # failures at a situation before it moves up a tier
+ADJUST_EVERY = 20  # decisions per tier between budget adjustments
+
+# Fields whose change means the last decision did something
+PROGRESS_FIELDS = ("map_id", "coordinates", "text_box_open", "battle_type",
+                   "pokemon_team", "items", "money", "badges")
+
+LLM_TIER_SECONDS = Histogram('pokemon_llm_tier_seconds', 'LLM decision latency by thinking tier', ['tier'])
+
+
+class BudgetPolicy:
+    """Chooses a token budget per decision and learns from the outcomes."""
+
+    def __init__(self, window=200):
+        """
+        Initialize the policy.
+
+        Args:
+            window: Recent decisions per tier kept for percentiles and success rates
+        """
+        self.budgets = {tier: dict(params) for tier, params in TIERS.items()}
+        self.seen_maps = set()
+        self.recent = deque(maxlen=REVISIT_WINDOW)
+        self.recent_counts = Counter()
+        self.failures = defaultdict(int)
+        self.latencies = {tier: deque(maxlen=window) for tier in TIER_ORDER}
+        self.outcomes = {tier: deque(maxlen=window) for tier in TIER_ORDER}
+        self._pending = None
+        self._since_adjust = defaultdict(int)
+
+    def situation(self, game_state):
+        """Get the key decisions in the same situation share."""
+        return (game_state.get("map_id"), game_state.get("coordinates"),
+                bool(game_state.get("text_box_open")), game_state.get("battle_type", 0))
+
+    def base_tier(self, game_state):
+        """Classify a game state before any learning is applied."""
+        map_id = game_state.get("map_id")
+        if game_state.get("battle_type") == 2:
+            return "important"
+        if map_id is not None and map_id not in self.seen_maps:
+            return "important"
+        if game_state.get("text_box_open"):
+            return "trivial"
+        if self.recent_counts[self.situation(game_state)] >= REVISIT_LIMIT:
+            # Pacing over the same tiles: thinking harder is what gets the AI out
+            return "important"
+        return "routine"
+
+    def choose(self, game_state):
+        """
+        Pick the tier for a decision about to be made.
+
+        Also settles the outcome of the previous decision, since game_state
+        shows what it did.
+
+        Returns:
+            The tier name and its parameters ({"max_tokens", "budget_tokens"}).
+        """
+        self._settle(game_state)
+
+        situation = self.situation(game_state)
+        level = TIER_ORDER.index(self.base_tier(game_state))
+        level = min(level + self.failures[situation] // ESCALATE_AFTER, len(TIER_ORDER) - 1)
+        tier = TIER_ORDER[level]
+
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_counts[self.recent[0]] -= 1
+        self.recent.append(situation)
+        self.recent_counts[situation] += 1
+        if game_state.get("map_id") is not None:
+            self.seen_maps.add(game_state["map_id"])
+        self._pending = {
+            "tier": tier,
+            "situation": situation,
+            "snapshot": {field: game_state.get(field) for field in PROGRESS_FIELDS},
+            "started": time.perf_counter(),
+            "seconds": None,
+        }
+        return tier, dict(self.budgets[tier])
+
+    def finish(self, seconds=None, cached=False):
+        """
+        Record how long the model took for the decision returned by choose().
+
+        A cached answer still counts toward the success rate but not the
+        latency window, where its near-zero time would drag p90 down.
+        """
+        if self._pending is None:
+            return
+        if seconds is None:
+            seconds = time.perf_counter() - self._pending["started"]
+        tier = self._pending["tier"]
+        self._pending["seconds"] = seconds
+        if cached:
+            return
+        self.latencies[tier].append(seconds)
+        LLM_TIER_SECONDS.labels(tier).observe(seconds)
+
+    def escalate(self, game_state):
+        """Move a situation up a tier right away, e.g. when the AI is going in circles there."""
+        self.failures[self.situation(game_state)] += ESCALATE_AFTER
+
+    def _settle(self, game_state):
+        pending, self._pending = self._pending, None
+        if pending is None or pending["seconds"] is None:
+            return
+
+        progressed = any(game_state.get(field) != value for field, value in pending["snapshot"].items())
+        tier = pending["tier"]
+        self.outcomes[tier].append(progressed)
+        if progressed:
+            self.failures.pop(pending["situation"], None)
+        else:
+            self.failures[pending["situation"]] += 1
+
+        self._since_adjust[tier] += 1
+        if self._since_adjust[tier] >= ADJUST_EVERY:
+            self._since_adjust[tier] = 0
+            self._adjust(tier)
+
+    def _adjust(self, tier):
+        budget = self.budgets[tier]
+        if budget["budget_tokens"] is None:
+            return
+
+        p90 = percentile(self.latencies[tier], 0.9)
+        target = LATENCY_TARGETS[tier]
+        ceiling = TIERS[tier]["budget_tokens"]
+        if p90 > target:
+            new_budget = max(MIN_THINKING_BUDGET, int(budget["budget_tokens"] * 0.75))
+        elif p90 < target / 2 and self.success_rate(tier) < 0.5:
+            new_budget = min(ceiling, int(budget["budget_tokens"] * 1.25))
+        else:
+            return
+
+        if new_budget != budget["budget_tokens"]:
+            logger.info(f"Thinking budget for {tier} decisions: {budget['budget_tokens']} -> {new_budget} "
+                        f"(p90 {p90:.1f}s, target {target:.0f}s)")
+            budget["budget_tokens"] = new_budget
+
+    def success_rate(self, tier):
+        """Get the fraction of recent decisions in a tier that changed the game."""
+        outcomes = self.outcomes[tier]
+        return sum(outcomes) / len(outcomes) if outcomes else 0.0
+
+    def report(self):
+        """Get latency percentiles, success rate and current budget for each tier."""
+        return {
+            tier: {
+                "decisions": len(self.latencies[tier]),
+                "p50": percentile(self.latencies[tier], 0.5),
+                "p90": percentile(self.latencies[tier], 0.9),
+                "p99": percentile(self.latencies[tier], 0.99),
+                "success_rate": self.success_rate(tier),
+                "budget_tokens": self.budgets[tier]["budget_tokens"],
+            }
+            for tier in TIER_ORDER
+        }
+
+    def log_report(self):
+        """Log the report, one line per tier that has been used."""
+        for tier, stats in self.report().items():
+            if stats["decisions"]:
+                logger.info(
+                    f"{tier}: {stats['decisions']} decisions, p50 {stats['p50']:.1f}s, "
+                    f"p90 {stats['p90']:.1f}s, p99 {stats['p99']:.1f}s, "
+                    f"{stats['success_rate']:.0%} made progress, thinking budget {stats['budget_tokens']}"
+                )
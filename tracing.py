@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Decision Tracing for Grok Plays Pokémon
+Nested timing spans for each AI step, written to a JSONL trace file.
+
+Wrap work in `with span("name"):` and spans opened inside it (in the same
+thread, asyncio task, asyncio.to_thread call or a worker started with
+`run_in_context`) become its children. Each finished span is one JSON line:
+
+    {"trace": "...", "id": "...", "parent": "...", "name": "llm",
+     "start": 1700000000.12, "duration": 2.31, "attrs": {...}, "marks": {"first_token": 0.84}}
+
+Marks are offsets in seconds from the start of the span, e.g. the time to the
+first streamed token. Tracing is off unless TRACE_PATH is set (or configure()
+is called); spans are still timed, just not written.
+
+Summarize a trace with:
+    python tracing.py traces/run.jsonl
+"""
+
+import argparse
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from metrics import percentile
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ROOT_SPAN = "step"  # span name the report measures shares against
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed piece of work within a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "attrs", "marks", "_started")
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration = None
+        self.attrs = dict(attrs) if attrs else {}
+        self.marks = {}
+        self._started = time.perf_counter()
+
+    def set(self, key, value):
+        """Attach an attribute to the span."""
+        self.attrs[key] = value
+
+    def mark(self, name):
+        """Record how far into the span an event happened (first mark of a name wins)."""
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self._started
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {
+            "trace": self.trace_id,
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "attrs": self.attrs,
+            "marks": self.marks,
+        }
+
+
+class Tracer:
+    """Writes finished spans to a JSONL file."""
+
+    def __init__(self, path=None):
+        """Open the trace file, or trace nothing if path is None."""
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+            logger.info(f"Writing decision traces to {path}")
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a block as a child of the current span."""
+        span = Span(name, _current_span.get(), attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set("error", type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            if self._file is not None:
+                self._write(span)
+
+    def _write(self, span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            if span.parent_id is None:
+                # Flush once per step so a crashed run keeps its trace
+                self._file.flush()
+
+    def close(self):
+        """Flush and close the trace file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_tracer = Tracer(os.getenv("TRACE_PATH") or None)
+
+
+def configure(path):
+    """Start writing spans to path (None to stop tracing)."""
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def span(name, **attrs):
+    """Time a block as a child of the current span."""
+    return _tracer.span(name, **attrs)
+
+
+def current_span():
+    """Get the innermost open span, or None."""
+    return _current_span.get()
+
+
+def run_in_context(function, *args):
+    """Wrap a call so that a worker thread runs it under the caller's current span."""
+    context = contextvars.copy_context()
+    return lambda: context.run(function, *args)
+
+
+def summarize(path):
+    """
+    Summarize a trace file.
+
+    Returns:
+        {stage: {"count", "mean", "p50", "p95", "p99", "total"}}, where a stage
+        is a span name or "<span name>.<mark>" for marks.
+    """
+    samples = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            samples[record["name"]].append(record["duration"])
+            for mark, offset in record.get("marks", {}).items():
+                samples[f"{record['name']}.{mark}"].append(offset)
+
+    return {
+        stage: {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "total": sum(values),
+        }
+        for stage, values in samples.items()
+    }
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Summarize a decision trace: latency percentiles per stage")
+    parser.add_argument("trace", help="Path to a JSONL trace written with TRACE_PATH")
+    return parser.parse_args()
+
+
+def main():
+    """Print per-stage percentiles for a trace file."""
+    args = parse_args()
+    summary = summarize(args.trace)
+    if not summary:
+        logger.error(f"No spans in {args.trace}")
+        return
+
+    step_total = summary.get(ROOT_SPAN, {}).get("total")
+    print(f"{'stage':<24}{'count':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'share':>8}")
+    for stage, stats in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+        share = f"{stats['total'] / step_total:.0%}" if step_total and "." not in stage else ""
+        print(f"{stage:<24}{stats['count']:>7}{stats['mean']:>8.3f}s{stats['p50']:>8.3f}s"
+              f"{stats['p95']:>8.3f}s{stats['p99']:>8.3f}s{share:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Transports for Grok Plays Pokémon
+How an AIManager observes and drives the game.
+
+HttpTransport talks to the game server (app.py) through the shared API client.
+InProcessTransport owns a PokemonEmulator in the controller's own process, so
+training and benchmarking runs skip the Flask JSON/PNG round trips: states are
+plain dicts and frames are NumPy views of the emulator's screen buffer.
+"""
+
+import logging
+import time
+from abc import ABC, abstractmethod
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("http", "inproc")
+
+
+class Transport(ABC):
+    """Interface between an AIManager and the game."""
+
+    @abstractmethod
+    def get_status(self):
+        """Get the emulator status, e.g. {"status": "running", "frame_count": 1234}."""
+
+    @abstractmethod
+    def get_state(self):
+        """Get the current game state dict."""
+
+    @abstractmethod
+    def get_screenshot(self):
+        """Get the current frame (PNG bytes or an RGB NumPy array), or None."""
+
+    def observe(self):
+        """Get the current game state and frame."""
+        return self.get_state(), self.get_screenshot()
+
+    @abstractmethod
+    def execute_action(self, action, commentary=None):
+        """Execute a single action. Returns {"success": bool, ...}."""
+
+    @abstractmethod
+    def execute_sequence(self, actions, commentary=None):
+        """Execute several actions. Returns {"success": bool, "results": [...], ...}."""
+
+    @abstractmethod
+    def add_commentary(self, commentary):
+        """Publish commentary that isn't tied to an action."""
+
+    @abstractmethod
+    def start_game(self):
+        """Start the game if it is not running."""
+
+    @abstractmethod
+    def advance(self, seconds):
+        """Let the game run for the given number of game seconds."""
+
+    def close(self):
+        """Release any resources held by the transport."""
+
+
+class HttpTransport(Transport):
+    """Drives the game server over its HTTP API."""
+
+    def __init__(self, client=None):
+        """Use the given PokemonClient, or the shared one."""
+        from api_client import get_client
+        self.client = client or get_client()
+
+    def get_status(self):
+        return self.client.get_status()
+
+    def get_state(self):
+        return self.client.get_state()
+
+    def get_screenshot(self):
+        return self.client.get_screenshot()
+
+    def observe(self):
+        return self.client.observe()
+
+    def execute_action(self, action, commentary=None):
+        return self.client.execute_action(action, commentary)
+
+    def execute_sequence(self, actions, commentary=None):
+        return self.client.execute_sequence(actions, commentary)
+
+    def add_commentary(self, commentary):
+        return self.client.add_commentary(commentary)
+
+    def start_game(self):
+        status = self.client.get_status()
+        if status.get("status") != "running":
+            logger.info("Starting the game")
+            self.client.start_game()
+            time.sleep(2)  # Wait for game to initialize
+        return status
+
+    def advance(self, seconds):
+        # The server's game loop keeps running on its own
+        time.sleep(seconds)
+
+
+class InProcessTransport(Transport):
+    """Drives a PokemonEmulator in this process, headless and uncapped."""
+
+    def __init__(self, rom_path, headless=True, speed=0, emulator=None, backend=None):
+        """Create (or wrap) the emulator, on the given backend if any (see backends.py)."""
+        if emulator is None:
+            from emulator import PokemonEmulator
+            emulator = PokemonEmulator(rom_path, headless=headless, speed=speed, backend=backend)
+        self.emulator = emulator
+
+    def get_status(self):
+        return {
+            "status": "running" if self.emulator.is_running else "stopped",
+            "frame_count": self.emulator.frame_count
+        }
+
+    def get_state(self):
+        with tracing.span("state_fetch"):
+            return dict(self.emulator.get_state())
+
+    def get_screenshot(self):
+        with tracing.span("screenshot_fetch"):
+            return self.emulator.get_screen_view()
+
+    def execute_action(self, action, commentary=None):
+        if commentary:
+            logger.info(f"Commentary: {commentary}")
+        if self.emulator.execute_action(action):
+            return {"success": True, "action": action}
+        return {"success": False, "error": f"Invalid action: {action}"}
+
+    def execute_sequence(self, actions, commentary=None):
+        if commentary:
+            logger.info(f"Commentary: {commentary}")
+        results = self.emulator.execute_sequence(actions)
+        return {"success": all(results), "results": results, "actions": actions}
+
+    def add_commentary(self, commentary):
+        logger.info(f"Commentary: {commentary}")
+        return {"success": True}
+
+    def start_game(self):
+        self.emulator.start()
+        return self.get_status()
+
+    def advance(self, seconds):
+        # Run the frames the server loop would have run, without waiting for them
+        self.emulator.tick(int(seconds * 60))
+
+    def close(self):
+        self.emulator.stop()
+
+
+def create_transport(kind="http", rom_path=None, backend=None):
+    """Create a transport by name ("http" or "inproc"); inproc runs on backend if given."""
+    if kind == "http":
+        return HttpTransport()
+    if kind == "inproc":
+        if not rom_path and backend is None:
+            raise ValueError("The inproc transport needs a ROM path")
+        return InProcessTransport(rom_path, backend=backend)
+    raise ValueError(f"Unknown transport: {kind}. Must be one of {TRANSPORTS}.")